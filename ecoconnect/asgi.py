@@ -3,6 +3,10 @@ ASGI config for ecoconnect project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the site through it (e.g. ``uvicorn ecoconnect.asgi:application``) to
+keep the live event streams (events/live.py) open. Under WSGI the stream
+answers 204 and pages simply show what they loaded.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
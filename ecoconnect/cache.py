@@ -0,0 +1,148 @@
+"""
+Cache-aside helpers for EcoConnect.
+
+``get_or_compute`` reads a value from the cache and only computes it on a
+miss. Two things keep a popular key from stampeding the database:
+
+- single-flight: only the caller holding a short lock recomputes, others
+  wait for the result (or keep serving the old value);
+- early refresh: each read may refresh the value slightly before it
+  expires, with a probability that grows as expiry gets closer
+  ("XFetch"), so the refresh rarely coincides with a burst of misses.
+
+Entries can be tagged ('events', 'event:12', ...). Tags carry a version
+number that is part of the cache key, so ``invalidate_tags`` makes every
+entry under a tag unreachable with a single increment.
+"""
+
+import hashlib
+import math
+import random
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+
+LOCK_TIMEOUT = 10     # seconds a recompute may hold the lock
+LOCK_WAIT = 2.0       # seconds a caller waits for someone else's recompute
+LOCK_POLL = 0.05
+
+_MISSING = object()
+
+# Sent by invalidate_tags in the process that made the change.
+# Arguments: versions ({tag: the version this invalidation produced})
+tags_invalidated = Signal()
+
+
+def event_tag(event_id):
+    """Tag for everything derived from a single event."""
+    return f'event:{event_id}'
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def tag_versions(tags):
+    """Return {tag: version}, creating versions for tags seen the first time."""
+    if not tags:
+        return {}
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, tag in keys.items():
+        version = found.get(key)
+        if version is None:
+            # Start from the clock so a recreated tag never reuses old versions
+            version = int(time.time() * 1000)
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[tag] = version
+    return versions
+
+
+def data_version(*tags):
+    """Short string that changes whenever any of the tags is invalidated."""
+    versions = tag_versions(tags)
+    return '.'.join(str(versions[tag]) for tag in tags)
+
+
+def invalidate_tags(*tags):
+    """
+    Drop every cached entry stored under any of the given tags.
+    Returns {tag: new version}.
+    """
+    versions = {}
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            versions[tag] = cache.incr(key)
+        except ValueError:
+            versions[tag] = int(time.time() * 1000)
+            cache.set(key, versions[tag], None)
+    tags_invalidated.send(sender=None, versions=versions)
+    return versions
+
+
+def invalidate_tags_on_commit(*tags):
+    """
+    ``invalidate_tags`` once the current transaction commits (right away
+    outside a transaction). Bumping earlier would let a concurrent reader
+    cache pre-commit data under the new version.
+    """
+    transaction.on_commit(lambda: invalidate_tags(*tags))
+
+
+def _full_key(key, tags):
+    versions = tag_versions(tags)
+    raw = key + '|' + ','.join(f'{tag}={versions[tag]}' for tag in sorted(versions))
+    return 'aside:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _wait_for(full_key):
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = cache.get(full_key)
+        if entry is not None:
+            return entry[0]
+    return _MISSING
+
+
+def get_or_compute(key, compute, timeout=300, tags=(), beta=1.0):
+    """
+    Return the cached value for ``key`` or store ``compute()`` under it.
+
+    ``beta`` above 1 refreshes earlier, below 1 later; 0 disables early
+    refresh.
+    """
+    full_key = _full_key(key, tags)
+    lock_key = full_key + ':lock'
+    entry = cache.get(full_key)
+
+    if entry is not None:
+        value, delta, expires_at = entry
+        # XFetch: -log(u) is usually small, occasionally large, so reads only
+        # start refreshing once we are within a few "compute times" of expiry
+        early = delta * beta * -math.log(1.0 - random.random())
+        if time.time() + early < expires_at:
+            return value
+        if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            # Someone else is already refreshing; the old value is fine
+            return value
+    elif not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        value = _wait_for(full_key)
+        if value is not _MISSING:
+            return value
+        # The other caller is slow or died; compute without the lock
+        return compute()
+
+    try:
+        started = time.time()
+        value = compute()
+        delta = time.time() - started
+        cache.set(full_key, (value, delta, time.time() + timeout), timeout)
+    finally:
+        cache.delete(lock_key)
+    return value
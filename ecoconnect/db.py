@@ -0,0 +1,124 @@
+"""
+Database profiles for EcoConnect.
+
+DB_PROFILE picks how Django talks to the database:
+
+    sqlite  - local SQLite file tuned for many readers and few writers (default)
+    server  - PostgreSQL with persistent or pooled connections
+
+Either profile can declare read replicas. They are added as extra aliases
+(``replica``, ``replica_2``, ...) and listed in DATABASE_REPLICAS so the
+router in ``ecoconnect.routers`` can send reads to them.
+"""
+
+import os
+
+# Applied to every new SQLite connection. WAL lets readers run while a
+# writer holds the lock, and synchronous=NORMAL is safe in WAL mode.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,         # ms to wait for a lock before failing
+    'mmap_size': 134217728,       # 128MB memory mapped I/O
+    'cache_size': -20000,         # negative means KiB, so ~20MB page cache
+    'temp_store': 'MEMORY',
+}
+
+
+def env_bool(name, default=False):
+    """Read a boolean flag from the environment ('1', 'true', 'yes', 'on')."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(name, default):
+    """Read an integer from the environment, falling back to the default."""
+    value = os.getenv(name)
+    if value in (None, ''):
+        return default
+    return int(value)
+
+
+def env_list(name):
+    """Read a comma separated list from the environment."""
+    return [item.strip() for item in os.getenv(name, '').split(',') if item.strip()]
+
+
+def sqlite_database(name, pragmas=None):
+    """Settings dict for a tuned SQLite database file."""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {
+            'timeout': pragmas.get('busy_timeout', 5000) / 1000,
+            # Take the write lock when the transaction starts instead of
+            # upgrading a read lock halfway through (avoids SQLITE_BUSY).
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(
+                f'PRAGMA {key}={value}' for key, value in pragmas.items()
+            ),
+        },
+    }
+
+
+def server_database(host=None):
+    """Settings dict for PostgreSQL with persistent or pooled connections."""
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('DB_NAME', 'ecoconnect'),
+        'USER': os.getenv('DB_USER', 'ecoconnect'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': host or os.getenv('DB_HOST', 'localhost'),
+        'PORT': os.getenv('DB_PORT', '5432'),
+        # Ping reused connections before handing them out
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': env_int('DB_CONNECT_TIMEOUT', 5),
+        },
+    }
+
+    if env_bool('DB_POOL'):
+        # psycopg pool owns the connections, so Django must not keep its own
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': env_int('DB_POOL_MIN_SIZE', 2),
+            'max_size': env_int('DB_POOL_MAX_SIZE', 10),
+            'timeout': env_int('DB_POOL_TIMEOUT', 10),
+        }
+    else:
+        database['CONN_MAX_AGE'] = env_int('DB_CONN_MAX_AGE', 600)
+
+    return database
+
+
+def build_databases(profile, base_dir):
+    """
+    Build the DATABASES setting for the given profile.
+
+    Returns ``(databases, replica_aliases)``.
+    """
+    if profile == 'server':
+        databases = {'default': server_database()}
+        replicas = [server_database(host) for host in env_list('DB_REPLICA_HOSTS')]
+    elif profile == 'sqlite':
+        databases = {
+            'default': sqlite_database(os.getenv('DB_NAME', base_dir / 'db.sqlite3')),
+        }
+        # Locally a replica is just another SQLite file (or the same file
+        # opened through a second connection).
+        replicas = [sqlite_database(name) for name in env_list('DB_REPLICA_NAMES')]
+    else:
+        raise ValueError(f"Unknown DB_PROFILE '{profile}'. Use 'sqlite' or 'server'.")
+
+    replica_aliases = []
+    for index, replica in enumerate(replicas, start=1):
+        alias = 'replica' if index == 1 else f'replica_{index}'
+        # Tests only have one database; replicas read from it
+        replica['TEST'] = {'MIRROR': 'default'}
+        databases[alias] = replica
+        replica_aliases.append(alias)
+
+    return databases, replica_aliases
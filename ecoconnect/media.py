@@ -0,0 +1,154 @@
+"""
+Serving uploaded media (event photos, profile pictures).
+
+``serve_media`` answers conditional requests (ETag / If-None-Match,
+Last-Modified / If-Modified-Since) with 304 and single byte ranges with
+206, so image viewers and resumed downloads only fetch what they miss.
+
+Where the bytes come from depends on MEDIA_ACCEL:
+
+- '' (default): Django streams the file with FileResponse, which WSGI
+  servers such as gunicorn send with sendfile() (zero-copy);
+- 'x-accel': nginx serves the file from the internal location
+  MEDIA_ACCEL_PREFIX (X-Accel-Redirect);
+- 'x-sendfile': Apache (mod_xsendfile) or lighttpd serve the file (X-Sendfile).
+
+With an accelerator Django only checks access and returns headers, so a
+page full of photos doesn't keep Python workers busy.
+
+Only the upload folders of our models are served; anything else under
+MEDIA_ROOT (stray files, dotfiles) is a 404.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+# Upload folders that may be served (the models' upload_to)
+MEDIA_FOLDERS = ('event_photos/', 'profile_pics/')
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _file_etag(stat):
+    return quote_etag(f'{stat.st_size:x}-{stat.st_mtime_ns:x}')
+
+
+def parse_range(header, size):
+    """
+    Return (start, end) inclusive for a single "bytes=" range, None to send
+    the whole file, or False if the range can't be satisfied.
+    """
+    match = _RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        # Multiple ranges or other units: sending everything is allowed
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _range_applies(request, etag, stat):
+    """If-Range: only use the range if the client's copy is still current."""
+    if_range = request.headers.get('if-range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(stat.st_mtime) <= since
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as media:
+        media.seek(start)
+        while length > 0:
+            chunk = media.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _accel_response(name, path):
+    response = HttpResponse()
+    if settings.MEDIA_ACCEL == 'x-accel':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(name)
+    else:
+        response['X-Sendfile'] = path
+    # Let the front-end server pick the type from the file
+    del response['Content-Type']
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    name = path.replace('\\', '/')
+    if not name.startswith(MEDIA_FOLDERS) or '/.' in '/' + name:
+        raise Http404('Not found')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('Not found')
+    if not os.path.isfile(full_path):
+        raise Http404('Not found')
+
+    etag = _file_etag(stat)
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+
+    if response is None and settings.MEDIA_ACCEL:
+        # The front-end server handles ranges and the rest
+        response = _accel_response(name, full_path)
+
+    if response is None:
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        byte_range = None
+        if 'range' in request.headers and _range_applies(request, etag, stat):
+            byte_range = parse_range(request.headers['range'], stat.st_size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range is None:
+            response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            if end == stat.st_size - 1:
+                # Runs to the end of the file: still eligible for sendfile()
+                media = open(full_path, 'rb')
+                media.seek(start)
+                response = FileResponse(media, content_type=content_type, status=206)
+            else:
+                response = StreamingHttpResponse(
+                    _read_range(full_path, start, length), content_type=content_type, status=206,
+                )
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Accept-Ranges'] = 'bytes'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
@@ -0,0 +1,93 @@
+"""
+Project-wide middleware for EcoConnect.
+"""
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils.http import http_date
+
+from . import routers
+
+
+class ReplicaPinMiddleware:
+    """
+    Keep a user on the primary database for a short while after they write.
+
+    Replicas lag behind the primary, so right after joining an event the
+    user could read a replica that doesn't have their participation yet.
+    When a request writes content (see routers.UNPINNED_MODELS for the
+    writes that don't count), we set a short-lived cookie; requests carrying
+    that cookie read from the primary until it expires.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie_name = settings.DATABASE_PIN_COOKIE
+        pinned = cookie_name in request.COOKIES
+        token = routers.start_request(pinned=pinned)
+        try:
+            response = self.get_response(request)
+            if settings.DATABASE_REPLICAS and routers.current_state().wrote:
+                response.set_cookie(
+                    cookie_name,
+                    '1',
+                    max_age=settings.DATABASE_PIN_SECONDS,
+                    httponly=True,
+                    samesite='Lax',
+                )
+        finally:
+            routers.end_request(token)
+        return response
+
+
+class BotSnapshotMiddleware:
+    """
+    Serve crawlers the pre-rendered event pages from events.snapshots.
+
+    Runs before sessions and authentication: a request without a session
+    cookie is anonymous anyway, and a snapshot hit needs no database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        event_id = self.snapshot_event_id(request)
+        if event_id is None:
+            return self.get_response(request)
+
+        from events.snapshots import read_snapshot, write_snapshot
+
+        snapshot = read_snapshot(event_id)
+        if snapshot is not None:
+            content, mtime = snapshot
+            response = HttpResponse(content, content_type='text/html; charset=utf-8')
+            response['Last-Modified'] = http_date(mtime)
+            return response
+
+        # Store this render for the next crawler
+        response = self.get_response(request)
+        if response.status_code == 200 and not response.streaming:
+            write_snapshot(event_id, response.content)
+        return response
+
+    def snapshot_event_id(self, request):
+        if not settings.BOT_SNAPSHOTS or request.method not in ('GET', 'HEAD'):
+            return None
+        if settings.SESSION_COOKIE_NAME in request.COOKIES:
+            return None
+
+        from events.snapshots import is_bot
+
+        if not is_bot(request):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.view_name != 'events:event_detail':
+            return None
+        return match.kwargs['event_id']
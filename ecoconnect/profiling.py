@@ -0,0 +1,224 @@
+"""
+Opt-in template rendering profiler.
+
+With TEMPLATE_PROFILING on, ``install()`` wraps Django's template engine:
+
+- Template._render: time per template (the top template, every
+  {% extends %} parent and every {% include %});
+- IncludeNode.render and BlockNode.render: time per include and block;
+- Node.render_annotated: calls per template tag ({% for %}, {% url %}, ...);
+- FilterExpression.resolve: calls per filter (|date, |truncatewords, ...).
+
+Timings are inclusive ("total") and without nested timed parts ("self").
+Only requests with an active Profile record anything.
+TemplateProfilerMiddleware reports each request in a Server-Timing header
+(visible in the browser's network panel) and in the 'ecoconnect.profiling'
+log. ``python manage.py profile_templates`` ranks templates over many renders.
+"""
+
+import contextvars
+import functools
+import logging
+import re
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template import base, loader_tags
+
+logger = logging.getLogger('ecoconnect.profiling')
+
+_current = contextvars.ContextVar('template_profile', default=None)
+_installed = False
+
+
+class Timing:
+    __slots__ = ('calls', 'total', 'children')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.children = 0.0
+
+    @property
+    def own(self):
+        return self.total - self.children
+
+
+class Profile:
+    """Template timings and tag/filter counts of one or more renders"""
+
+    def __init__(self):
+        self.timings = defaultdict(Timing)   # (kind, name) -> Timing
+        self.tags = Counter()
+        self.filters = Counter()
+        self.render_time = 0.0               # outermost templates only
+        self._stack = []
+
+    def enter(self):
+        self._stack.append(0.0)
+
+    def exit(self, kind, name, elapsed):
+        children = self._stack.pop()
+        timing = self.timings[(kind, name)]
+        timing.calls += 1
+        timing.total += elapsed
+        timing.children += children
+        if self._stack:
+            self._stack[-1] += elapsed
+        elif kind == 'template':
+            self.render_time += elapsed
+
+    def merge(self, other):
+        for key, timing in other.timings.items():
+            mine = self.timings[key]
+            mine.calls += timing.calls
+            mine.total += timing.total
+            mine.children += timing.children
+        self.tags.update(other.tags)
+        self.filters.update(other.filters)
+        self.render_time += other.render_time
+
+    def ranked(self, key='own'):
+        """[(kind, name, Timing)] slowest first"""
+        return sorted(
+            ((kind, name, timing) for (kind, name), timing in self.timings.items()),
+            key=lambda item: getattr(item[2], key), reverse=True,
+        )
+
+
+def start():
+    """Start recording for the current request or thread; returns a token for stop()."""
+    profile = Profile()
+    return profile, _current.set(profile)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+def _timed(kind, name_of):
+    """Wrap a render method so active profiles time it under (kind, name)."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, context, *args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return method(self, context, *args, **kwargs)
+            profile.enter()
+            started = time.perf_counter()
+            try:
+                return method(self, context, *args, **kwargs)
+            finally:
+                profile.exit(kind, name_of(self, context), time.perf_counter() - started)
+        wrapper.profiled = True
+        return wrapper
+    return decorator
+
+
+def _template_name(template, context):
+    return template.origin.template_name or template.name or '<string>'
+
+
+def _include_name(node, context):
+    # A literal name, or the Variable holding the template
+    template = getattr(node.template, 'var', node.template)
+    return str(getattr(template, 'var', template))
+
+
+def _block_name(node, context):
+    # Name the block after the template whose version was rendered (the
+    # child's, for overridden blocks), which is back on top of the stack
+    block_context = context.render_context.get(loader_tags.BLOCK_CONTEXT_KEY)
+    block = (block_context and block_context.get_block(node.name)) or node
+    origin = getattr(block, 'origin', None)
+    return f'{origin.template_name}:{node.name}' if origin else node.name
+
+
+def _counted_render_annotated(method):
+    @functools.wraps(method)
+    def wrapper(self, context):
+        profile = _current.get()
+        if profile is not None and not isinstance(self, base.TextNode):
+            token = getattr(self, 'token', None)
+            if isinstance(self, base.VariableNode):
+                profile.tags['{{ variable }}'] += 1
+            elif token is not None:
+                profile.tags[token.split_contents()[0]] += 1
+        return method(self, context)
+    wrapper.profiled = True
+    return wrapper
+
+
+def _counted_resolve(method):
+    @functools.wraps(method)
+    def wrapper(self, context, ignore_failures=False):
+        profile = _current.get()
+        if profile is not None:
+            for func, _ in self.filters:
+                profile.filters[getattr(func, '_filter_name', None) or func.__name__] += 1
+        return method(self, context, ignore_failures)
+    wrapper.profiled = True
+    return wrapper
+
+
+def install():
+    """Patch the template engine (once). Costs one lookup per call while no profile runs."""
+    global _installed
+    if _installed:
+        return
+    base.Template._render = _timed('template', _template_name)(base.Template._render)
+    loader_tags.IncludeNode.render = _timed('include', _include_name)(loader_tags.IncludeNode.render)
+    loader_tags.BlockNode.render = _timed('block', _block_name)(loader_tags.BlockNode.render)
+    base.Node.render_annotated = _counted_render_annotated(base.Node.render_annotated)
+    base.FilterExpression.resolve = _counted_resolve(base.FilterExpression.resolve)
+    _installed = True
+
+
+def _metric_name(kind, name):
+    # Server-Timing names are HTTP tokens
+    return re.sub(r'[^A-Za-z0-9_.-]+', '-', f'{kind}-{name}').strip('-')[:60]
+
+
+def server_timing(profile, limit=8):
+    entries = [f'templates;dur={profile.render_time * 1000:.1f};desc="Template rendering"']
+    for kind, name, timing in profile.ranked()[:limit]:
+        entries.append(f'{_metric_name(kind, name)};dur={timing.own * 1000:.1f}')
+    return ', '.join(entries)
+
+
+def log_profile(request, profile, limit=10):
+    lines = [f'{request.method} {request.get_full_path()}: {profile.render_time * 1000:.1f} ms in templates']
+    for kind, name, timing in profile.ranked()[:limit]:
+        lines.append(
+            f'  {kind:8} {name:50} {timing.calls:5}x  '
+            f'self {timing.own * 1000:7.1f} ms  total {timing.total * 1000:7.1f} ms'
+        )
+    busiest = ', '.join(f'{name} {count}' for name, count in (profile.tags + profile.filters).most_common(limit))
+    lines.append(f'  most used tags/filters: {busiest}')
+    logger.info('\n'.join(lines))
+
+
+class TemplateProfilerMiddleware:
+    """Per-request template breakdown, only active with TEMPLATE_PROFILING"""
+
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        if _current.get() is not None:
+            # Someone further out (profile_templates) is already recording
+            return self.get_response(request)
+        profile, token = start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop(token)
+        if profile.timings:
+            response['Server-Timing'] = server_timing(profile)
+            log_profile(request, profile)
+        return response
@@ -0,0 +1,55 @@
+"""
+Token-bucket rate limiting backed by the cache.
+
+A bucket holds up to ``capacity`` tokens and refills continuously at
+``capacity`` tokens per ``period`` seconds. Each request takes one token;
+an empty bucket means the request is rejected until enough time passed.
+
+The bucket is stored as (tokens, last update time) under one cache key.
+The read-modify-write is guarded by a short ``cache.add`` lock so
+concurrent requests can't spend the same token twice. Works with every
+cache backend, shared across processes with file or redis caches.
+"""
+
+import time
+
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 1      # seconds
+LOCK_WAIT = 0.05      # seconds to wait for another request's update
+LOCK_POLL = 0.005
+
+
+def _bucket_key(name):
+    return f'ratelimit:{name}'
+
+
+def take_token(name, capacity, period):
+    """
+    Take a token from bucket ``name``. Returns 0 when allowed, otherwise the
+    number of seconds until a token is available.
+    """
+    if capacity <= 0:
+        return 0
+    key = _bucket_key(name)
+    lock_key = key + ':lock'
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        if time.monotonic() >= deadline:
+            # Heavy contention on one bucket is exactly what it is limiting
+            return period / capacity
+        time.sleep(LOCK_POLL)
+
+    try:
+        now = time.time()
+        rate = capacity / period
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens < 1:
+            return (1 - tokens) / rate
+        # Untouched buckets are full again after one period
+        cache.set(key, (tokens - 1, now), int(period) + 1)
+        return 0
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,145 @@
+"""
+Database routers for EcoConnect.
+
+Reads go to a replica unless the current request has to see its own
+writes. A request is routed to the primary when:
+
+- it has already written user-visible content (router.db_for_write was
+  called for a model outside UNPINNED_MODELS),
+- the user wrote within the last DATABASE_PIN_SECONDS (see
+  ``ecoconnect.middleware.ReplicaPinMiddleware``), or
+- the view is wrapped in ``use_primary_db``.
+
+``use_replica_db`` does the opposite for views that can tolerate lag
+(analytics, reports) even right after a write.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+PRIMARY = 'primary'
+REPLICA = 'replica'
+
+# Apps whose rows are written and read back on almost every request
+PRIMARY_ONLY_APPS = {'sessions'}
+
+# Writes that don't pin the user to the primary: sessions, history and
+# analytics rows, derived counters and the mail queue. They happen on
+# plain page views, and nothing the user looks at next reads them back
+# from a replica.
+UNPINNED_MODELS = {
+    'sessions.session',
+    'search.searchhistory',
+    'search.recommendation',
+    'interaction.userhistory',
+    'interaction.attendancestats',
+    'notifications.outboundemail',
+    'notifications.notificationlog',
+}
+
+_routing = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    """Per-request routing decisions."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+        self.forced = None
+
+
+def current_state():
+    return _routing.get()
+
+
+def start_request(pinned=False):
+    """Begin routing for a request; returns a token for ``end_request``."""
+    return _routing.set(RoutingState(pinned=pinned))
+
+
+def end_request(token):
+    _routing.reset(token)
+
+
+@contextmanager
+def _forced(target):
+    state = _routing.get()
+    token = None
+    if state is None:
+        token = _routing.set(RoutingState())
+        state = _routing.get()
+    previous = state.forced
+    state.forced = target
+    try:
+        yield state
+    finally:
+        state.forced = previous
+        if token is not None:
+            _routing.reset(token)
+
+
+def pin_to_primary():
+    """Context manager: read from the primary inside the block."""
+    return _forced(PRIMARY)
+
+
+def allow_replica():
+    """Context manager: read from a replica inside the block, even after writes."""
+    return _forced(REPLICA)
+
+
+def use_primary_db(view_func):
+    """View decorator: always read from the primary."""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with pin_to_primary():
+            return view_func(*args, **kwargs)
+    return wrapper
+
+
+def use_replica_db(view_func):
+    """View decorator: read from a replica even if the user just wrote."""
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        with allow_replica():
+            return view_func(*args, **kwargs)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """
+    Send reads to a read replica and writes to the primary.
+
+    Replicas come from settings.DATABASE_REPLICAS. With no replicas
+    configured every query goes to 'default', so the router is safe to
+    leave enabled in development.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return 'default'
+
+        state = _routing.get()
+        if state is not None:
+            if state.forced == PRIMARY:
+                return 'default'
+            if state.forced != REPLICA and (state.pinned or state.wrote):
+                return 'default'
+
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None and model._meta.label_lower not in UNPINNED_MODELS:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
@@ -5,6 +5,8 @@ Django settings for ecoconnect project.
 from pathlib import Path
 import os
 
+from .db import build_databases, env_bool, env_int
+
 # Load environment variables
 try:
     from dotenv import load_dotenv
@@ -30,18 +32,25 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    'whitenoise.runserver_nostatic',
     'django.contrib.staticfiles',
     'django.contrib.sites',  # ← ADD THIS FOR PASSWORD RESET
+    'django.contrib.sitemaps',
     
     # Our custom apps
     'users',
     'events', 
     'search',
     'interaction',
+    'notifications',
 ]
 
 MIDDLEWARE = [
+    'ecoconnect.profiling.TemplateProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'ecoconnect.middleware.BotSnapshotMiddleware',
+    'ecoconnect.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -70,12 +79,124 @@ TEMPLATES = [
 WSGI_APPLICATION = 'ecoconnect.wsgi.application'
 
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# ========
+# DB_PROFILE=sqlite (default) uses a WAL-mode SQLite file, DB_PROFILE=server
+# uses PostgreSQL with persistent (DB_CONN_MAX_AGE) or pooled (DB_POOL=1)
+# connections. Read replicas come from DB_REPLICA_NAMES (sqlite files) or
+# DB_REPLICA_HOSTS (server) - see ecoconnect/db.py.
+DB_PROFILE = os.getenv('DB_PROFILE', 'sqlite')
+DATABASES, DATABASE_REPLICAS = build_databases(DB_PROFILE, BASE_DIR)
+DATABASE_ROUTERS = ['ecoconnect.routers.PrimaryReplicaRouter']
+
+# After a write, read from the primary for this many seconds so users see
+# their own changes even if the replicas lag behind.
+DATABASE_PIN_SECONDS = int(os.getenv('DB_PIN_SECONDS', '10'))
+DATABASE_PIN_COOKIE = 'db_pin'
+
+# Cache
+# =====
+# CACHE_BACKEND=locmem (default, per process), file (shared between local
+# processes) or redis (any Redis-compatible server at CACHE_URL).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem')
+CACHE_TIMEOUT = env_int('CACHE_TIMEOUT', 300)
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_URL', 'redis://127.0.0.1:6379/0'),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'KEY_PREFIX': 'ecoconnect',
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', BASE_DIR / '.cache'),
+            'TIMEOUT': CACHE_TIMEOUT,
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ecoconnect',
+            'TIMEOUT': CACHE_TIMEOUT,
+        }
     }
+
+# Seconds to keep rendered event list pages for anonymous visitors (0 = off).
+# Pages are also dropped as soon as events or participations change.
+EVENT_LIST_CACHE_SECONDS = env_int('EVENT_LIST_CACHE_SECONDS', 60)
+
+# Filter the event list from an in-memory index (needs numpy). Other
+# processes' changes are replayed from a change log in the cache, so the
+# index needs a shared cache (file or redis) and is off with locmem. It is
+# rebuilt when the log has a gap, and at least every EVENT_INDEX_MAX_AGE
+# seconds (0 = only then).
+EVENT_INDEX = env_bool('EVENT_INDEX', CACHE_BACKEND != 'locmem')
+EVENT_INDEX_MAX_AGE = env_int('EVENT_INDEX_MAX_AGE', 600)
+
+# Join/leave token buckets: requests per minute per user, per second per event
+RATELIMIT_USER_PARTICIPATION = env_int('RATELIMIT_USER_PARTICIPATION', 20)
+RATELIMIT_EVENT_PARTICIPATION = env_int('RATELIMIT_EVENT_PARTICIPATION', 50)
+
+# Live participant counts and photos on event pages (events/live.py). The
+# stream stays open only under ASGI. Use LIVE_EVENTS_BACKEND=cache with a
+# shared cache (file or redis) when more than one process serves requests.
+LIVE_EVENTS_BACKEND = os.getenv('LIVE_EVENTS_BACKEND', 'local')
+LIVE_EVENTS_POLL = env_int('LIVE_EVENTS_POLL', 1)
+LIVE_EVENTS_HEARTBEAT = env_int('LIVE_EVENTS_HEARTBEAT', 20)
+
+# Crawlers get pre-rendered event pages from SNAPSHOT_ROOT (see
+# events/snapshots.py; refresh with python manage.py build_snapshots).
+BOT_SNAPSHOTS = env_bool('BOT_SNAPSHOTS', True)
+SNAPSHOT_ROOT = os.getenv('SNAPSHOT_ROOT', BASE_DIR / 'snapshots')
+SNAPSHOT_MAX_AGE = env_int('SNAPSHOT_MAX_AGE', 60 * 60 * 24)
+BOT_USER_AGENTS = os.getenv(
+    'BOT_USER_AGENTS',
+    r'bot|crawl|spider|slurp|facebookexternalhit|embedly|preview|whatsapp',
+)
+SITEMAP_CACHE_SECONDS = env_int('SITEMAP_CACHE_SECONDS', 600)
+
+# Time every template, include and block and count tag/filter calls
+# (ecoconnect/profiling.py). Slows rendering down; for development only.
+# Each request gets a Server-Timing header and an 'ecoconnect.profiling' log entry.
+TEMPLATE_PROFILING = env_bool('TEMPLATE_PROFILING', False)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'ecoconnect.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
+# Sessions and messages
+# =====================
+# SESSION_BACKEND=cached_db (default) reads sessions from the cache and writes
+# through to the database, so most requests never query django_session.
+# SESSION_BACKEND=signed_cookies keeps the session in a signed cookie and
+# never touches the database (logging out only clears that browser).
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'cached_db')
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
 }
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+
+# Flash messages ride along in a cookie instead of being saved to the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Events have no end time; the status scheduler (update_event_status) treats
+# them as ongoing for this many hours after they start.
+EVENT_DURATION_HOURS = env_int('EVENT_DURATION_HOURS', 3)
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -103,6 +224,14 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are served by ecoconnect.media.serve_media. Set MEDIA_ACCEL to
+# 'x-accel' (nginx, internal location MEDIA_ACCEL_PREFIX aliased to
+# MEDIA_ROOT) or 'x-sendfile' (Apache/lighttpd) to let the web server send
+# the file after Django checked the request.
+MEDIA_ACCEL = os.getenv('MEDIA_ACCEL', '')
+MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-media/')
+MEDIA_MAX_AGE = env_int('MEDIA_MAX_AGE', 60 * 60 * 24)
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
 FILE_UPLOAD_PERMISSIONS = 0o644
@@ -113,6 +242,23 @@ STATIC_URL = '/static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
+STATIC_ROOT = os.getenv('STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles'))
+
+# Served by WhiteNoiseMiddleware. With STATIC_MANIFEST (default when DEBUG is
+# off) run collectstatic on deploy: it minifies CSS, hashes file names and
+# precompresses everything, and hashed files are cached by browsers forever.
+STATIC_MANIFEST = env_bool('STATIC_MANIFEST', not DEBUG)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'ecoconnect.storage.MinifiedStaticFilesStorage' if STATIC_MANIFEST
+            else 'django.contrib.staticfiles.storage.StaticFilesStorage'
+        ),
+    },
+}
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -121,6 +267,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # =============================================
 SITE_ID = 1
 
+# Absolute base URL used in emails and feeds sent outside a request
+SITE_URL = os.getenv('SITE_URL', 'http://localhost:8000').rstrip('/')
+
 # EMAIL CONFIGURATION - GMAIL
 # ============================
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -142,5 +291,17 @@ if DEBUG:
     # EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
     pass
 
+# OUTBOUND EMAIL QUEUE
+# ====================
+# send_mail() only stores the message; `python manage.py send_queued_mail`
+# delivers it through EMAIL_QUEUE_BACKEND (the backend configured above).
+# Set EMAIL_QUEUE=0 to send synchronously again.
+if env_bool('EMAIL_QUEUE', True):
+    EMAIL_QUEUE_BACKEND = EMAIL_BACKEND
+    EMAIL_BACKEND = 'notifications.backends.QueuedEmailBackend'
+EMAIL_QUEUE_BATCH_SIZE = env_int('EMAIL_QUEUE_BATCH_SIZE', 100)
+EMAIL_QUEUE_MAX_ATTEMPTS = env_int('EMAIL_QUEUE_MAX_ATTEMPTS', 5)
+EMAIL_QUEUE_RETRY_DELAY = env_int('EMAIL_QUEUE_RETRY_DELAY', 60)  # seconds, doubles per attempt
+
 # Security settings for file uploads
 SECURE_FILE_UPLOADS = True
\ No newline at end of file
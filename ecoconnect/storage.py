@@ -0,0 +1,70 @@
+"""
+Static file storage for production.
+
+``collectstatic`` with MinifiedStaticFilesStorage:
+
+1. minifies CSS as it is copied into STATIC_ROOT;
+2. adds a content hash to every file name and writes staticfiles.json, so
+   ``{% static %}`` links change whenever a file does;
+3. writes .gz (and .br, when the Brotli package is installed) next to
+   each file.
+
+WhiteNoiseMiddleware then serves the precompressed variant the browser
+accepts, with far-future "immutable" cache headers for hashed names.
+"""
+
+import re
+
+from django.core.files.base import ContentFile
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+# Strings and comments, which the whitespace rules must not touch
+_CSS_PROTECTED = re.compile(r'''"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/''', re.DOTALL)
+# Spaces never matter next to these (unlike around ':' or '+', which can
+# separate selectors or calc() operands)
+_CSS_PUNCTUATION = re.compile(r' ?([{};,>]) ?')
+
+
+def _minify_code(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = _CSS_PUNCTUATION.sub(r'\1', code)
+    code = code.replace(': ', ':')
+    return code.replace(';}', '}')
+
+
+def minify_css(css):
+    """Drop comments and needless whitespace; /*! license */ comments stay."""
+    segments = []      # (is code, text), comments already removed
+    position = 0
+    for match in _CSS_PROTECTED.finditer(css):
+        segments.append((True, css[position:match.start()]))
+        token = match.group()
+        if token.startswith('/*') and not token.startswith('/*!'):
+            # A comment can be all that separates two words
+            segments.append((True, ' '))
+        else:
+            segments.append((False, token))
+        position = match.end()
+    segments.append((True, css[position:]))
+
+    out = []
+    code = ''
+    for is_code, text in segments:
+        if is_code:
+            code += text
+            continue
+        out.append(_minify_code(code))
+        out.append(text)
+        code = ''
+    out.append(_minify_code(code))
+    return ''.join(out).strip()
+
+
+class MinifiedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Hashed, precompressed static files with minified CSS"""
+
+    def _save(self, name, content):
+        if name.endswith('.css') and not name.endswith('.min.css'):
+            css = b''.join(content.chunks()).decode('utf-8')
+            content = ContentFile(minify_css(css).encode('utf-8'))
+        return super()._save(name, content)
@@ -0,0 +1,225 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+
+from events.models import Event
+from interaction.models import EventParticipation, UserHistory
+from search.models import SearchHistory
+from . import cache as cache_aside, profiling, routers
+from .media import parse_range
+from .ratelimit import take_token
+
+
+class RateLimitTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_empties_and_refills(self):
+        with mock.patch('ecoconnect.ratelimit.time.time', return_value=1000.0):
+            self.assertEqual([take_token('test', 3, 60) for _ in range(3)], [0, 0, 0])
+            self.assertAlmostEqual(take_token('test', 3, 60), 20.0)
+
+        # One token back every 20 seconds
+        with mock.patch('ecoconnect.ratelimit.time.time', return_value=1010.0):
+            self.assertAlmostEqual(take_token('test', 3, 60), 10.0)
+        with mock.patch('ecoconnect.ratelimit.time.time', return_value=1020.0):
+            self.assertEqual(take_token('test', 3, 60), 0)
+            self.assertGreater(take_token('test', 3, 60), 0)
+
+    def test_buckets_are_separate(self):
+        self.assertEqual(take_token('a', 1, 60), 0)
+        self.assertGreater(take_token('a', 1, 60), 0)
+        self.assertEqual(take_token('b', 1, 60), 0)
+
+    def test_busy_bucket_is_limited(self):
+        # Someone else holds the bucket's lock for the whole wait
+        cache.add('ratelimit:busy:lock', 1, 10)
+        self.assertAlmostEqual(take_token('busy', 10, 1), 0.1)
+
+    def test_zero_capacity_disables_the_limit(self):
+        self.assertEqual(take_token('off', 0, 60), 0)
+
+
+class CacheAsideTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = []
+
+    def compute(self, value='fresh'):
+        def compute():
+            self.calls.append(value)
+            return value
+        return compute
+
+    def test_hits_until_a_tag_is_invalidated(self):
+        tags = ('events', cache_aside.event_tag(1))
+        self.assertEqual(cache_aside.get_or_compute('page', self.compute('a'), tags=tags), 'a')
+        self.assertEqual(cache_aside.get_or_compute('page', self.compute('b'), tags=tags), 'a')
+
+        cache_aside.invalidate_tags(cache_aside.event_tag(2))
+        self.assertEqual(cache_aside.get_or_compute('page', self.compute('b'), tags=tags), 'a')
+
+        versions = cache_aside.invalidate_tags(cache_aside.event_tag(1))
+        self.assertEqual(cache_aside.tag_versions([cache_aside.event_tag(1)]), versions)
+        self.assertEqual(cache_aside.get_or_compute('page', self.compute('c'), tags=tags), 'c')
+        self.assertEqual(self.calls, ['a', 'c'])
+
+    def test_reads_close_to_expiry_refresh_early(self):
+        cache_aside.get_or_compute('xfetch', self.compute('old'), timeout=60)
+        full_key = cache_aside._full_key('xfetch', ())
+        value, _, _ = cache.get(full_key)
+        # Took 5 seconds to compute and expires in 3
+        cache.set(full_key, (value, 5.0, time.time() + 3), 60)
+
+        with mock.patch('ecoconnect.cache.random.random', return_value=0.0):
+            # -log(1) == 0: never early
+            self.assertEqual(cache_aside.get_or_compute('xfetch', self.compute('new'), timeout=60), 'old')
+        with mock.patch('ecoconnect.cache.random.random', return_value=0.9):
+            self.assertEqual(
+                cache_aside.get_or_compute('xfetch', self.compute('new'), timeout=60, beta=0), 'old'
+            )
+            self.assertEqual(cache_aside.get_or_compute('xfetch', self.compute('new'), timeout=60), 'new')
+        self.assertEqual(self.calls, ['old', 'new'])
+
+    def test_refresh_in_progress_serves_the_old_value(self):
+        cache_aside.get_or_compute('busy', self.compute('old'))
+        full_key = cache_aside._full_key('busy', ())
+        cache.set(full_key, ('old', 5.0, time.time()), 60)
+        cache.add(full_key + ':lock', 1, 10)
+        self.assertEqual(cache_aside.get_or_compute('busy', self.compute('new')), 'old')
+        self.assertEqual(self.calls, ['old'])
+
+    def test_miss_waits_for_the_lock_holder(self):
+        full_key = cache_aside._full_key('single', ())
+        cache.add(full_key + ':lock', 1, 10)
+
+        def other_caller_finishes(seconds):
+            cache.set(full_key, ('theirs', 0.1, time.time() + 60), 60)
+
+        with mock.patch('ecoconnect.cache.time.sleep', side_effect=other_caller_finishes):
+            self.assertEqual(cache_aside.get_or_compute('single', self.compute('mine')), 'theirs')
+        self.assertEqual(self.calls, [])
+
+    @mock.patch('ecoconnect.cache.LOCK_WAIT', 0.01)
+    def test_miss_computes_when_the_lock_holder_is_stuck(self):
+        cache.add(cache_aside._full_key('stuck', ()) + ':lock', 1, 10)
+        self.assertEqual(cache_aside.get_or_compute('stuck', self.compute('mine')), 'mine')
+        self.assertEqual(self.calls, ['mine'])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class RouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        token = routers.start_request()
+        self.addCleanup(routers.end_request, token)
+
+    def test_content_writes_pin_reads_to_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Event), 'replica')
+        self.assertEqual(self.router.db_for_write(EventParticipation), 'default')
+        self.assertTrue(routers.current_state().wrote)
+        self.assertEqual(self.router.db_for_read(Event), 'default')
+
+    def test_session_and_history_writes_do_not_pin(self):
+        for model in (Session, SearchHistory, UserHistory):
+            with self.subTest(model=model.__name__):
+                self.assertEqual(self.router.db_for_write(model), 'default')
+                self.assertFalse(routers.current_state().wrote)
+        self.assertEqual(self.router.db_for_read(Event), 'replica')
+
+    def test_replica_can_be_forced_after_a_write(self):
+        self.router.db_for_write(Event)
+        with routers.allow_replica():
+            self.assertEqual(self.router.db_for_read(Event), 'replica')
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+
+
+class MediaTests(SimpleTestCase):
+    CONTENT = bytes(range(256)) * 4
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        os.makedirs(os.path.join(media_root.name, 'event_photos'))
+        with open(os.path.join(media_root.name, 'event_photos', 'beach.jpg'), 'wb') as photo:
+            photo.write(self.CONTENT)
+        with open(os.path.join(media_root.name, 'notes.txt'), 'w') as stray:
+            stray.write('private')
+        settings_override = override_settings(MEDIA_ROOT=media_root.name, MEDIA_ACCEL='')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def get(self, path='/media/event_photos/beach.jpg', **headers):
+        return self.client.get(path, headers=headers)
+
+    def test_full_file_and_revalidation(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        etag = response['ETag']
+        self.assertEqual(self.get(**{'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.get(**{'If-Modified-Since': response['Last-Modified']}).status_code, 304)
+        self.assertEqual(self.get(**{'If-None-Match': '"stale"'}).status_code, 200)
+
+    def test_ranges(self):
+        response = self.get(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.CONTENT)}')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[10:20])
+
+        response = self.get(Range='bytes=-24')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.CONTENT[-24:])
+
+        response = self.get(Range='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.CONTENT)}')
+
+    def test_if_range_falls_back_to_the_whole_file(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(Range='bytes=0-9', **{'If-Range': etag}).status_code, 206)
+        self.assertEqual(self.get(Range='bytes=0-9', **{'If-Range': '"changed"'}).status_code, 200)
+
+    def test_only_upload_folders_are_served(self):
+        self.assertEqual(self.get('/media/notes.txt').status_code, 404)
+        self.assertEqual(self.get('/media/event_photos/missing.jpg').status_code, 404)
+        self.assertEqual(self.get('/media/event_photos/../notes.txt').status_code, 404)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-', 100), (0, 99))
+        self.assertEqual(parse_range('bytes=90-200', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-200', 100), (0, 99))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertFalse(parse_range('bytes=-0', 100))
+        self.assertFalse(parse_range('bytes=9-3', 100))
+
+    @override_settings(MEDIA_ACCEL='x-accel', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_accelerated_responses_carry_no_body(self):
+        response = self.get()
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/event_photos/beach.jpg')
+        self.assertEqual(response.content, b'')
+
+
+@override_settings(TEMPLATE_PROFILING=True)
+class TemplateProfilerTests(TestCase):
+    def test_requests_report_server_timing(self):
+        with self.assertLogs('ecoconnect.profiling', 'INFO'):
+            response = Client().get('/')
+        self.assertTrue(response['Server-Timing'].startswith('templates;dur='))
+
+    def test_an_outer_profile_collects_the_request(self):
+        profile, token = profiling.start()
+        try:
+            response = Client().get('/')
+        finally:
+            profiling.stop(token)
+        self.assertNotIn('Server-Timing', response)
+        self.assertGreater(profile.render_time, 0)
+        self.assertTrue(profile.timings)
@@ -1,16 +1,24 @@
 from django.contrib import admin
+from django.contrib.sitemaps.views import sitemap
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from django.views.decorators.cache import cache_page
+from django.views.generic import TemplateView
+from events.sitemaps import sitemaps
+from .media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('sitemap.xml', cache_page(settings.SITEMAP_CACHE_SECONDS)(sitemap), {'sitemaps': sitemaps},
+         name='django.contrib.sitemaps.views.sitemap'),
+    path('robots.txt', TemplateView.as_view(
+        template_name='robots.txt',
+        content_type='text/plain',
+        extra_context={'sitemap_url': settings.SITE_URL + '/sitemap.xml'},
+    )),
     path('', include('search.urls')),  # Homepage only
     path('users/', include('users.urls')),
     path('events/', include('events.urls')),
     path('interaction/', include('interaction.urls')),
-]
-
-# Media files serving during development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', serve_media, name='media'),
+]
\ No newline at end of file
@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class EventsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'events'
+
+    def ready(self):
+        backend = settings.CACHES['default']['BACKEND']
+        if settings.EVENT_INDEX and backend.endswith(('LocMemCache', 'DummyCache')):
+            # Every process would keep serving its own stale index
+            raise ImproperlyConfigured(
+                'EVENT_INDEX needs a cache shared by all processes; '
+                'set CACHE_BACKEND=file or redis, or EVENT_INDEX=0.'
+            )
+        from . import signals  # noqa: F401
+        from . import index  # noqa: F401
+        from . import live  # noqa: F401
+        from . import snapshots  # noqa: F401
@@ -0,0 +1,163 @@
+"""
+iCalendar (.ics) feeds of upcoming events.
+
+Two kinds of feed share the same machinery:
+
+- a personal feed per user (events they joined or organize), reached
+  through a signed token URL because calendar apps can't log in;
+- a public feed for any EventListView filter combination.
+
+Calendar apps poll feeds every few minutes, so a poll should cost as
+little as possible:
+
+1. One query reads (id, updated_at) of the events in the feed. Its hash is
+   the ETag; an unchanged feed answers 304 Not Modified right there.
+2. Every event's VEVENT text is cached under its id and updated_at. Only
+   new or changed events are loaded and rendered again.
+3. The assembled body is cached under the ETag for clients that don't send
+   If-None-Match.
+"""
+
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from notifications.jobs import absolute_url
+from .models import Event
+
+FEED_PAST_DAYS = 30        # keep recent events so they don't vanish from calendars
+MAX_FEED_EVENTS = 500
+VEVENT_TIMEOUT = 7 * 24 * 3600
+FEED_TIMEOUT = 3600
+POLL_SECONDS = 300         # Cache-Control max-age for calendar apps
+
+TOKEN_SALT = 'events.feeds.user'
+
+
+def user_token(user):
+    """Token for the user's personal feed URL."""
+    return signing.Signer(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def user_id_from_token(token):
+    """Raises signing.BadSignature for tampered or foreign tokens."""
+    return int(signing.Signer(salt=TOKEN_SALT).unsign(token))
+
+
+def user_feed_events(user_id):
+    return Event.objects.filter(
+        Q(eventparticipation__user_id=user_id) | Q(organizer_id=user_id)
+    ).distinct()
+
+
+def _escape(text):
+    """TEXT value escaping from RFC 5545."""
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into chunks of at most 75 octets."""
+    chunks = []
+    current, size = '', 0
+    for char in line:
+        width = len(char.encode('utf-8'))
+        if size + width > 75:
+            chunks.append(current)
+            # Continuation lines start with a space, which counts too
+            current, size = ' ', 1
+        current += char
+        size += width
+    chunks.append(current)
+    return '\r\n'.join(chunks)
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render_vevent(event):
+    """The VEVENT block for one event, needs location and category."""
+    url = absolute_url(event.get_absolute_url())
+    description = f'{event.description}\n\n{url}'
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{event.id}@ecoconnect',
+        f'DTSTAMP:{_utc(event.updated_at)}',
+        f'LAST-MODIFIED:{_utc(event.updated_at)}',
+        f'DTSTART:{_utc(event.date_time)}',
+        f'SUMMARY:{_escape(event.title)}',
+        f'DESCRIPTION:{_escape(description)}',
+        f'LOCATION:{_escape(event.full_location())}',
+        f'CATEGORIES:{_escape(event.category.name)}',
+        f'URL:{url}',
+        'END:VEVENT',
+    ]
+    return '\r\n'.join(_fold(line) for line in lines)
+
+
+def _vevent_key(event_id, updated_at):
+    return f'ical:vevent:{event_id}:{updated_at.timestamp()}'
+
+
+def build_calendar(name, rows):
+    """Assemble a VCALENDAR from (id, updated_at) rows, rendering only cache misses."""
+    keys = [_vevent_key(event_id, updated_at) for event_id, updated_at in rows]
+    vevents = cache.get_many(keys)
+
+    missing = [event_id for (event_id, _), key in zip(rows, keys) if key not in vevents]
+    if missing:
+        rendered = {}
+        for event in Event.objects.select_related('location', 'category').filter(id__in=missing):
+            rendered[_vevent_key(event.id, event.updated_at)] = render_vevent(event)
+        cache.set_many(rendered, VEVENT_TIMEOUT)
+        vevents.update(rendered)
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//EcoConnect//Events//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        _fold(f'X-WR-CALNAME:{_escape(name)}'),
+    ]
+    # An event changed between the two queries is left out until the next poll
+    lines.extend(vevents[key] for key in keys if key in vevents)
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(lines) + '\r\n'
+
+
+def feed_response(request, name, queryset, private=False):
+    """The .ics response for the events in ``queryset``, or 304 if unchanged."""
+    since = timezone.now() - timedelta(days=FEED_PAST_DAYS)
+    rows = list(
+        queryset.filter(date_time__gte=since)
+        .order_by('date_time', 'id')
+        .values_list('id', 'updated_at')[:MAX_FEED_EVENTS]
+    )
+    etag = hashlib.sha1(repr((name, rows)).encode()).hexdigest()
+
+    response = get_conditional_response(request, etag=quote_etag(etag))
+    if response is None:
+        body_key = f'ical:feed:{etag}'
+        body = cache.get(body_key)
+        if body is None:
+            body = build_calendar(name, rows)
+            cache.set(body_key, body, FEED_TIMEOUT)
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+    response['ETag'] = quote_etag(etag)
+
+    if private:
+        patch_cache_control(response, private=True, max_age=POLL_SECONDS)
+    else:
+        patch_cache_control(response, public=True, max_age=POLL_SECONDS)
+    return response
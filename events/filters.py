@@ -0,0 +1,239 @@
+from django.db.models import Q, Case, When, IntegerField, F
+from django.utils import timezone
+from django.utils.http import urlencode
+from datetime import timedelta
+
+# Query parameters understood by EventListView and their default values.
+# A parameter equal to its default filters nothing, so it is dropped when
+# building cache keys.
+FILTER_DEFAULTS = {
+    'search': '',
+    'category': '',
+    'date': '',
+    'location': '',
+    'date_range': '',
+    'start_date': '',
+    'end_date': '',
+    'status': '',
+    'availability': '',
+    'sort': 'date',
+    'page': '1',
+}
+
+DATE_PARAMS = ('date', 'start_date', 'end_date')
+RELATIVE_DATE_RANGES = ('today', 'week', 'month')
+
+
+def normalize_date(value):
+    """Return the date as YYYY-MM-DD, or '' if it can't be parsed"""
+    try:
+        return timezone.datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        return ''
+
+
+def clean_filter(name, value):
+    """Normalized value of one filter parameter ('' for none or invalid)"""
+    value = ' '.join(value.split())
+    if name in DATE_PARAMS and value:
+        value = normalize_date(value)
+    return value
+
+
+class EventFilters:
+    """
+    The event list filters of one request, parsed once.
+
+    Every filter is normalized here (whitespace collapsed, dates in ISO
+    form, tag ids deduplicated) and filter_events, the index, the cache
+    keys and the links all use these values, so requests that share a
+    cache key also match the same events.
+
+    Carries the form values for the template, the canonical querystring
+    (for pagination, calendar and other links), the selected tags and the
+    cache keys of everything that depends on the filters.
+    """
+
+    def __init__(self, query):
+        for name, default in FILTER_DEFAULTS.items():
+            setattr(self, name, clean_filter(name, query.get(name, '')) or default)
+        self.tags = sorted({tag.strip() for tag in query.getlist('tags') if tag.strip().isdigit()}, key=int)
+        self.selected_tags = []
+
+        self.active = any(
+            getattr(self, name) for name in FILTER_DEFAULTS if name not in ('sort', 'page')
+        ) or bool(self.tags)
+
+        self.params = self._canonical()
+        # 'today' only keys the cache; 'page' is added per link
+        self.querystring = urlencode(
+            [(name, value) for name, value in self.params if name not in ('today', 'page')],
+            doseq=True,
+        )
+
+    def _canonical(self):
+        """
+        The filters as a canonical, hashable tuple.
+
+        Links shared around differ in parameter order, blank fields, tracking
+        parameters and tag order; all of those map to the same tuple here so
+        they can share one cached page.
+        """
+        params = {
+            name: getattr(self, name) for name, default in FILTER_DEFAULTS.items()
+            if getattr(self, name) != default
+        }
+
+        # Custom start/end dates are ignored unless the custom range is chosen
+        if params.get('date_range') != 'custom':
+            params.pop('start_date', None)
+            params.pop('end_date', None)
+
+        # Relative ranges move with the calendar
+        if params.get('date_range') in RELATIVE_DATE_RANGES:
+            params['today'] = timezone.now().date().isoformat()
+
+        if self.tags:
+            params['tags'] = tuple(self.tags)
+
+        return tuple(sorted(params.items()))
+
+    def cache_key(self, prefix, ignore=()):
+        params = tuple((name, value) for name, value in self.params if name not in ignore)
+        return '%s:%r' % (prefix, params)
+
+    def page_url(self, number):
+        if number == 1:
+            return '?' + self.querystring if self.querystring else '?'
+        return '?%s%spage=%d' % (self.querystring, '&' if self.querystring else '', number)
+
+    def page_links(self, page_obj, window=2):
+        """First/previous/next/last and numbered page URLs around the current page"""
+        number = page_obj.number
+        last = page_obj.paginator.num_pages
+        return {
+            'first': self.page_url(1),
+            'previous': self.page_url(number - 1) if page_obj.has_previous() else None,
+            'next': self.page_url(number + 1) if page_obj.has_next() else None,
+            'last': self.page_url(last),
+            'numbers': [
+                (num, self.page_url(num))
+                for num in range(max(number - window, 1), min(number + window, last) + 1)
+            ],
+        }
+
+    def resolve_tags(self, tags):
+        """Mark the selected tags among ``tags`` and keep them, in filter order."""
+        tags_by_id = {str(tag.id): tag for tag in tags}
+        for tag in tags:
+            tag.selected = False
+        self.selected_tags = []
+        for tag_id in self.tags:
+            tag = tags_by_id.get(tag_id)
+            if tag is not None and not tag.selected:
+                tag.selected = True
+                self.selected_tags.append(tag)
+
+
+def filter_events(queryset, filters):
+    """
+    Apply the EventListView filters and sort order in ``filters`` (an
+    EventFilters) to an Event queryset annotated with participant_count.
+    """
+    search_query = filters.search
+    category_filter = filters.category
+    date_filter = filters.date
+    location_filter = filters.location
+    date_range_filter = filters.date_range
+    start_date = filters.start_date
+    end_date = filters.end_date
+    status_filter = filters.status
+    availability_filter = filters.availability
+    sort_filter = filters.sort
+    tags_filter = filters.tags
+    
+    # Keyword search
+    if search_query:
+        queryset = queryset.filter(
+            Q(title__icontains=search_query) | 
+            Q(description__icontains=search_query) |
+            Q(address_details__icontains=search_query) |
+            Q(location__name__icontains=search_query) |
+            Q(organizer__first_name__icontains=search_query) |
+            Q(organizer__last_name__icontains=search_query) |
+            Q(tags__name__icontains=search_query)
+        ).distinct()
+    
+    # Category filter
+    if category_filter:
+        queryset = queryset.filter(category__name__iexact=category_filter)
+    
+    # Tags filter
+    if tags_filter:
+        queryset = queryset.filter(tags__id__in=tags_filter).distinct()
+    
+    # Location filter
+    if location_filter:
+        queryset = queryset.filter(location__name__iexact=location_filter)
+    
+    # Specific date filter
+    if date_filter:
+        try:
+            filter_date = timezone.datetime.strptime(date_filter, '%Y-%m-%d').date()
+            queryset = queryset.filter(date_time__date=filter_date)
+        except ValueError:
+            pass
+    
+    # Date range filters
+    if date_range_filter:
+        now = timezone.now()
+        if date_range_filter == 'today':
+            queryset = queryset.filter(date_time__date=now.date())
+        elif date_range_filter == 'week':
+            start_week = now.date()
+            end_week = start_week + timedelta(days=7)
+            queryset = queryset.filter(date_time__date__range=[start_week, end_week])
+        elif date_range_filter == 'month':
+            start_month = now.date().replace(day=1)
+            if start_month.month == 12:
+                end_month = start_month.replace(year=start_month.year + 1, month=1)
+            else:
+                end_month = start_month.replace(month=start_month.month + 1)
+            queryset = queryset.filter(date_time__date__range=[start_month, end_month])
+        elif date_range_filter == 'custom' and start_date and end_date:
+            try:
+                start_dt = timezone.datetime.strptime(start_date, '%Y-%m-%d').date()
+                end_dt = timezone.datetime.strptime(end_date, '%Y-%m-%d').date()
+                if start_dt <= end_dt:
+                    queryset = queryset.filter(date_time__date__range=[start_dt, end_dt])
+            except ValueError:
+                pass
+    
+    # Status filter
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+    
+    # Availability filter
+    if availability_filter:
+        if availability_filter == 'available':
+            queryset = queryset.annotate(
+                spots_available=Case(
+                    When(participant_count__lt=F('max_participants'), then=1),
+                    default=0,
+                    output_field=IntegerField()
+                )
+            ).filter(spots_available=1)
+        elif availability_filter == 'full':
+            queryset = queryset.filter(participant_count__gte=F('max_participants'))
+    
+    # Sorting
+    if sort_filter == 'title':
+        queryset = queryset.order_by('title')
+    elif sort_filter == 'participants':
+        queryset = queryset.order_by('-participant_count')
+    elif sort_filter == 'created':
+        queryset = queryset.order_by('-created_at')
+    else:  # default: date
+        queryset = queryset.order_by('date_time')
+    
+    return queryset
@@ -0,0 +1,539 @@
+"""
+In-memory index for filtering the event list.
+
+The whole event table fits in memory, so each process can keep it as a set
+of NumPy columns (one row per event):
+
+- numeric columns for start time, local start date, creation time,
+  participant count and capacity;
+- one boolean array (bitmap) per category, location, status and tag.
+
+A filter combination then becomes a few bitwise ANDs/ORs and comparisons
+over those arrays, followed by a sort of the matching rows. The database is
+only asked for the events on the requested page.
+
+Rows are refreshed one event at a time from model signals once the write
+commits. Writes made by other processes are noticed through the cache tag
+versions ('events', 'participations'): whichever process bumps a version
+also logs the ids of the events it changed under that version, and the
+other processes re-read just those rows. Only a missing log entry (it
+expired, the writer died between the bump and the log, or the version was
+reset) forces a full rebuild. This needs a cache shared by all processes,
+which is why EVENT_INDEX is refused with the per-process locmem cache.
+
+Keyword search is not indexed; those requests still go to SQL.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; without it EventListView uses SQL
+    np = None
+
+from ecoconnect.cache import event_tag, tag_versions, tags_invalidated
+from ecoconnect.routers import pin_to_primary
+from interaction.models import EventParticipation
+from search.models import Location, EventTag
+from .models import Event, EventCategory
+from .signals import event_status_changed
+
+VERSION_TAGS = ('events', 'participations')
+
+EVENT_FIELDS = (
+    'id', 'title', 'date_time', 'created_at', 'status',
+    'category_id', 'location_id', 'participant_count', 'max_participants',
+)
+
+# How long change log entries live, and the most versions a process will
+# replay from the log before it rebuilds instead
+CHANGE_LOG_TIMEOUT = 3600
+CHANGE_LOG_MAX = 1000
+
+_EVENT_TAG_PREFIX = event_tag('')
+
+
+def _timestamp(value):
+    return value.timestamp() if value else 0.0
+
+
+def _local_date(value):
+    # Same date Django compares against for date_time__date with USE_TZ on
+    return timezone.localtime(value).date().toordinal()
+
+
+def _change_key(tag, version):
+    return f'index:changes:{tag}:{version}'
+
+
+def log_changes(versions):
+    """
+    Record which events an invalidation changed, under each new version of
+    the index's tags, for the other processes' indexes to replay.
+    """
+    event_ids = [
+        int(tag[len(_EVENT_TAG_PREFIX):]) for tag in versions if tag.startswith(_EVENT_TAG_PREFIX)
+    ]
+    entries = {
+        _change_key(tag, versions[tag]): event_ids for tag in VERSION_TAGS if tag in versions
+    }
+    # Without event ids there is nothing to replay; the missing entry
+    # makes readers rebuild
+    if entries and event_ids:
+        cache.set_many(entries, CHANGE_LOG_TIMEOUT)
+
+
+class EventIndex:
+    """Column store plus bitmaps over all events."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.versions = {}
+        # Tag versions produced by invalidations in this process, not yet applied
+        self.own_versions = defaultdict(set)
+        self.built_at = None
+        self.build()
+
+    # Building and refreshing
+    # =======================
+
+    def build(self):
+        # Read the versions first: a write during the build then forces another
+        versions = tag_versions(VERSION_TAGS)
+        # The versions are already committed on the primary; a lagging
+        # replica could hand us older rows
+        with pin_to_primary():
+            events = list(
+                Event.objects.annotate(
+                    participant_count=Count('eventparticipation')
+                ).order_by('id').values_list(*EVENT_FIELDS)
+            )
+            tags = defaultdict(list)
+            for event_id, tag_id in Event.tags.through.objects.values_list('event_id', 'eventtag_id'):
+                tags[event_id].append(tag_id)
+
+        size = len(events)
+        columns = {
+            'id': np.zeros(size, dtype=np.int64),
+            'title': np.array([row[1] for row in events], dtype=object),
+            'date_time': np.zeros(size, dtype=np.float64),
+            'local_date': np.zeros(size, dtype=np.int32),
+            'created_at': np.zeros(size, dtype=np.float64),
+            'participants': np.zeros(size, dtype=np.int64),
+            'capacity': np.zeros(size, dtype=np.int64),
+            'alive': np.zeros(size, dtype=bool),
+        }
+
+        with self.lock:
+            self.columns = columns
+            self.bitmaps = {}
+            self.rows = {}
+            # Rows in use; the arrays may be longer (see _append_row)
+            self.size = size
+            for row, values in enumerate(events):
+                self.rows[values[0]] = row
+                self._set_row(row, values, tags.get(values[0], ()))
+            with pin_to_primary():
+                self._load_names()
+            self.versions = versions
+            self.own_versions.clear()
+            self.built_at = time.monotonic()
+            self.stale = False
+
+    def _load_names(self):
+        # Filters use names (category=Beach Cleanup); bitmaps are keyed by id
+        self.category_ids = defaultdict(set)
+        for pk, name in EventCategory.objects.values_list('id', 'name'):
+            self.category_ids[name.lower()].add(pk)
+        self.location_ids = defaultdict(set)
+        for pk, name in Location.objects.values_list('id', 'name'):
+            self.location_ids[name.lower()].add(pk)
+
+    def _bitmap(self, kind, value):
+        key = (kind, value)
+        if key not in self.bitmaps:
+            self.bitmaps[key] = np.zeros(len(self.columns['id']), dtype=bool)
+        return self.bitmaps[key]
+
+    def _set_row(self, row, values, tag_ids):
+        (event_id, title, date_time, created_at, status,
+         category_id, location_id, participants, capacity) = values
+        columns = self.columns
+        columns['id'][row] = event_id
+        columns['title'][row] = title
+        columns['date_time'][row] = _timestamp(date_time)
+        columns['local_date'][row] = _local_date(date_time)
+        columns['created_at'][row] = _timestamp(created_at)
+        columns['participants'][row] = participants
+        columns['capacity'][row] = capacity
+        columns['alive'][row] = True
+        self._bitmap('category', category_id)[row] = True
+        self._bitmap('location', location_id)[row] = True
+        self._bitmap('status', status)[row] = True
+        for tag_id in tag_ids:
+            self._bitmap('tag', tag_id)[row] = True
+
+    def _clear_row(self, row):
+        self.columns['alive'][row] = False
+        for bitmap in self.bitmaps.values():
+            bitmap[row] = False
+
+    def _append_row(self):
+        row = self.size
+        capacity = len(self.columns['id'])
+        if row == capacity:
+            # Grow by doubling so appends stay cheap; spare rows are not
+            # alive and in no bitmap, so filters never match them
+            capacity = max(2 * capacity, 64)
+            for name, column in self.columns.items():
+                self.columns[name] = self._grown(column, capacity)
+            for key, bitmap in self.bitmaps.items():
+                self.bitmaps[key] = self._grown(bitmap, capacity)
+        self.size += 1
+        return row
+
+    @staticmethod
+    def _grown(array, capacity):
+        grown = np.zeros(capacity, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def refresh_events(self, event_ids):
+        """Re-read the given events (and their tags and participant counts)."""
+        event_ids = set(event_ids)
+        with pin_to_primary():
+            found = {
+                values[0]: values
+                for values in Event.objects.filter(id__in=event_ids).annotate(
+                    participant_count=Count('eventparticipation')
+                ).values_list(*EVENT_FIELDS)
+            }
+            tags = defaultdict(list)
+            for event_id, tag_id in Event.tags.through.objects.filter(
+                event_id__in=event_ids
+            ).values_list('event_id', 'eventtag_id'):
+                tags[event_id].append(tag_id)
+
+        with self.lock:
+            for event_id in event_ids:
+                row = self.rows.get(event_id)
+                if row is not None:
+                    self._clear_row(row)
+                values = found.get(event_id)
+                if values is None:
+                    self.rows.pop(event_id, None)
+                else:
+                    if row is None:
+                        row = self.rows[event_id] = self._append_row()
+                    self._set_row(row, values, tags[event_id])
+
+    def refresh_event(self, event_id):
+        """Re-read one event."""
+        self.refresh_events([event_id])
+
+    def set_status(self, event_ids, status):
+        """Apply a bulk status change made with update()."""
+        with self.lock:
+            rows = [self.rows[event_id] for event_id in event_ids if event_id in self.rows]
+            for (kind, _), bitmap in self.bitmaps.items():
+                if kind == 'status':
+                    bitmap[rows] = False
+            self._bitmap('status', status)[rows] = True
+
+    def note_invalidation(self, versions):
+        """Remember versions produced by this process's own writes."""
+        with self.lock:
+            for tag in VERSION_TAGS:
+                if tag in versions:
+                    self.own_versions[tag].add(versions[tag])
+
+    def _catch_up(self):
+        # Step over consecutive increments made here; any other increment
+        # (another process, or a version reset) stops the walk
+        for tag in VERSION_TAGS:
+            own = self.own_versions[tag]
+            while self.versions.get(tag) is not None and self.versions[tag] + 1 in own:
+                self.versions[tag] += 1
+                own.discard(self.versions[tag])
+
+    def _expired(self):
+        max_age = settings.EVENT_INDEX_MAX_AGE
+        return self.stale or bool(max_age and time.monotonic() - self.built_at > max_age)
+
+    def is_current(self):
+        if self._expired():
+            return False
+        with self.lock:
+            self._catch_up()
+            return tag_versions(VERSION_TAGS) == self.versions
+
+    def sync(self):
+        """
+        Catch up with other processes' writes by re-reading the events they
+        logged. Returns False when a full build is needed instead.
+        """
+        if self._expired():
+            return False
+        with self.lock:
+            self._catch_up()
+            current = tag_versions(VERSION_TAGS)
+            if current == self.versions:
+                return True
+
+            wanted = []
+            for tag in VERSION_TAGS:
+                ours, latest = self.versions.get(tag), current[tag]
+                if ours is None or not 0 <= latest - ours <= CHANGE_LOG_MAX:
+                    return False
+                wanted += [
+                    _change_key(tag, version) for version in range(ours + 1, latest + 1)
+                    if version not in self.own_versions[tag]
+                ]
+            logged = cache.get_many(wanted)
+            if len(logged) < len(wanted):
+                return False
+
+            event_ids = set()
+            for ids in logged.values():
+                event_ids.update(ids)
+            self.refresh_events(event_ids)
+            # A new category or location elsewhere needs its name mapped
+            with pin_to_primary():
+                self._load_names()
+            self.versions = current
+            for tag in VERSION_TAGS:
+                self.own_versions[tag] = {
+                    version for version in self.own_versions[tag] if version > current[tag]
+                }
+            return True
+
+    # Filtering
+    # =========
+
+    def supports(self, filters):
+        """Whether every filter in ``filters`` can be answered from the index."""
+        return not filters.search
+
+    def _any(self, kind, values):
+        mask = np.zeros(len(self.columns['id']), dtype=bool)
+        for value in values:
+            bitmap = self.bitmaps.get((kind, value))
+            if bitmap is not None:
+                mask |= bitmap
+        return mask
+
+    def match(self, filters):
+        """Boolean mask of the events matching ``filters``; mirrors filter_events."""
+        columns = self.columns
+        mask = columns['alive'].copy()
+
+        category_filter = filters.category
+        if category_filter:
+            mask &= self._any('category', self.category_ids.get(category_filter.lower(), ()))
+
+        tags_filter = filters.tags
+        if tags_filter:
+            mask &= self._any('tag', {int(tag) for tag in tags_filter})
+
+        location_filter = filters.location
+        if location_filter:
+            mask &= self._any('location', self.location_ids.get(location_filter.lower(), ()))
+
+        date_filter = filters.date
+        if date_filter:
+            mask &= columns['local_date'] == timezone.datetime.fromisoformat(date_filter).toordinal()
+
+        date_range = self._date_range(filters)
+        if date_range:
+            start, end = date_range
+            mask &= (columns['local_date'] >= start.toordinal()) & (columns['local_date'] <= end.toordinal())
+
+        status_filter = filters.status
+        if status_filter:
+            mask &= self._any('status', [status_filter])
+
+        availability_filter = filters.availability
+        if availability_filter == 'available':
+            mask &= columns['participants'] < columns['capacity']
+        elif availability_filter == 'full':
+            mask &= columns['participants'] >= columns['capacity']
+
+        return mask
+
+    def _date_range(self, filters):
+        date_range_filter = filters.date_range
+        today = timezone.now().date()
+        if date_range_filter == 'today':
+            return today, today
+        if date_range_filter == 'week':
+            return today, today + timedelta(days=7)
+        if date_range_filter == 'month':
+            start_month = today.replace(day=1)
+            if start_month.month == 12:
+                end_month = start_month.replace(year=start_month.year + 1, month=1)
+            else:
+                end_month = start_month.replace(month=start_month.month + 1)
+            return start_month, end_month
+        if date_range_filter == 'custom':
+            start = filters.start_date
+            end = filters.end_date
+            if start and end and start <= end:
+                return timezone.datetime.fromisoformat(start).date(), timezone.datetime.fromisoformat(end).date()
+        return None
+
+    def sorted_ids(self, mask, sort):
+        """Ids of the rows in ``mask`` in the list's sort order."""
+        columns = self.columns
+        rows = np.flatnonzero(mask)
+        ids = columns['id'][rows]
+        if sort == 'title':
+            order = sorted(range(len(rows)), key=lambda i: (columns['title'][rows[i]], ids[i]))
+        elif sort == 'participants':
+            order = np.lexsort((ids, -columns['participants'][rows]))
+        elif sort == 'created':
+            order = np.lexsort((ids, -columns['created_at'][rows]))
+        else:  # default: date
+            order = np.lexsort((ids, columns['date_time'][rows]))
+        return ids[order].tolist()
+
+    def facets(self, mask):
+        """Facet counts in the same shape as events.facets.count_facets."""
+        counts = {'category': {}, 'location': {}, 'tag': {}, 'status': {}}
+        for (kind, value), bitmap in self.bitmaps.items():
+            count = int(np.count_nonzero(bitmap & mask))
+            if count:
+                counts[kind][value] = count
+        full = int(np.count_nonzero(mask & (self.columns['participants'] >= self.columns['capacity'])))
+        total = int(np.count_nonzero(mask))
+        counts['availability'] = {key: value for key, value in (('available', total - full), ('full', full)) if value}
+        counts['total'] = total
+        return counts
+
+    def search(self, filters):
+        """Run ``filters`` (EventFilters) and return (sorted ids, facets)."""
+        with self.lock:
+            mask = self.match(filters)
+            return self.sorted_ids(mask, filters.sort), self.facets(mask)
+
+
+class IndexedEvents:
+    """
+    Sequence of index results for the paginator.
+
+    Only the slice the paginator asks for is loaded from the database, in
+    the index's order, using the view's queryset.
+    """
+
+    def __init__(self, ids, facets, queryset):
+        self.ids = ids
+        self.facets = facets
+        self.queryset = queryset
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        page_ids = self.ids[index]
+        events = {event.id: event for event in self.queryset.filter(id__in=page_ids)}
+        return [events[event_id] for event_id in page_ids if event_id in events]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def event_index():
+    """The process-wide index, built or rebuilt on demand; None when disabled."""
+    global _index
+    if not settings.EVENT_INDEX or np is None:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = EventIndex()
+        elif not _index.sync():
+            _index.build()
+        return _index
+
+
+def search_events(queryset, filters):
+    """
+    Answer the EventListView filters from the index.
+
+    Returns an IndexedEvents sequence, or None when the index is disabled or
+    the filters need SQL (keyword search).
+    """
+    index = event_index()
+    if index is None or not index.supports(filters):
+        return None
+    ids, facets = index.search(filters)
+    return IndexedEvents(ids, facets, queryset)
+
+
+# Incremental refresh
+# ===================
+
+def _refresh_on_commit(event_id):
+    if _index is not None:
+        transaction.on_commit(lambda: _index.refresh_event(event_id))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def index_event_changed(sender, instance, **kwargs):
+    _refresh_on_commit(instance.pk)
+
+
+@receiver(m2m_changed, sender=Event.tags.through)
+def index_event_tags_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _refresh_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=EventParticipation)
+@receiver(post_delete, sender=EventParticipation)
+def index_participation_changed(sender, instance, **kwargs):
+    _refresh_on_commit(instance.event_id)
+
+
+@receiver(tags_invalidated)
+def index_tags_invalidated(sender, versions, **kwargs):
+    # Logged by every process that writes (cron jobs, workers), not just
+    # the ones serving the list
+    if settings.EVENT_INDEX:
+        log_changes(versions)
+    if _index is not None:
+        _index.note_invalidation(versions)
+
+
+@receiver(event_status_changed)
+def index_status_changed(sender, event_ids, status, **kwargs):
+    if _index is not None:
+        _index.set_status(event_ids, status)
+
+
+@receiver(post_save, sender=EventCategory)
+@receiver(post_delete, sender=EventCategory)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=EventTag)
+@receiver(post_delete, sender=EventTag)
+def index_names_changed(sender, **kwargs):
+    # Renames change which ids a filter name maps to; rebuild on next use
+    if _index is not None:
+        _index.stale = True
@@ -0,0 +1,201 @@
+"""
+Live updates for the event detail page (Server-Sent Events).
+
+Signals publish small messages per event: the participant count when
+someone joins or leaves, and new photos when they are uploaded. One
+in-process Broker fans each message out to every open stream of that
+event; each stream has its own asyncio queue.
+
+LIVE_EVENTS_BACKEND picks how messages travel between processes:
+
+- local (default): delivered straight to this process's streams. Right for
+  a single ASGI process serving both the pages and the streams.
+- cache: messages are appended to a short per-event log in the shared
+  cache (file or redis). Every process runs one relay task per event that
+  has open streams; it polls the log every LIVE_EVENTS_POLL seconds and
+  fans the new messages out locally. Use it with several worker processes
+  or when WSGI workers handle the writes.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from interaction.models import EventParticipation, PhotoUpload
+from .models import Event
+
+QUEUE_SIZE = 100      # messages a slow stream may fall behind before losing some
+LOG_SIZE = 50         # messages kept per event for relays in cache mode
+LOG_TIMEOUT = 300     # seconds
+
+
+def _seq_key(event_id):
+    return f'live:{event_id}:seq'
+
+
+def _message_key(event_id, seq):
+    return f'live:{event_id}:{seq}'
+
+
+def _put(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        # Counts are sent whole, so the next message repairs a dropped one
+        pass
+
+
+class Broker:
+    """Fans messages out to the open streams of each event"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)   # event id -> {(loop, queue)}
+        self._relays = {}                      # event id -> relay task
+
+    def subscribe(self, event_id):
+        """Open a queue for a stream; must be called on its event loop."""
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[event_id].add((loop, queue))
+            if settings.LIVE_EVENTS_BACKEND == 'cache' and event_id not in self._relays:
+                self._relays[event_id] = loop.create_task(self._relay(event_id))
+        return queue
+
+    def unsubscribe(self, event_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(event_id, set())
+            subscribers.discard((asyncio.get_running_loop(), queue))
+            if not subscribers:
+                self._subscribers.pop(event_id, None)
+
+    def has_subscribers(self, event_id):
+        return event_id in self._subscribers
+
+    def deliver(self, event_id, message):
+        """Hand a message to this process's streams; safe from any thread."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(event_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_put, queue, message)
+            except RuntimeError:
+                # The stream's loop is already closed
+                pass
+
+    async def _relay(self, event_id):
+        """Copy messages from the shared cache log to local streams."""
+        last = await cache.aget(_seq_key(event_id), 0)
+        while True:
+            await asyncio.sleep(settings.LIVE_EVENTS_POLL)
+            with self._lock:
+                if event_id not in self._subscribers:
+                    del self._relays[event_id]
+                    return
+
+            current = await cache.aget(_seq_key(event_id), 0)
+            if current > last:
+                seqs = range(max(last + 1, current - LOG_SIZE + 1), current + 1)
+                found = await cache.aget_many([_message_key(event_id, seq) for seq in seqs])
+                for seq in seqs:
+                    message = found.get(_message_key(event_id, seq))
+                    if message is not None:
+                        self.deliver(event_id, message)
+            # A smaller sequence means the log expired or was evicted
+            last = current
+
+
+broker = Broker()
+
+
+def publish(event_id, kind, data):
+    """Send a message to everyone watching the event."""
+    message = (kind, data)
+    if settings.LIVE_EVENTS_BACKEND != 'cache':
+        broker.deliver(event_id, message)
+        return
+
+    seq_key = _seq_key(event_id)
+    cache.add(seq_key, 0, LOG_TIMEOUT)
+    try:
+        seq = cache.incr(seq_key)
+    except ValueError:
+        # The counter expired between add() and incr()
+        cache.add(seq_key, 0, LOG_TIMEOUT)
+        seq = cache.incr(seq_key)
+    cache.set(_message_key(event_id, seq), message, LOG_TIMEOUT)
+    cache.touch(seq_key, LOG_TIMEOUT)
+
+
+def format_message(kind, data):
+    """One SSE frame."""
+    return f'event: {kind}\ndata: {json.dumps(data)}\n\n'
+
+
+def participants_data(event_id):
+    event = Event.objects.only('max_participants').get(id=event_id)
+    count = EventParticipation.objects.filter(event_id=event_id).count()
+    return {
+        'count': count,
+        'max': event.max_participants,
+        'is_full': count >= event.max_participants,
+    }
+
+
+def photo_data(photo):
+    return {
+        'id': photo.id,
+        'url': photo.image.url,
+        'thumbnail': photo.thumbnail_url,
+        'caption': photo.caption,
+        'user': photo.user.first_name,
+        'uploaded': photo.upload_date.strftime('%b %d'),
+    }
+
+
+def _watched(event_id):
+    # Without a shared log nobody outside this process can be listening
+    return settings.LIVE_EVENTS_BACKEND == 'cache' or broker.has_subscribers(event_id)
+
+
+def _publish_participants(event_id):
+    if not _watched(event_id):
+        return
+    try:
+        data = participants_data(event_id)
+    except Event.DoesNotExist:
+        return
+    publish(event_id, 'participants', data)
+
+
+# Publish after commit, so the count includes the change and rollbacks send nothing
+
+@receiver(post_save, sender=EventParticipation)
+@receiver(post_delete, sender=EventParticipation)
+def live_participation_changed(sender, instance, created=True, **kwargs):
+    if created:
+        event_id = instance.event_id
+        transaction.on_commit(lambda: _publish_participants(event_id))
+
+
+@receiver(post_save, sender=Event)
+def live_event_changed(sender, instance, created, **kwargs):
+    # max_participants may have changed
+    if not created:
+        event_id = instance.pk
+        transaction.on_commit(lambda: _publish_participants(event_id))
+
+
+@receiver(post_save, sender=PhotoUpload)
+def live_photo_uploaded(sender, instance, created, **kwargs):
+    if created and _watched(instance.event_id):
+        event_id = instance.event_id
+        transaction.on_commit(lambda: publish(event_id, 'photo', photo_data(instance)))
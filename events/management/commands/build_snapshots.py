@@ -0,0 +1,32 @@
+"""
+Management command to pre-render event detail pages for crawlers
+Usage: python manage.py build_snapshots [--all]
+
+Only pages that are missing or older than their event are rendered, so it
+is cheap to run often (e.g. every 15 minutes from cron).
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from events.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Render missing and outdated event page snapshots for crawlers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Render every event page again'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written, deleted = build_snapshots(rebuild_all=options['all'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Wrote {written} snapshots, removed {deleted} in {elapsed:.2f}s'
+        ))
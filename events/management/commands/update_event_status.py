@@ -0,0 +1,52 @@
+"""
+Management command to keep Event.status in step with the clock
+Usage: python manage.py update_event_status [--loop] [--max-sleep 300]
+
+Without --loop it applies every due transition once (cron friendly). With
+--loop it sleeps until the next event starts or ends, waking at least
+every --max-sleep seconds to notice newly created or edited events.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from events.scheduler import advance_event_statuses, next_transition_at
+
+
+class Command(BaseCommand):
+    help = 'Move events to ongoing/completed when they start and end'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and wake up at each event boundary'
+        )
+        parser.add_argument(
+            '--max-sleep',
+            type=float,
+            default=300,
+            help='Longest time to sleep between checks in seconds (default: 300)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                changed = advance_event_statuses()
+                for status, event_ids in changed.items():
+                    if event_ids:
+                        self.stdout.write(f'{len(event_ids)} event(s) now {status}')
+
+                if not options['loop']:
+                    break
+
+                sleep_for = options['max_sleep']
+                upcoming = next_transition_at()
+                if upcoming is not None:
+                    until_next = (upcoming - timezone.now()).total_seconds()
+                    sleep_for = min(sleep_for, max(until_next, 1))
+                time.sleep(sleep_for)
+        except KeyboardInterrupt:
+            pass
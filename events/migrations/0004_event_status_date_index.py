@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0003_event_tags'),
+        ('search', '0002_eventtag_color_code'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['status', 'date_time'], name='events_even_status_8b865d_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:20
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def fill_excerpts(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    events = list(Event.objects.only('id', 'description'))
+    for event in events:
+        event.excerpt = Truncator(event.description).words(15, truncate=' …')[:300]
+    Event.objects.bulk_update(events, ['excerpt'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0004_event_status_date_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+    ]
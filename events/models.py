@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.urls import reverse
+from django.utils.text import Truncator
 from search.models import Location, EventTag
 
 class EventCategory(models.Model):
@@ -14,6 +16,28 @@ class EventCategory(models.Model):
     class Meta:
         verbose_name_plural = "Event Categories"
 
+# Words kept in Event.excerpt, as shown on event cards
+EXCERPT_WORDS = 15
+
+# Columns the event cards need (lists, home page, recommendations)
+CARD_FIELDS = (
+    'id', 'title', 'excerpt', 'date_time', 'status', 'max_participants',
+    'address_details', 'category__name', 'category__color_code',
+    'location__name', 'organizer__first_name', 'organizer__last_name',
+)
+
+
+def make_excerpt(text):
+    """Shortened description, the same as the |truncatewords filter gives"""
+    return Truncator(text).words(EXCERPT_WORDS, truncate=' …')[:300]
+
+
+class EventQuerySet(models.QuerySet):
+    def for_cards(self):
+        """Only what the event cards display: no description, no full user rows"""
+        return self.select_related('category', 'organizer', 'location').only(*CARD_FIELDS)
+
+
 class Event(models.Model):
     STATUS_CHOICES = [
         ('upcoming', 'Upcoming'),
@@ -32,18 +56,42 @@ class Event(models.Model):
     max_participants = models.PositiveIntegerField(default=50)
     created_at = models.DateTimeField(default=timezone.now)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='upcoming')
+    # Kept in sync with description on save, so lists can skip the full text
+    excerpt = models.CharField(max_length=300, blank=True, editable=False)
+    # Last change, used by the calendar feeds to rebuild only changed events
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = EventQuerySet.as_manager()
     
     def __str__(self):
         return self.title
     
+    def save(self, *args, **kwargs):
+        self.excerpt = make_excerpt(self.description)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # auto_now and the excerpt only change with the fields being saved
+            update_fields = set(update_fields) | {'updated_at'}
+            if 'description' in update_fields:
+                update_fields.add('excerpt')
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+    
     def full_location(self):
         if self.address_details:
             return f"{self.address_details}, {self.location.name}"
         return self.location.name
     
+    def get_absolute_url(self):
+        return reverse('events:event_detail', args=[self.id])
+    
     def get_tags_list(self):
         """Return a list of tag names for this event"""
         return list(self.tags.values_list('name', flat=True))
     
     class Meta:
-        ordering = ['-date_time']
\ No newline at end of file
+        ordering = ['-date_time']
+        indexes = [
+            # Used by the status scheduler's range updates and upcoming listings
+            models.Index(fields=['status', 'date_time']),
+        ]
\ No newline at end of file
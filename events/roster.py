@@ -0,0 +1,97 @@
+"""
+Participant roster for organizers.
+
+Every roster row comes from one query over EventParticipation joined to
+the user and their profile (LEFT JOIN, so users without a profile are
+kept). Pages use keyset pagination on the participation id, and exports
+stream rows with ``iterator()`` so memory use doesn't grow with the event.
+"""
+
+import csv
+import json
+
+from django.db.models import F
+
+from interaction.models import EventParticipation
+from users.models import profile_lookup
+
+ROSTER_PAGE_SIZE = 50
+EXPORT_CHUNK_SIZE = 2000
+
+# (column name, lookup) in export order
+ROSTER_COLUMNS = (
+    ('id', 'id'),
+    ('username', 'user__username'),
+    ('first_name', 'user__first_name'),
+    ('last_name', 'user__last_name'),
+    ('email', 'user__email'),
+    ('joined_date', 'joined_date'),
+    ('attended', 'attended'),
+    ('feedback', 'feedback'),
+    ('location', f"{profile_lookup('user')}__location"),
+    ('interests', f"{profile_lookup('user')}__environmental_interests"),
+)
+
+# Extra columns for the roster and attendance pages, for {% roster_avatar %}
+AVATAR_COLUMNS = (
+    ('user_id', 'user_id'),
+    ('avatar_version', f"{profile_lookup('user')}__avatar_version"),
+)
+
+
+def roster_rows(event, with_avatars=False):
+    """Roster rows for the event as dicts, ordered by participation id."""
+    columns = ROSTER_COLUMNS + AVATAR_COLUMNS if with_avatars else ROSTER_COLUMNS
+    return EventParticipation.objects.filter(
+        event=event
+    ).values(
+        *[name for name, lookup in columns if name == lookup],
+        **{name: F(lookup) for name, lookup in columns if name != lookup}
+    ).order_by('id')
+
+
+def roster_page(event, after=0, size=ROSTER_PAGE_SIZE):
+    """One page of rows after the participation id ``after``, plus the next cursor."""
+    rows = list(roster_rows(event, with_avatars=True).filter(id__gt=after)[:size + 1])
+    next_after = rows[size - 1]['id'] if len(rows) > size else None
+    return rows[:size], next_after
+
+
+class Echo:
+    """File-like object whose write() just returns the value (for csv.writer)."""
+
+    def write(self, value):
+        return value
+
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _export_value(value, for_spreadsheet=False):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if value is None:
+        return ''
+    if for_spreadsheet and isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Names and feedback are typed by participants; show them as text
+        return "'" + value
+    return value
+
+
+def stream_csv(event):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in ROSTER_COLUMNS])
+    for row in roster_rows(event).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow([_export_value(row[name], for_spreadsheet=True) for name, _ in ROSTER_COLUMNS])
+
+
+def stream_jsonl(event):
+    for row in roster_rows(event).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield json.dumps({name: _export_value(row[name]) for name, _ in ROSTER_COLUMNS}) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson'),
+}
@@ -0,0 +1,78 @@
+"""
+Move events between 'upcoming', 'ongoing' and 'completed' as time passes.
+
+Events have a start time but no end time, so an event counts as ongoing for
+EVENT_DURATION_HOURS after it starts. Each run issues at most two range
+UPDATEs backed by the (status, date_time) index.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from ecoconnect.cache import invalidate_tags, event_tag
+from ecoconnect.routers import pin_to_primary
+from .models import Event
+from .signals import event_status_changed
+
+
+def event_duration():
+    return timedelta(hours=settings.EVENT_DURATION_HOURS)
+
+
+def _transition(queryset, new_status):
+    """Bulk update the events in queryset and announce the change."""
+    # The job has no request pinning it: read from the primary, or the ids
+    # come from a replica that may not match what the UPDATE sees
+    with pin_to_primary():
+        candidate_ids = list(queryset.values_list('id', flat=True))
+        if not candidate_ids:
+            return []
+        changed_at = timezone.now()
+        # Re-check the filter so a concurrent manual edit isn't overwritten
+        queryset.filter(id__in=candidate_ids).update(status=new_status, updated_at=changed_at)
+        # Only announce the rows this UPDATE actually changed
+        event_ids = list(
+            Event.objects.filter(id__in=candidate_ids, status=new_status, updated_at=changed_at)
+            .order_by('id').values_list('id', flat=True)
+        )
+    if not event_ids:
+        return []
+    # update() skips post_save, so drop cached pages here
+    invalidate_tags('events', *[event_tag(event_id) for event_id in event_ids])
+    event_status_changed.send(sender=Event, event_ids=event_ids, status=new_status)
+    return event_ids
+
+
+def advance_event_statuses(now=None):
+    """Apply every transition that is due at ``now``; returns {status: [ids]}."""
+    now = now or timezone.now()
+    ended_before = now - event_duration()
+
+    completed = _transition(
+        Event.objects.filter(status__in=['upcoming', 'ongoing'], date_time__lte=ended_before),
+        'completed',
+    )
+    started = _transition(
+        Event.objects.filter(status='upcoming', date_time__lte=now, date_time__gt=ended_before),
+        'ongoing',
+    )
+    return {'completed': completed, 'ongoing': started}
+
+
+def next_transition_at(now=None):
+    """When the next event starts or ends, or None if nothing is scheduled."""
+    now = now or timezone.now()
+    with pin_to_primary():
+        next_start = Event.objects.filter(
+            status='upcoming', date_time__gt=now
+        ).aggregate(next=Min('date_time'))['next']
+        next_end = Event.objects.filter(
+            status='ongoing'
+        ).aggregate(next=Min('date_time'))['next']
+    if next_end is not None:
+        next_end += event_duration()
+    candidates = [moment for moment in (next_start, next_end) if moment is not None]
+    return min(candidates) if candidates else None
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver, Signal
+from ecoconnect.cache import invalidate_tags_on_commit, event_tag
+from .models import Event
+
+# Sent by events.scheduler after a bulk status change.
+# Arguments: event_ids (list of ids), status (the new status)
+event_status_changed = Signal()
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def event_changed(sender, instance, **kwargs):
+    """Drop cached listings and anything derived from this event"""
+    invalidate_tags_on_commit('events', event_tag(instance.pk))
+
+
+@receiver(m2m_changed, sender=Event.tags.through)
+def event_tags_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_tags_on_commit('events', event_tag(instance.pk))
@@ -0,0 +1,51 @@
+"""
+Sitemaps for search engines.
+
+Crawlers find every event through the sitemap instead of walking the
+event list through all filter and page combinations (robots.txt keeps
+them off those). URLs are built from SITE_URL, like the links in emails.
+"""
+
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.sitemaps import Sitemap
+from django.urls import reverse
+
+from .models import Event
+
+
+class SiteUrlSitemap(Sitemap):
+    """Sitemap with absolute URLs on SITE_URL rather than the Sites framework domain"""
+
+    def get_urls(self, page=1, site=None, protocol=None):
+        parts = urlsplit(settings.SITE_URL)
+        return super().get_urls(page, site=SimpleNamespace(domain=parts.netloc), protocol=parts.scheme)
+
+
+class EventSitemap(SiteUrlSitemap):
+    changefreq = 'daily'
+
+    def items(self):
+        return Event.objects.only('id', 'updated_at').order_by('id')
+
+    def lastmod(self, event):
+        return event.updated_at
+
+
+class StaticViewSitemap(SiteUrlSitemap):
+    changefreq = 'daily'
+    priority = 0.8
+
+    def items(self):
+        return ['search:home', 'search:about', 'events:event_list']
+
+    def location(self, name):
+        return reverse(name)
+
+
+sitemaps = {
+    'static': StaticViewSitemap,
+    'events': EventSitemap,
+}
@@ -0,0 +1,168 @@
+"""
+Pre-rendered event detail pages for crawlers.
+
+Bots don't log in, so they all see the same page for an event. The
+detail page is stored as a file under SNAPSHOT_ROOT and BotSnapshotMiddleware
+hands it to crawlers without touching the database.
+
+- ``python manage.py build_snapshots`` renders the pages that are missing
+  or older than their event's updated_at (run it from cron);
+- a crawler hitting a page without a snapshot gets a normal render, which
+  is then stored for the next one;
+- any change to an event, its participants, waitlist or photos deletes
+  that event's snapshot, so crawlers never see outdated counts for long.
+
+Snapshots older than SNAPSHOT_MAX_AGE are ignored, since pages also change
+when events start. With several servers SNAPSHOT_ROOT must be shared.
+"""
+
+import functools
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.http import Http404, HttpRequest
+from django.urls import reverse
+
+from interaction.models import EventParticipation, PhotoUpload, WaitlistEntry
+from .models import Event
+from .signals import event_status_changed
+
+
+@functools.lru_cache(maxsize=4)
+def _bot_pattern(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def is_bot(request):
+    user_agent = request.headers.get('user-agent', '')
+    return bool(user_agent) and bool(_bot_pattern(settings.BOT_USER_AGENTS).search(user_agent))
+
+
+def snapshot_path(event_id):
+    return Path(settings.SNAPSHOT_ROOT) / 'events' / f'{event_id}.html'
+
+
+def read_snapshot(event_id):
+    """Return (html bytes, mtime), or None if missing or too old."""
+    try:
+        with open(snapshot_path(event_id), 'rb') as snapshot:
+            mtime = os.fstat(snapshot.fileno()).st_mtime
+            if settings.SNAPSHOT_MAX_AGE and time.time() - mtime > settings.SNAPSHOT_MAX_AGE:
+                return None
+            return snapshot.read(), mtime
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(event_id, content):
+    """Write atomically, so readers never see half a page."""
+    path = snapshot_path(event_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def delete_snapshot(event_id):
+    try:
+        os.remove(snapshot_path(event_id))
+    except FileNotFoundError:
+        pass
+
+
+def render_event_page(event_id):
+    """The detail page as an anonymous visitor sees it, or None if the event is gone."""
+    from .views import EventDetailView
+
+    site = urlsplit(settings.SITE_URL)
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = reverse('events:event_detail', args=[event_id])
+    request.META = {
+        'HTTP_HOST': site.netloc,
+        'SERVER_NAME': site.hostname,
+        'SERVER_PORT': str(site.port or (443 if site.scheme == 'https' else 80)),
+    }
+    request.user = AnonymousUser()
+    try:
+        response = EventDetailView.as_view()(request, event_id=event_id)
+    except Http404:
+        return None
+    return response.render().content
+
+
+def build_snapshots(rebuild_all=False):
+    """
+    Render missing and outdated snapshots and delete those of deleted
+    events. Returns (snapshots written, snapshots deleted).
+    """
+    folder = Path(settings.SNAPSHOT_ROOT) / 'events'
+    existing = {}
+    if folder.is_dir():
+        for entry in os.scandir(folder):
+            name, ext = os.path.splitext(entry.name)
+            if ext == '.html' and name.isdigit():
+                existing[int(name)] = entry.stat().st_mtime
+
+    # Refresh well before SNAPSHOT_MAX_AGE, so regular runs keep every page served
+    refresh_before = time.time() - settings.SNAPSHOT_MAX_AGE / 2
+    written = 0
+    for event_id, updated_at in Event.objects.values_list('id', 'updated_at').iterator():
+        mtime = existing.pop(event_id, None)
+        if not rebuild_all and mtime is not None and mtime > max(updated_at.timestamp(), refresh_before):
+            continue
+        content = render_event_page(event_id)
+        if content is not None:
+            write_snapshot(event_id, content)
+            written += 1
+
+    for event_id in existing:
+        delete_snapshot(event_id)
+    return written, len(existing)
+
+
+def _delete_on_commit(event_id):
+    transaction.on_commit(lambda: delete_snapshot(event_id))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def snapshot_event_changed(sender, instance, **kwargs):
+    _delete_on_commit(instance.pk)
+
+
+@receiver(m2m_changed, sender=Event.tags.through)
+def snapshot_event_tags_changed(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _delete_on_commit(instance.pk)
+
+
+@receiver(post_save, sender=EventParticipation)
+@receiver(post_delete, sender=EventParticipation)
+@receiver(post_save, sender=WaitlistEntry)
+@receiver(post_delete, sender=WaitlistEntry)
+@receiver(post_save, sender=PhotoUpload)
+@receiver(post_delete, sender=PhotoUpload)
+def snapshot_related_changed(sender, instance, **kwargs):
+    _delete_on_commit(instance.event_id)
+
+
+@receiver(event_status_changed)
+def snapshot_status_changed(sender, event_ids, status, **kwargs):
+    for event_id in event_ids:
+        delete_snapshot(event_id)
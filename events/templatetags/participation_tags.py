@@ -0,0 +1,11 @@
+import uuid
+
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag
+def idempotency_key():
+    """A fresh key for one join/leave form, so resubmits of that form are replayed"""
+    return uuid.uuid4().hex
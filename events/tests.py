@@ -1,3 +1,499 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import re
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.db.models import Count
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ecoconnect.cache import event_tag, invalidate_tags, tag_versions
+from interaction.models import EventParticipation, PhotoUpload
+from search.models import Location, EventTag
+from . import feeds, index, live, snapshots
+from .filters import EventFilters, filter_events
+from .models import Event, EventCategory
+from .scheduler import _transition, advance_event_statuses, next_transition_at
+from .signals import event_status_changed
+
+
+class EventFixtureMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pw')
+        cls.users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw') for i in range(3)]
+        cls.categories = [
+            EventCategory.objects.create(name='Beach Cleanup', description='Beaches'),
+            EventCategory.objects.create(name='Tree Planting', description='Trees'),
+        ]
+        cls.locations = [Location.objects.create(name='Oshawa'), Location.objects.create(name='Ajax')]
+        cls.tags = [EventTag.objects.create(name=name) for name in ('Outdoor', 'Family', 'Educational')]
+
+        now = timezone.now()
+        cls.events = []
+        for i in range(12):
+            event = Event.objects.create(
+                title=f'Event {i:02d}', description='Details', organizer=cls.organizer,
+                date_time=now + timedelta(days=i - 3, hours=1),
+                created_at=now - timedelta(days=i),
+                location=cls.locations[i % 2], category=cls.categories[i % 3 % 2],
+                max_participants=2, status='completed' if i < 3 else 'upcoming',
+            )
+            event.tags.set(cls.tags[:i % 3 + 1])
+            for user in cls.users[:i % 4]:
+                EventParticipation.objects.create(user=user, event=event)
+            cls.events.append(event)
+
+
+def sql_ids(query):
+    queryset = Event.objects.annotate(participant_count=Count('eventparticipation', distinct=True))
+    return list(filter_events(queryset, EventFilters(QueryDict(query))).values_list('id', flat=True))
+
+
+class EventFiltersTests(EventFixtureMixin, TestCase):
+    def test_equivalent_queries_share_keys_and_results(self):
+        messy = EventFilters(QueryDict('search=Event%20%2003&sort=date&page=1&utm_source=x&category='))
+        clean = EventFilters(QueryDict('search=Event 03'))
+        self.assertEqual(messy.search, 'Event 03')
+        self.assertEqual(messy.cache_key('event_list'), clean.cache_key('event_list'))
+        self.assertEqual(sql_ids('search=Event%20%2003'), [self.events[3].id])
+        self.assertEqual(sql_ids('search=Event%20%2003'), sql_ids('search=Event 03'))
+        self.assertFalse(EventFilters(QueryDict('sort=title&page=2')).active)
+
+    def test_links_carry_the_normalized_filters(self):
+        filters = EventFilters(QueryDict(f'tags={self.tags[1].id}&tags=x&search=Event%20%2003&page=2'))
+        self.assertEqual(filters.tags, [str(self.tags[1].id)])
+        self.assertEqual(filters.querystring, f'search=Event+03&tags={self.tags[1].id}')
+        self.assertEqual(filters.page_url(1), f'?search=Event+03&tags={self.tags[1].id}')
+        self.assertEqual(filters.page_url(3), f'?search=Event+03&tags={self.tags[1].id}&page=3')
+
+    def test_calendar_feed_uses_the_filters(self):
+        response = self.client.get('/events/calendar.ics?search=Event%20%2005&page=9')
+        body = response.content.decode()
+        self.assertIn('SUMMARY:Event 05', body)
+        self.assertEqual(body.count('BEGIN:VEVENT'), 1)
+
+
+class CacheInvalidationTests(EventFixtureMixin, TestCase):
+    def test_tags_are_bumped_after_commit(self):
+        event = self.events[6]
+        tags = ['events', 'participations', event_tag(event.id)]
+        before = tag_versions(tags)
+        with self.captureOnCommitCallbacks() as callbacks:
+            EventParticipation.objects.create(user=self.organizer, event=event)
+            Event.objects.filter(id=event.id).get().save()
+            event.tags.add(self.tags[2])
+        # A reader inside the transaction's window still sees the old versions
+        self.assertEqual(tag_versions(tags), before)
+
+        for callback in callbacks:
+            callback()
+        after = tag_versions(tags)
+        self.assertTrue(all(after[tag] > before[tag] for tag in tags))
+
+
+@override_settings(EVENT_INDEX=True, EVENT_INDEX_MAX_AGE=0)
+class EventIndexTests(EventFixtureMixin, TestCase):
+    QUERIES = (
+        '',
+        'category=beach cleanup',
+        'location=Ajax&status=upcoming',
+        'availability=available',
+        'availability=full&sort=participants',
+        'sort=title',
+        'sort=created',
+        'date_range=week',
+        'date_range=custom&start_date=2000-01-01&end_date=2100-01-01',
+        'status=completed&category=Tree Planting',
+        'category=  tree   planting &location=ajax',
+        'tags=abc',
+    )
+
+    def setUp(self):
+        cache.clear()
+        index._index = None
+        self.addCleanup(setattr, index, '_index', None)
+
+    def index_ids(self, query):
+        ids, _ = index.event_index().search(EventFilters(QueryDict(query)))
+        return ids
+
+    def test_filters_match_sql(self):
+        for query in self.QUERIES + (f'tags={self.tags[2].id}', f'tags={self.tags[0].id}&tags={self.tags[2].id}'):
+            with self.subTest(query=query):
+                expected = sql_ids(query)
+                if 'sort=participants' in query:
+                    # SQL leaves ties in any order
+                    self.assertCountEqual(self.index_ids(query), expected)
+                else:
+                    self.assertEqual(self.index_ids(query), expected)
+
+    def test_own_writes_patch_the_index(self):
+        idx = index.event_index()
+        event = self.events[5]
+        with self.captureOnCommitCallbacks(execute=True):
+            EventParticipation.objects.create(user=self.organizer, event=event)
+        self.assertTrue(idx.is_current())
+        self.assertIn(event.id, self.index_ids('availability=full'))
+
+        _transition(Event.objects.filter(id=event.id), 'ongoing')
+        self.assertTrue(idx.is_current())
+        self.assertEqual(self.index_ids('status=ongoing'), [event.id])
+
+    def test_other_processes_writes_force_a_rebuild(self):
+        idx = index.event_index()
+        # A write in another process bumps the shared version without our signals
+        Event.objects.filter(id=self.events[4].id).update(status='ongoing')
+        cache.incr('tag:events')
+        self.assertFalse(idx.is_current())
+        self.assertEqual(self.index_ids('status=ongoing'), [self.events[4].id])
+
+    def test_own_write_does_not_hide_a_concurrent_one(self):
+        idx = index.event_index()
+        cache.incr('tag:participations')  # someone else's join
+        with self.captureOnCommitCallbacks(execute=True):
+            EventParticipation.objects.create(user=self.organizer, event=self.events[5])
+        self.assertFalse(idx.is_current())
+
+    def foreign_write(self, *event_ids):
+        # What another process leaves in the shared cache after a write
+        versions = {'events': cache.incr('tag:events')}
+        versions.update((event_tag(event_id), 1) for event_id in event_ids)
+        index.log_changes(versions)
+
+    def test_logged_foreign_writes_are_patched_in(self):
+        idx = index.event_index()
+        Event.objects.filter(id=self.events[4].id).update(status='ongoing')
+        self.foreign_write(self.events[4].id)
+        new_event, = Event.objects.bulk_create([Event(
+            title='Event 99', description='Details', organizer=self.organizer,
+            date_time=timezone.now() + timedelta(days=1), location=self.locations[0],
+            category=self.categories[0], max_participants=5,
+        )])
+        self.foreign_write(new_event.id)
+
+        with mock.patch.object(idx, 'build') as build:
+            self.assertEqual(self.index_ids('status=ongoing'), [self.events[4].id])
+            self.assertIn(new_event.id, self.index_ids('category=Beach Cleanup'))
+        build.assert_not_called()
+        self.assertTrue(idx.is_current())
+
+    def test_gap_in_the_log_forces_a_rebuild(self):
+        idx = index.event_index()
+        self.foreign_write(self.events[4].id)
+        cache.incr('tag:events')  # bumped, but never logged
+        self.assertFalse(idx.sync())
+
+    def test_rows_are_appended_in_place(self):
+        idx = index.event_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(70):
+                Event.objects.create(
+                    title=f'Extra {i:02d}', description='Details', organizer=self.organizer,
+                    date_time=timezone.now() + timedelta(days=i % 9, hours=2),
+                    location=self.locations[i % 2], category=self.categories[i % 2], max_participants=1,
+                )
+        self.assertEqual(idx.size, 82)
+        self.assertGreaterEqual(len(idx.columns['id']), 82)
+        with mock.patch.object(idx, 'build') as build:
+            for query in self.QUERIES:
+                if 'sort=participants' not in query:
+                    with self.subTest(query=query):
+                        self.assertEqual(self.index_ids(query), sql_ids(query))
+        build.assert_not_called()
+
+    def test_unrelated_invalidations_are_ignored(self):
+        idx = index.event_index()
+        invalidate_tags('photos')
+        self.assertTrue(idx.is_current())
+
+
+class RosterExportTests(EventFixtureMixin, TestCase):
+    def export(self, event, export_format):
+        self.client.force_login(self.organizer)
+        response = self.client.get(f'/events/{event.id}/roster/export/?format={export_format}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_neutralizes_formulas(self):
+        event = self.events[7]
+        participation = EventParticipation.objects.filter(event=event).order_by('id').first()
+        User.objects.filter(id=participation.user_id).update(first_name='=HYPERLINK("http://evil")', last_name='@SUM(A1)')
+        EventParticipation.objects.filter(id=participation.id).update(feedback='-2+3')
+
+        rows = list(csv.DictReader(io.StringIO(self.export(event, 'csv'))))
+        self.assertEqual(len(rows), EventParticipation.objects.filter(event=event).count())
+        self.assertEqual(rows[0]['first_name'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(rows[0]['last_name'], "'@SUM(A1)")
+        self.assertEqual(rows[0]['feedback'], "'-2+3")
+
+        # JSON Lines is data, not a spreadsheet: values stay as typed
+        first = json.loads(self.export(event, 'jsonl').splitlines()[0])
+        self.assertEqual(first['first_name'], '=HYPERLINK("http://evil")')
+
+    def test_only_the_organizer_can_export(self):
+        self.client.force_login(self.users[0])
+        response = self.client.get(f'/events/{self.events[7].id}/roster/export/')
+        self.assertRedirects(response, f'/events/{self.events[7].id}/', fetch_redirect_response=False)
+
+
+class ParticipationEndpointTests(EventFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = self.users[0]
+        self.client.force_login(self.user)
+
+    def post(self, action, event, key, **extra):
+        return self.client.post(f'/events/{event.id}/{action}/', {'idempotency_key': key}, **extra)
+
+    def joined(self, event):
+        return EventParticipation.objects.filter(user=self.user, event=event).exists()
+
+    def test_every_form_gets_its_own_key(self):
+        response = self.client.get('/events/')
+        keys = re.findall(r'name="idempotency_key" value="([0-9a-f]+)"', response.content.decode())
+        self.assertGreater(len(keys), 1)
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_repeated_key_replays_the_first_outcome(self):
+        event = self.events[4]  # upcoming, one free spot
+        self.assertFalse(self.joined(event))
+        self.post('join', event, 'key-1')
+        self.assertTrue(self.joined(event))
+
+        EventParticipation.objects.filter(user=self.user, event=event).delete()
+        response = self.post('join', event, 'key-1', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.json()['outcome'], 'joined')
+        self.assertFalse(self.joined(event))
+
+        self.post('join', event, 'key-2')
+        self.assertTrue(self.joined(event))
+
+    def test_a_key_only_replays_the_same_action_and_event(self):
+        joined_event, other_event = self.events[4], self.events[5]  # user0 is in events[5]
+        self.assertTrue(self.joined(other_event))
+
+        self.post('join', joined_event, 'shared')
+        self.post('leave', other_event, 'shared')
+        self.assertTrue(self.joined(joined_event))
+        self.assertFalse(self.joined(other_event))
+
+    @override_settings(RATELIMIT_USER_PARTICIPATION=2)
+    def test_user_rate_limit(self):
+        # user0 is in none of these
+        first, second = self.events[4], self.events[8]
+        self.assertEqual(self.post('join', first, 'k1', HTTP_ACCEPT='application/json').status_code, 200)
+        self.assertEqual(self.post('leave', first, 'k2', HTTP_ACCEPT='application/json').status_code, 200)
+        response = self.post('join', second, 'k3', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['outcome'], 'rate_limited')
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertFalse(self.joined(second))
+
+
+class LiveUpdateTests(EventFixtureMixin, TestCase):
+    def test_wsgi_stream_tells_the_browser_to_stop(self):
+        response = self.client.get(f'/events/{self.events[4].id}/stream/')
+        self.assertEqual(response.status_code, 204)
+
+    def test_photos_are_pushed_as_thumbnails(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), 'green').save(buffer, 'JPEG')
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            photo = PhotoUpload.objects.create(
+                event=self.events[4], user=self.users[0], caption='Shore',
+                image=SimpleUploadedFile('shore.jpg', buffer.getvalue(), content_type='image/jpeg'),
+            )
+            data = live.photo_data(photo)
+            self.assertEqual(data['url'], photo.image.url)
+            self.assertTrue(data['thumbnail'].startswith('/media/event_photos/thumbs/shore'))
+            self.assertTrue(data['thumbnail'].endswith('.webp'))
+            with Image.open(photo.thumbnail.path) as thumbnail:
+                self.assertEqual(thumbnail.size, (480, 360))
+
+
+@override_settings(EVENT_DURATION_HOURS=3)
+class SchedulerTests(EventFixtureMixin, TestCase):
+    def statuses(self, *events):
+        return list(Event.objects.filter(id__in=[e.id for e in events]).order_by('id').values_list('status', flat=True))
+
+    def test_events_start_and_end(self):
+        event = self.events[3]  # starts in an hour
+        start = event.date_time
+        self.assertEqual(advance_event_statuses(start - timedelta(minutes=1)), {'completed': [], 'ongoing': []})
+        self.assertEqual(next_transition_at(start - timedelta(minutes=1)), start)
+
+        announced = []
+
+        def receiver(sender, event_ids, status, **kwargs):
+            announced.append((event_ids, status))
+        event_status_changed.connect(receiver)
+        self.addCleanup(event_status_changed.disconnect, receiver)
+
+        before = Event.objects.get(id=event.id).updated_at
+        self.assertEqual(advance_event_statuses(start), {'completed': [], 'ongoing': [event.id]})
+        self.assertEqual(self.statuses(event), ['ongoing'])
+        self.assertGreater(Event.objects.get(id=event.id).updated_at, before)
+        self.assertEqual(announced, [([event.id], 'ongoing')])
+        self.assertEqual(next_transition_at(start), start + timedelta(hours=3))
+
+        self.assertEqual(advance_event_statuses(start + timedelta(hours=3)), {'completed': [event.id], 'ongoing': []})
+        self.assertEqual(self.statuses(event), ['completed'])
+        self.assertEqual(next_transition_at(start + timedelta(hours=3)), self.events[4].date_time)
+
+    def test_missed_runs_complete_events_directly(self):
+        later = self.events[5].date_time + timedelta(hours=4)
+        result = advance_event_statuses(later)
+        self.assertEqual(result['completed'], [self.events[3].id, self.events[4].id, self.events[5].id])
+        self.assertEqual(result['ongoing'], [])
+
+    def test_only_changed_rows_are_announced(self):
+        # Edited by hand after the job listed it
+        event = self.events[3]
+        queryset = Event.objects.filter(status='upcoming', id__in=[event.id, self.events[4].id])
+        original_update = type(queryset).update
+
+        def update_after_edit(qs, **kwargs):
+            original_update(Event.objects.filter(id=event.id), status='completed')
+            return original_update(qs, **kwargs)
+
+        with mock.patch.object(type(queryset), 'update', update_after_edit):
+            self.assertEqual(_transition(queryset, 'ongoing'), [self.events[4].id])
+        self.assertEqual(self.statuses(event, self.events[4]), ['completed', 'ongoing'])
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_reads_come_from_the_primary(self):
+        with mock.patch('ecoconnect.routers.random.choice', return_value='default') as replica_reads:
+            advance_event_statuses(self.events[3].date_time)
+            next_transition_at()
+        replica_reads.assert_not_called()
+
+
+class CalendarFeedTests(EventFixtureMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def poll(self, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get('/events/calendar.ics?status=upcoming', headers=headers)
+
+    def test_unchanged_feed_answers_304(self):
+        first = self.poll()
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.content.decode().count('BEGIN:VEVENT'), 9)
+
+        repeat = self.poll(first['ETag'])
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat['ETag'], first['ETag'])
+
+        Event.objects.get(id=self.events[5].id).save()
+        changed = self.poll(first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+
+    def test_only_changed_events_are_rendered_again(self):
+        with mock.patch('events.feeds.render_vevent', wraps=feeds.render_vevent) as render:
+            self.client.get('/events/calendar.ics')
+            self.assertEqual(render.call_count, 12)
+
+            event = Event.objects.get(id=self.events[7].id)
+            event.title = 'Renamed; with, escapes'
+            event.save()
+            render.reset_mock()
+            body = self.client.get('/events/calendar.ics').content.decode()
+        self.assertEqual([call.args[0].id for call in render.call_args_list], [event.id])
+        self.assertIn('SUMMARY:Renamed\\; with\\, escapes', body)
+        self.assertEqual(body.count('BEGIN:VEVENT'), 12)
+
+    def test_personal_feed_needs_a_valid_token(self):
+        user = self.users[0]
+        response = self.client.get(f'/events/calendar/{feeds.user_token(user)}.ics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+        expected = EventParticipation.objects.filter(user=user).count()
+        self.assertEqual(response.content.decode().count('BEGIN:VEVENT'), expected)
+
+        forged = feeds.user_token(user).rsplit(':', 1)[0] + ':forged'
+        self.assertEqual(self.client.get(f'/events/calendar/{forged}.ics').status_code, 404)
+
+
+class SnapshotTests(EventFixtureMixin, TestCase):
+    BOT = 'Mozilla/5.0 (compatible; Googlebot/2.1)'
+
+    def setUp(self):
+        cache.clear()
+        snapshot_root = tempfile.TemporaryDirectory()
+        self.addCleanup(snapshot_root.cleanup)
+        settings_override = override_settings(SNAPSHOT_ROOT=snapshot_root.name, BOT_SNAPSHOTS=True)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def exists(self, event):
+        return snapshots.snapshot_path(event.id).exists()
+
+    def test_build_only_renders_missing_and_outdated_pages(self):
+        snapshots.write_snapshot(999999, b'gone')
+        self.assertEqual(snapshots.build_snapshots(), (12, 1))
+        self.assertIn(b'Event 04', snapshots.read_snapshot(self.events[4].id)[0])
+        self.assertEqual(snapshots.build_snapshots(), (0, 0))
+
+        # Changed without signals (a bulk update): updated_at is newer than the file
+        Event.objects.filter(id=self.events[4].id).update(updated_at=timezone.now() + timedelta(minutes=1))
+        with mock.patch('events.snapshots.render_event_page', wraps=snapshots.render_event_page) as render:
+            self.assertEqual(snapshots.build_snapshots(), (1, 0))
+        render.assert_called_once_with(self.events[4].id)
+        self.assertEqual(snapshots.build_snapshots(rebuild_all=True), (12, 0))
+
+    def test_changes_delete_the_snapshot(self):
+        snapshots.build_snapshots()
+        event = self.events[6]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            participation = EventParticipation.objects.create(user=self.organizer, event=event)
+        self.assertFalse(self.exists(event))
+        self.assertTrue(self.exists(self.events[5]))
+
+        snapshots.build_snapshots()
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.delete()
+        self.assertFalse(self.exists(event))
+
+        snapshots.build_snapshots()
+        _transition(Event.objects.filter(id=event.id), 'ongoing')
+        self.assertFalse(self.exists(event))
+
+    def test_only_anonymous_bots_get_snapshots(self):
+        event = self.events[4]
+        url = f'/events/{event.id}/'
+        snapshots.write_snapshot(event.id, b'<html>snapshot</html>')
+
+        self.assertEqual(self.client.get(url, headers={'User-Agent': self.BOT}).content, b'<html>snapshot</html>')
+        browser = self.client.get(url, headers={'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) Firefox/128.0'})
+        self.assertNotIn(b'snapshot</html>', browser.content)
+
+        self.client.force_login(self.users[0])
+        signed_in = self.client.get(url, headers={'User-Agent': self.BOT})
+        self.assertEqual(signed_in.status_code, 200)
+        self.assertNotIn(b'snapshot</html>', signed_in.content)
+
+    def test_a_crawler_miss_is_stored(self):
+        event = self.events[4]
+        response = self.client.get(f'/events/{event.id}/', headers={'User-Agent': self.BOT})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(snapshots.read_snapshot(event.id)[0], response.content)
+
+    @override_settings(BOT_SNAPSHOTS=False)
+    def test_snapshots_can_be_turned_off(self):
+        event = self.events[4]
+        snapshots.write_snapshot(event.id, b'<html>snapshot</html>')
+        response = self.client.get(f'/events/{event.id}/', headers={'User-Agent': self.BOT})
+        self.assertNotIn(b'snapshot</html>', response.content)
@@ -5,10 +5,15 @@ app_name = 'events'
 
 urlpatterns = [
     path('', views.EventListView.as_view(), name='event_list'),
+    path('calendar.ics', views.events_calendar, name='events_calendar'),
+    path('calendar/<str:token>.ics', views.user_calendar, name='user_calendar'),
     path('create/', views.create_event, name='create_event'),
     path('<int:event_id>/', views.EventDetailView.as_view(), name='event_detail'),
     path('<int:event_id>/edit/', views.edit_event, name='edit_event'),
     path('<int:event_id>/delete/', views.delete_event, name='delete_event'),
     path('<int:event_id>/join/', views.join_event, name='join_event'),
     path('<int:event_id>/leave/', views.leave_event, name='leave_event'),
+    path('<int:event_id>/roster/', views.event_roster, name='event_roster'),
+    path('<int:event_id>/roster/export/', views.export_roster, name='export_roster'),
+    path('<int:event_id>/stream/', views.event_stream, name='event_stream'),
 ]
\ No newline at end of file
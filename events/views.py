@@ -1,18 +1,37 @@
+import asyncio
+import math
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.http import HttpResponse, Http404, JsonResponse
+from django.http import HttpResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.conf import settings
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.utils.http import url_has_allowed_host_and_scheme
+from django.views.decorators.http import require_POST
+from django.core import signing
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
 from .forms import EventCreationForm, EventEditForm
 from .models import Event, EventCategory
 from search.models import Location, EventTag
-from interaction.models import EventParticipation
+from interaction.models import EventParticipation, WaitlistEntry
+from interaction import waitlist
+from users.models import profile_lookup, with_profile
 from search.models import SearchHistory
 from django.db.models import Q, Count, Case, When, IntegerField, F
 from django.utils import timezone
 from datetime import timedelta
+from ecoconnect.routers import use_primary_db
+from ecoconnect.cache import get_or_compute
+from ecoconnect.ratelimit import take_token
+from .filters import EventFilters, filter_events
+from .facets import event_facets
+from .index import search_events
+from .roster import EXPORT_FORMATS, roster_page
+from . import feeds, live
 
 class EventListView(ListView):
     model = Event
@@ -20,109 +39,51 @@ class EventListView(ListView):
     context_object_name = 'events'
     paginate_by = 6
     
-    def get_queryset(self):
-        queryset = Event.objects.annotate(
-            participant_count=Count('eventparticipation')
-        ).select_related('category', 'organizer', 'location').prefetch_related('tags')
-        
-        # Get search parameters
-        search_query = self.request.GET.get('search', '').strip()
-        category_filter = self.request.GET.get('category', '').strip()
-        date_filter = self.request.GET.get('date', '').strip()
-        location_filter = self.request.GET.get('location', '').strip()
-        date_range_filter = self.request.GET.get('date_range', '').strip()
-        start_date = self.request.GET.get('start_date', '').strip()
-        end_date = self.request.GET.get('end_date', '').strip()
-        status_filter = self.request.GET.get('status', '').strip()
-        availability_filter = self.request.GET.get('availability', '').strip()
-        sort_filter = self.request.GET.get('sort', 'date').strip()
-        tags_filter = self.request.GET.getlist('tags')
-        
-        # Keyword search
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) | 
-                Q(description__icontains=search_query) |
-                Q(address_details__icontains=search_query) |
-                Q(location__name__icontains=search_query) |
-                Q(organizer__first_name__icontains=search_query) |
-                Q(organizer__last_name__icontains=search_query) |
-                Q(tags__name__icontains=search_query)
-            ).distinct()
-        
-        # Category filter
-        if category_filter:
-            queryset = queryset.filter(category__name__iexact=category_filter)
-        
-        # Tags filter
-        if tags_filter:
-            queryset = queryset.filter(tags__id__in=tags_filter).distinct()
-        
-        # Location filter
-        if location_filter:
-            queryset = queryset.filter(location__name__iexact=location_filter)
-        
-        # Specific date filter
-        if date_filter:
-            try:
-                filter_date = timezone.datetime.strptime(date_filter, '%Y-%m-%d').date()
-                queryset = queryset.filter(date_time__date=filter_date)
-            except ValueError:
-                pass
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.filters = EventFilters(request.GET)
+    
+    def get(self, request, *args, **kwargs):
+        if not self.use_page_cache():
+            return super().get(request, *args, **kwargs)
         
-        # Date range filters
-        if date_range_filter:
-            now = timezone.now()
-            if date_range_filter == 'today':
-                queryset = queryset.filter(date_time__date=now.date())
-            elif date_range_filter == 'week':
-                start_week = now.date()
-                end_week = start_week + timedelta(days=7)
-                queryset = queryset.filter(date_time__date__range=[start_week, end_week])
-            elif date_range_filter == 'month':
-                start_month = now.date().replace(day=1)
-                if start_month.month == 12:
-                    end_month = start_month.replace(year=start_month.year + 1, month=1)
-                else:
-                    end_month = start_month.replace(month=start_month.month + 1)
-                queryset = queryset.filter(date_time__date__range=[start_month, end_month])
-            elif date_range_filter == 'custom' and start_date and end_date:
-                try:
-                    start_dt = timezone.datetime.strptime(start_date, '%Y-%m-%d').date()
-                    end_dt = timezone.datetime.strptime(end_date, '%Y-%m-%d').date()
-                    if start_dt <= end_dt:
-                        queryset = queryset.filter(date_time__date__range=[start_dt, end_dt])
-                except ValueError:
-                    pass
+        # Anonymous visitors all see the same page for the same filters, so
+        # serve the rendered HTML until events or participations change
+        def render_page():
+            response = super(EventListView, self).get(request, *args, **kwargs)
+            response.render()
+            return response.content, response['Content-Type']
         
-        # Status filter
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
+        content, content_type = get_or_compute(
+            self.filters.cache_key('event_list'),
+            render_page,
+            timeout=settings.EVENT_LIST_CACHE_SECONDS,
+            tags=['events', 'participations'],
+        )
+        return HttpResponse(content, content_type=content_type)
+    
+    def use_page_cache(self):
+        if not settings.EVENT_LIST_CACHE_SECONDS or self.request.user.is_authenticated:
+            return False
+        # Flash messages are rendered into the page and belong to one visitor
+        return not len(messages.get_messages(self.request))
+    
+    def get_queryset(self):
+        # distinct: the tags filter joins event_tags and would multiply the count
+        queryset = Event.objects.for_cards().annotate(
+            participant_count=Count('eventparticipation', distinct=True)
+        ).prefetch_related('tags')
         
-        # Availability filter
-        if availability_filter:
-            if availability_filter == 'available':
-                queryset = queryset.annotate(
-                    spots_available=Case(
-                        When(participant_count__lt=F('max_participants'), then=1),
-                        default=0,
-                        output_field=IntegerField()
-                    )
-                ).filter(spots_available=1)
-            elif availability_filter == 'full':
-                queryset = queryset.filter(participant_count__gte=F('max_participants'))
+        # Answer the filters from the in-memory index when possible; only
+        # the current page is then fetched from the database
+        indexed = search_events(queryset, self.filters)
+        if indexed is not None:
+            return indexed
         
-        # Sorting
-        if sort_filter == 'title':
-            queryset = queryset.order_by('title')
-        elif sort_filter == 'participants':
-            queryset = queryset.order_by('-participant_count')
-        elif sort_filter == 'created':
-            queryset = queryset.order_by('-created_at')
-        else:  # default: date
-            queryset = queryset.order_by('date_time')
+        queryset = filter_events(queryset, self.filters)
         
         # Save search history if user is authenticated and there's a search query
+        search_query = self.filters.search
         if self.request.user.is_authenticated and search_query:
             SearchHistory.objects.create(
                 user=self.request.user,
@@ -135,23 +96,27 @@ class EventListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Categories, locations, and tags for dropdown
-        context['categories'] = EventCategory.objects.all()
-        context['locations'] = Location.objects.all()
-        context['tags'] = EventTag.objects.all().order_by('name')
+        # Categories, locations, and tags for dropdown, with result counts
+        facets = event_facets(self.object_list, self.filters)
+        categories = list(EventCategory.objects.all())
+        locations = list(Location.objects.all())
+        tags = list(EventTag.objects.all().order_by('name'))
+        for category in categories:
+            category.facet_count = facets['category'].get(category.id, 0)
+        for location in locations:
+            location.facet_count = facets['location'].get(location.id, 0)
+        for tag in tags:
+            tag.facet_count = facets['tag'].get(tag.id, 0)
+        context['categories'] = categories
+        context['locations'] = locations
+        context['tags'] = tags
+        context['facets'] = facets
         
-        # Pass all filter values back to template
-        context['search_query'] = self.request.GET.get('search', '')
-        context['category_filter'] = self.request.GET.get('category', '')
-        context['date_filter'] = self.request.GET.get('date', '')
-        context['location_filter'] = self.request.GET.get('location', '')
-        context['date_range_filter'] = self.request.GET.get('date_range', '')
-        context['start_date'] = self.request.GET.get('start_date', '')
-        context['end_date'] = self.request.GET.get('end_date', '')
-        context['status_filter'] = self.request.GET.get('status', '')
-        context['availability_filter'] = self.request.GET.get('availability', '')
-        context['sort_filter'] = self.request.GET.get('sort', 'date')
-        context['tags_filter'] = self.request.GET.getlist('tags')
+        # Filter values, selected tags and link URLs for the template
+        self.filters.resolve_tags(tags)
+        context['filters'] = self.filters
+        if context['is_paginated']:
+            context['page_links'] = self.filters.page_links(context['page_obj'])
         
         # Add user participation status for each event
         if self.request.user.is_authenticated:
@@ -172,7 +137,9 @@ class EventDetailView(DetailView):
     
     def get_object(self):
         return get_object_or_404(
-            Event.objects.prefetch_related('photos__user', 'tags').select_related('location', 'category', 'organizer').annotate(
+            Event.objects.prefetch_related(profile_lookup('photos__user'), 'tags').select_related(
+                'location', 'category', profile_lookup('organizer')
+            ).annotate(
                 participant_count=Count('eventparticipation')
             ), 
             id=self.kwargs['event_id']
@@ -184,61 +151,138 @@ class EventDetailView(DetailView):
         
         # Check if current user has joined this event
         if self.request.user.is_authenticated:
-            context['user_joined'] = EventParticipation.objects.filter(
+            context['participation'] = EventParticipation.objects.filter(
                 user=self.request.user, 
                 event=event
-            ).exists()
+            ).first()
         else:
-            context['user_joined'] = False
+            context['participation'] = None
+        context['user_joined'] = context['participation'] is not None
+        context['waitlist_entry'] = None
+        if self.request.user.is_authenticated and not context['user_joined']:
+            context['waitlist_entry'] = WaitlistEntry.objects.filter(
+                user=self.request.user,
+                event=event
+            ).first()
+        context['waitlist_count'] = WaitlistEntry.objects.filter(event=event).count()
             
         # Get participants list
-        context['participants'] = EventParticipation.objects.filter(
-            event=event
-        ).select_related('user')[:10]
+        context['participants'] = with_profile(
+            EventParticipation.objects.filter(event=event), 'user'
+        )[:10]
         
         # Check if event is full
         context['is_full'] = event.participant_count >= event.max_participants
+        context['is_organizer'] = self.request.user == event.organizer
+        context['has_started'] = event.date_time <= timezone.now()
         
         return context
 
-@login_required
-def join_event(request, event_id):
-    event = get_object_or_404(Event, id=event_id)
+# Message shown for each join/leave outcome
+PARTICIPATION_MESSAGES = {
+    waitlist.JOINED: (messages.SUCCESS, 'You have successfully joined "{title}"!'),
+    waitlist.WAITLISTED: (messages.INFO, '"{title}" is full. You are on the waitlist and will be emailed if a spot opens up.'),
+    waitlist.ALREADY_WAITING: (messages.WARNING, 'You are already on the waitlist for this event.'),
+    waitlist.ALREADY_JOINED: (messages.WARNING, 'You have already joined this event.'),
+    waitlist.EVENT_PASSED: (messages.ERROR, 'Cannot join past events.'),
+    waitlist.LEFT: (messages.SUCCESS, 'You have left "{title}".'),
+    waitlist.LEFT_WAITLIST: (messages.SUCCESS, 'You have left the waitlist for "{title}".'),
+    waitlist.NOT_REGISTERED: (messages.ERROR, 'You are not registered for this event.'),
+    'rate_limited': (messages.ERROR, 'Too many requests. Please wait a moment and try again.'),
+    'in_progress': (messages.WARNING, 'Your previous request is still being processed.'),
+}
+
+# Response status for outcomes that didn't change anything
+PARTICIPATION_STATUS = {
+    waitlist.EVENT_PASSED: 409,
+    waitlist.NOT_REGISTERED: 409,
+    'rate_limited': 429,
+    'in_progress': 409,
+}
+
+IDEMPOTENCY_TIMEOUT = 60 * 60 * 24
+IDEMPOTENCY_PENDING = 'pending'
+
+def wants_json(request):
+    return (
+        request.headers.get('x-requested-with') == 'XMLHttpRequest'
+        or 'application/json' in request.headers.get('accept', '')
+    )
+
+def participation_response(request, event_id, outcome, title='', retry_after=None):
+    """JSON for AJAX clients, otherwise a flash message and a redirect back"""
+    level, text = PARTICIPATION_MESSAGES[outcome]
+    text = text.format(title=title)
+    status = PARTICIPATION_STATUS.get(outcome, 200)
     
-    # Check if user already joined
-    if EventParticipation.objects.filter(user=request.user, event=event).exists():
-        messages.warning(request, 'You have already joined this event.')
-        return redirect('events:event_detail', event_id=event.id)
+    if wants_json(request):
+        response = JsonResponse({'outcome': outcome, 'message': text}, status=status)
+    else:
+        messages.add_message(request, level, text)
+        next_url = request.POST.get('next', '')
+        if not url_has_allowed_host_and_scheme(next_url, {request.get_host()}, request.is_secure()):
+            next_url = reverse('events:event_detail', args=[event_id])
+        response = redirect(next_url)
     
-    # Check if event is full
-    current_participants = EventParticipation.objects.filter(event=event).count()
-    if current_participants >= event.max_participants:
-        messages.error(request, 'This event is full.')
-        return redirect('events:event_detail', event_id=event.id)
+    if retry_after:
+        response['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+def change_participation(request, event_id, action):
+    """
+    Run waitlist.join or waitlist.leave once per idempotency key.
     
-    # Check if event is in the past
-    if event.date_time <= timezone.now():
-        messages.error(request, 'Cannot join past events.')
-        return redirect('events:event_detail', event_id=event.id)
+    Clients send a key with the Idempotency-Key header or the
+    idempotency_key form field (one per form, see participation_tags);
+    repeats of a key for the same action and event (double clicks, retries)
+    get the first outcome back from the cache without touching the database.
+    """
+    # Per user and per event token buckets, checked before any query
+    retry_after = (
+        take_token(f'participation:user:{request.user.id}', settings.RATELIMIT_USER_PARTICIPATION, 60)
+        or take_token(f'participation:event:{event_id}', settings.RATELIMIT_EVENT_PARTICIPATION, 1)
+    )
+    if retry_after:
+        return participation_response(request, event_id, 'rate_limited', retry_after=retry_after)
     
-    # Join the event
-    EventParticipation.objects.create(user=request.user, event=event)
-    messages.success(request, f'You have successfully joined "{event.title}"!')
+    key = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key', '')
+    cache_key = None
+    if key:
+        cache_key = f'idempotency:{action}:{request.user.id}:{event_id}:{key[:64]}'
+        if not cache.add(cache_key, IDEMPOTENCY_PENDING, IDEMPOTENCY_TIMEOUT):
+            stored = cache.get(cache_key)
+            if stored == IDEMPOTENCY_PENDING:
+                return participation_response(request, event_id, 'in_progress')
+            if stored is not None:
+                return participation_response(request, event_id, *stored)
     
-    return redirect('events:event_detail', event_id=event.id)
+    try:
+        change = waitlist.join if action == 'join' else waitlist.leave
+        outcome, event = change(request.user, event_id)
+    except Event.DoesNotExist:
+        if cache_key:
+            cache.delete(cache_key)
+        raise Http404('No event found')
+    except Exception:
+        if cache_key:
+            cache.delete(cache_key)
+        raise
+    
+    if cache_key:
+        cache.set(cache_key, (outcome, event.title), IDEMPOTENCY_TIMEOUT)
+    return participation_response(request, event_id, outcome, event.title)
 
 @login_required
+@require_POST
+@use_primary_db
+def join_event(request, event_id):
+    return change_participation(request, event_id, 'join')
+
+@login_required
+@require_POST
+@use_primary_db
 def leave_event(request, event_id):
-    event = get_object_or_404(Event, id=event_id)
-    
-    try:
-        participation = EventParticipation.objects.get(user=request.user, event=event)
-        participation.delete()
-        messages.success(request, f'You have left "{event.title}".')
-    except EventParticipation.DoesNotExist:
-        messages.error(request, 'You are not registered for this event.')
-    
-    return redirect('events:event_detail', event_id=event.id)
+    return change_participation(request, event_id, 'leave')
 
 @login_required
 def create_event(request):
@@ -267,6 +311,7 @@ def create_event(request):
     return render(request, 'events/create_event.html', context)
 
 @login_required
+@use_primary_db
 def edit_event(request, event_id):
     event = get_object_or_404(Event, id=event_id)
     
@@ -280,6 +325,9 @@ def edit_event(request, event_id):
             event = form.save(commit=False)
             event.save()
             form.save_m2m()
+            if 'max_participants' in form.changed_data:
+                # More room: let people in from the waitlist
+                waitlist.promote_waitlist(event.id)
             messages.success(request, f'Event "{event.title}" updated successfully!')
             return redirect('events:event_detail', event_id=event.id)
         else:
@@ -310,4 +358,95 @@ def delete_event(request, event_id):
         messages.success(request, f'Event "{event_title}" has been deleted successfully.')
         return redirect('events:event_list')
     
-    return redirect('events:event_detail', event_id=event.id)
\ No newline at end of file
+    return redirect('events:event_detail', event_id=event.id)
+
+@login_required
+def event_roster(request, event_id):
+    event = get_object_or_404(Event.objects.select_related('organizer'), id=event_id)
+    
+    if request.user != event.organizer:
+        messages.error(request, 'Only the organizer can see the full participant list.')
+        return redirect('events:event_detail', event_id=event.id)
+    
+    # Keyset pagination: ?after=<last participation id on the previous page>
+    try:
+        after = max(int(request.GET.get('after', 0)), 0)
+    except ValueError:
+        after = 0
+    participants, next_after = roster_page(event, after)
+    
+    context = {
+        'event': event,
+        'participants': participants,
+        'after': after,
+        'next_after': next_after,
+        'total': EventParticipation.objects.filter(event=event).count(),
+    }
+    return render(request, 'events/event_roster.html', context)
+
+@login_required
+def export_roster(request, event_id):
+    event = get_object_or_404(Event, id=event_id)
+    
+    if request.user != event.organizer:
+        messages.error(request, 'Only the organizer can export the participant list.')
+        return redirect('events:event_detail', event_id=event.id)
+    
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise Http404('Unknown export format')
+    
+    # Rows are written as they are read, never all held in memory
+    stream, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(stream(event), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="event-{event.id}-participants.{export_format}"'
+    return response
+
+async def event_stream(request, event_id):
+    """Server-Sent Events: participant counts and new photos for one event"""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker can't hold the connection open. 204 tells
+        # EventSource to stop reconnecting, so pages don't turn into pollers
+        return HttpResponse(status=204)
+    
+    if not await Event.objects.filter(id=event_id).aexists():
+        raise Http404('Event not found')
+    
+    async def stream():
+        # Subscribe before taking the snapshot so no change falls in between
+        queue = live.broker.subscribe(event_id)
+        try:
+            snapshot = await sync_to_async(live.participants_data)(event_id)
+            yield 'retry: 3000\n\n' + live.format_message('participants', snapshot)
+            while True:
+                try:
+                    kind, data = await asyncio.wait_for(queue.get(), settings.LIVE_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                    continue
+                yield live.format_message(kind, data)
+        except Event.DoesNotExist:
+            return
+        finally:
+            live.broker.unsubscribe(event_id, queue)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def events_calendar(request):
+    """iCalendar feed of the events matching the event list filters"""
+    filters = EventFilters(request.GET)
+    queryset = Event.objects.annotate(participant_count=Count('eventparticipation', distinct=True))
+    return feeds.feed_response(request, 'EcoConnect Events', filter_events(queryset, filters))
+
+def user_calendar(request, token):
+    """Personal iCalendar feed; the signed token stands in for a login"""
+    try:
+        user_id = feeds.user_id_from_token(token)
+    except (signing.BadSignature, ValueError):
+        raise Http404('Unknown calendar')
+    
+    return feeds.feed_response(request, 'My EcoConnect Events', feeds.user_feed_events(user_id), private=True)
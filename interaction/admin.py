@@ -1,10 +1,16 @@
 from django.contrib import admin
-from .models import EventParticipation, PhotoUpload, UserHistory
+from .models import EventParticipation, PhotoUpload, UserHistory, AttendanceStats, WaitlistEntry
 
 @admin.register(EventParticipation)
 class EventParticipationAdmin(admin.ModelAdmin):
     list_display = ('user', 'event', 'joined_date', 'attended')
     list_filter = ('attended', 'joined_date')
+    search_fields = ('check_in_code',)
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'event', 'joined_date')
+    list_filter = ('joined_date',)
 
 @admin.register(PhotoUpload)
 class PhotoUploadAdmin(admin.ModelAdmin):
@@ -14,4 +20,8 @@ class PhotoUploadAdmin(admin.ModelAdmin):
 @admin.register(UserHistory)
 class UserHistoryAdmin(admin.ModelAdmin):
     list_display = ('user', 'page_visited', 'visit_date')
-    list_filter = ('visit_date',)
\ No newline at end of file
+    list_filter = ('visit_date',)
+
+@admin.register(AttendanceStats)
+class AttendanceStatsAdmin(admin.ModelAdmin):
+    list_display = ('event', 'participants', 'attended', 'attendance_rate', 'feedback_count', 'updated_at')
@@ -0,0 +1,65 @@
+"""
+Bulk attendance marking and per-event attendance stats.
+
+Marking attendance is one UPDATE ... WHERE id IN (...) per batch inside a
+single short transaction, whether the organizer ticks participants on the
+attendance page or scans check-in codes at the door. Rows that already
+have the requested value are skipped, so re-scanning a code is free.
+"""
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from ecoconnect.cache import invalidate_tags_on_commit, event_tag
+from .models import AttendanceStats, EventParticipation
+
+# Keeps the IN (...) lists well under database parameter limits
+BATCH_SIZE = 500
+
+
+def normalize_code(code):
+    """Scanners and people add spaces, dashes and lowercase; codes have none."""
+    return ''.join(ch for ch in str(code).upper() if ch.isalnum())
+
+
+def mark_attendance(event, participation_ids=(), codes=(), attended=True):
+    """
+    Set ``attended`` for the event's participations given by id or by
+    check-in code. Returns (rows changed, codes that matched nobody).
+    """
+    participation_ids = sorted({int(pk) for pk in participation_ids})
+    codes = sorted({normalize_code(code) for code in codes} - {''})
+
+    participations = EventParticipation.objects.filter(event=event)
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(participation_ids), BATCH_SIZE):
+            updated += participations.filter(
+                id__in=participation_ids[start:start + BATCH_SIZE]
+            ).exclude(attended=attended).update(attended=attended)
+
+        found = set()
+        for start in range(0, len(codes), BATCH_SIZE):
+            batch = participations.filter(check_in_code__in=codes[start:start + BATCH_SIZE])
+            found.update(batch.values_list('check_in_code', flat=True))
+            updated += batch.exclude(attended=attended).update(attended=attended)
+
+        if updated:
+            # update() skips post_save
+            invalidate_tags_on_commit('participations', event_tag(event.id))
+            refresh_stats(event)
+
+    return updated, [code for code in codes if code not in found]
+
+
+def refresh_stats(event):
+    """Recount the event's attendance and feedback into AttendanceStats."""
+    totals = EventParticipation.objects.filter(event=event).aggregate(
+        participants=Count('id'),
+        attended=Count('id', filter=Q(attended=True)),
+        feedback_count=Count('id', filter=~Q(feedback='')),
+    )
+    participants = totals['participants']
+    totals['attendance_rate'] = totals['attended'] / participants if participants else 0.0
+    stats, _ = AttendanceStats.objects.update_or_create(event=event, defaults=totals)
+    return stats
@@ -67,14 +67,14 @@ class PhotoUploadForm(forms.ModelForm):
 class EventFeedbackForm(forms.ModelForm):
     class Meta:
         model = EventParticipation
-        fields = ('feedback', 'attended')
+        # Attendance is recorded by the organizer (take_attendance), not self-reported
+        fields = ('feedback',)
         widgets = {
             'feedback': forms.Textarea(attrs={
                 'rows': 4, 
                 'placeholder': 'Share your experience...',
                 'class': 'form-control'
             }),
-            'attended': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
     
     def clean_feedback(self):
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.crypto import get_random_string
+
+
+def fill_check_in_codes(apps, schema_editor):
+    EventParticipation = apps.get_model('interaction', 'EventParticipation')
+    ids = list(EventParticipation.objects.filter(check_in_code__isnull=True).values_list('id', flat=True))
+    for start in range(0, len(ids), 500):
+        batch = [
+            EventParticipation(id=pk, check_in_code=get_random_string(10, 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'))
+            for pk in ids[start:start + 500]
+        ]
+        EventParticipation.objects.bulk_update(batch, ['check_in_code'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_event_excerpt'),
+        ('interaction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceStats',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='attendance_stats', serialize=False, to='events.event')),
+                ('participants', models.PositiveIntegerField(default=0)),
+                ('attended', models.PositiveIntegerField(default=0)),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('attendance_rate', models.FloatField(default=0.0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Attendance stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='eventparticipation',
+            name='check_in_code',
+            field=models.CharField(blank=True, editable=False, max_length=16, null=True, unique=True),
+        ),
+        migrations.RunPython(fill_check_in_codes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interaction', '0003_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photoupload',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, upload_to='event_photos/thumbs/'),
+        ),
+    ]
@@ -1,7 +1,17 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.crypto import get_random_string
 from events.models import Event
+from .photos import make_thumbnail, thumbnail_name
+
+CHECK_IN_CODE_CHARS = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'  # no 0/O or 1/I
+CHECK_IN_CODE_LENGTH = 10
+
+
+def new_check_in_code():
+    return get_random_string(CHECK_IN_CODE_LENGTH, CHECK_IN_CODE_CHARS)
+
 
 class EventParticipation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -9,23 +19,63 @@ class EventParticipation(models.Model):
     joined_date = models.DateTimeField(default=timezone.now)
     attended = models.BooleanField(default=False)
     feedback = models.TextField(max_length=500, blank=True)
+    # Shown to the participant and scanned by the organizer at the door
+    check_in_code = models.CharField(max_length=16, unique=True, null=True, blank=True, editable=False)
     
     def __str__(self):
         return f"{self.user.username} - {self.event.title}"
     
+    def save(self, *args, **kwargs):
+        if not self.check_in_code:
+            self.check_in_code = new_check_in_code()
+        super().save(*args, **kwargs)
+    
     class Meta:
         unique_together = ('user', 'event')
 
+class WaitlistEntry(models.Model):
+    """A user waiting for a spot in a full event; the queue is ordered by id"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist')
+    joined_date = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"{self.user.username} waiting for {self.event.title}"
+    
+    def position(self):
+        """1 for the next user to be promoted"""
+        return WaitlistEntry.objects.filter(event_id=self.event_id, id__lte=self.id).count()
+    
+    class Meta:
+        unique_together = ('user', 'event')
+        ordering = ['id']
+        verbose_name_plural = "Waitlist entries"
+
 class PhotoUpload(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='photos')
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     image = models.ImageField(upload_to='event_photos/')
+    # Small WebP for grids and live updates (see interaction/photos.py)
+    thumbnail = models.ImageField(upload_to='event_photos/thumbs/', blank=True, editable=False)
     caption = models.CharField(max_length=200, blank=True)
     upload_date = models.DateTimeField(default=timezone.now)
     
     def __str__(self):
         return f"Photo by {self.user.username} for {self.event.title}"
     
+    def save(self, *args, **kwargs):
+        if self.image and not self.image._committed:
+            try:
+                self.thumbnail.save(thumbnail_name(self.image.name), make_thumbnail(self.image), save=False)
+            except OSError:
+                # Not readable by Pillow: grids show the original
+                self.thumbnail = ''
+        super().save(*args, **kwargs)
+    
+    @property
+    def thumbnail_url(self):
+        return (self.thumbnail or self.image).url
+    
     class Meta:
         ordering = ['-upload_date']
 
@@ -39,4 +89,19 @@ class UserHistory(models.Model):
         return f"{self.user.username} visited {self.page_visited}"
     
     class Meta:
-        ordering = ['-visit_date']
\ No newline at end of file
+        ordering = ['-visit_date']
+
+class AttendanceStats(models.Model):
+    """Attendance and feedback totals per event, updated when attendance is marked"""
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='attendance_stats')
+    participants = models.PositiveIntegerField(default=0)
+    attended = models.PositiveIntegerField(default=0)
+    feedback_count = models.PositiveIntegerField(default=0)
+    attendance_rate = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.event.title}: {self.attended}/{self.participants} attended"
+    
+    class Meta:
+        verbose_name_plural = "Attendance stats"
@@ -0,0 +1,41 @@
+"""
+Event photo thumbnails.
+
+PhotoUpload.save() writes one WebP no wider than THUMBNAIL_WIDTH for each
+new upload to event_photos/thumbs/. Photo grids and the live updates of the
+event page show the thumbnail and link to the original. Photos uploaded
+before thumbnails existed (or that Pillow can't read) fall back to the
+original.
+"""
+
+import io
+import os
+
+from django.core.files.base import ContentFile
+
+THUMBNAIL_WIDTH = 480
+THUMBNAIL_QUALITY = 80
+
+
+def thumbnail_name(image_name):
+    return os.path.splitext(os.path.basename(image_name))[0] + '.webp'
+
+
+def make_thumbnail(upload):
+    """
+    Return the WebP thumbnail of an uploaded image as a ContentFile.
+    Raises OSError (or Pillow's UnidentifiedImageError) for files that
+    aren't images.
+    """
+    from PIL import Image, ImageOps
+
+    upload.seek(0)
+    with Image.open(upload) as image:
+        # Phones store rotation in EXIF; apply it before dropping the metadata
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        image.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 2), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, 'WEBP', quality=THUMBNAIL_QUALITY, method=6)
+    upload.seek(0)
+    return ContentFile(buffer.getvalue())
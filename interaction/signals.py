@@ -0,0 +1,17 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from ecoconnect.cache import invalidate_tags_on_commit, event_tag
+from .models import EventParticipation, PhotoUpload
+
+
+@receiver(post_save, sender=EventParticipation)
+@receiver(post_delete, sender=EventParticipation)
+def participation_changed(sender, instance, **kwargs):
+    """Participant counts changed for this event"""
+    invalidate_tags_on_commit('participations', event_tag(instance.event_id))
+
+
+@receiver(post_save, sender=PhotoUpload)
+@receiver(post_delete, sender=PhotoUpload)
+def photo_changed(sender, instance, **kwargs):
+    invalidate_tags_on_commit('photos', event_tag(instance.event_id))
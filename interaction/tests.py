@@ -1,3 +1,165 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+
+from ecoconnect.cache import event_tag, tag_versions
+from events.models import Event, EventCategory
+from notifications.models import OutboundEmail
+from search.models import Location
+from . import attendance, waitlist
+from .models import AttendanceStats, EventParticipation, WaitlistEntry
+
+
+class EventFixtureMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pw')
+        cls.users = [
+            User.objects.create_user(f'user{i}', f'user{i}@example.com', 'pw', first_name=f'User{i}')
+            for i in range(4)
+        ]
+        cls.category = EventCategory.objects.create(name='Tree Planting', description='Trees')
+        cls.location = Location.objects.create(name='Whitby')
+
+    def make_event(self, **kwargs):
+        fields = {
+            'title': 'Planting day', 'description': 'Trees', 'organizer': self.organizer,
+            'date_time': timezone.now() + timedelta(days=2), 'location': self.location,
+            'category': self.category, 'max_participants': 1,
+        }
+        fields.update(kwargs)
+        return Event.objects.create(**fields)
+
+
+class WaitlistTests(EventFixtureMixin, TestCase):
+    def test_full_event_queues_users_in_order(self):
+        event = self.make_event()
+        first, second, third = self.users[:3]
+
+        self.assertEqual(waitlist.join(first, event.id)[0], waitlist.JOINED)
+        self.assertEqual(waitlist.join(second, event.id)[0], waitlist.WAITLISTED)
+        self.assertEqual(waitlist.join(third, event.id)[0], waitlist.WAITLISTED)
+        self.assertEqual(waitlist.join(second, event.id)[0], waitlist.ALREADY_WAITING)
+        self.assertEqual(waitlist.join(first, event.id)[0], waitlist.ALREADY_JOINED)
+
+        self.assertEqual(waitlist.leave(first, event.id)[0], waitlist.LEFT)
+        participants = set(EventParticipation.objects.filter(event=event).values_list('user_id', flat=True))
+        self.assertEqual(participants, {second.id})
+        self.assertEqual(list(WaitlistEntry.objects.filter(event=event).values_list('user_id', flat=True)), [third.id])
+
+    def test_waiting_users_keep_their_place(self):
+        event = self.make_event()
+        first, second, newcomer = self.users[:3]
+        waitlist.join(first, event.id)
+        waitlist.join(second, event.id)
+
+        # A spot opens without anyone leaving through the waitlist code
+        EventParticipation.objects.filter(event=event, user=first).delete()
+        self.assertEqual(waitlist.join(newcomer, event.id)[0], waitlist.WAITLISTED)
+        self.assertTrue(EventParticipation.objects.filter(event=event, user=second).exists())
+
+    def test_raising_capacity_promotes_several(self):
+        event = self.make_event()
+        for user in self.users:
+            waitlist.join(user, event.id)
+        Event.objects.filter(id=event.id).update(max_participants=3)
+
+        promoted = waitlist.promote_waitlist(event.id)
+        self.assertEqual([user.id for user in promoted], [self.users[1].id, self.users[2].id])
+        self.assertEqual(EventParticipation.objects.filter(event=event).count(), 3)
+        self.assertEqual(WaitlistEntry.objects.filter(event=event).count(), 1)
+
+    def test_promotion_email_is_plain_text(self):
+        event = self.make_event(title="Kids' Park & <Trail>")
+        waitlist.join(self.users[0], event.id)
+        waitlist.join(self.users[1], event.id)
+        waitlist.leave(self.users[0], event.id)
+
+        email = OutboundEmail.objects.get(to=[self.users[1].email])
+        self.assertIn('registered for "Kids\' Park & <Trail>"', email.body)
+        self.assertNotIn('&amp;', email.body)
+        self.assertNotIn('&#x27;', email.body)
+        self.assertNotIn('&lt;', email.body)
+
+    def test_past_events_cannot_be_joined(self):
+        event = self.make_event(date_time=timezone.now() - timedelta(hours=1))
+        self.assertEqual(waitlist.join(self.users[0], event.id)[0], waitlist.EVENT_PASSED)
+
+
+class AttendanceTests(EventFixtureMixin, TestCase):
+    def setUp(self):
+        self.event = self.make_event(max_participants=10)
+        self.participations = [
+            EventParticipation.objects.create(user=user, event=self.event) for user in self.users
+        ]
+
+    def attended(self):
+        return set(EventParticipation.objects.filter(event=self.event, attended=True).values_list('id', flat=True))
+
+    def test_marks_by_id_and_code_in_batches(self):
+        first, second, third, _ = self.participations
+        messy_code = '-'.join(third.check_in_code[i:i + 5] for i in (0, 5)).lower()
+        with mock.patch.object(attendance, 'BATCH_SIZE', 1):
+            updated, unknown = attendance.mark_attendance(
+                self.event, participation_ids=[first.id, str(second.id), first.id],
+                codes=[messy_code, 'nope 123', ''],
+            )
+        self.assertEqual(updated, 3)
+        self.assertEqual(unknown, ['NOPE123'])
+        self.assertEqual(self.attended(), {first.id, second.id, third.id})
+
+        stats = AttendanceStats.objects.get(event=self.event)
+        self.assertEqual((stats.participants, stats.attended), (4, 3))
+        self.assertEqual(stats.attendance_rate, 0.75)
+
+    def test_unchanged_rows_are_skipped(self):
+        first = self.participations[0]
+        attendance.mark_attendance(self.event, codes=[first.check_in_code])
+        self.assertEqual(attendance.mark_attendance(self.event, codes=[first.check_in_code]), (0, []))
+
+        self.assertEqual(attendance.mark_attendance(self.event, participation_ids=[first.id], attended=False)[0], 1)
+        self.assertEqual(self.attended(), set())
+        self.assertEqual(AttendanceStats.objects.get(event=self.event).attended, 0)
+
+    def test_caches_are_invalidated_after_commit(self):
+        cache.clear()
+        tag = event_tag(self.event.id)
+        before = tag_versions([tag])[tag]
+        with self.captureOnCommitCallbacks() as callbacks:
+            attendance.mark_attendance(self.event, participation_ids=[self.participations[0].id])
+            self.assertEqual(tag_versions([tag])[tag], before)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(tag_versions([tag])[tag], before)
+
+    def test_other_events_are_untouched(self):
+        other = self.make_event()
+        outsider = EventParticipation.objects.create(user=self.users[0], event=other)
+        updated, unknown = attendance.mark_attendance(
+            self.event, participation_ids=[outsider.id], codes=[outsider.check_in_code],
+        )
+        self.assertEqual(updated, 0)
+        self.assertEqual(unknown, [outsider.check_in_code])
+        self.assertFalse(EventParticipation.objects.get(id=outsider.id).attended)
+
+    def test_scanner_endpoint(self):
+        self.client.force_login(self.organizer)
+        response = self.client.post(
+            f'/interaction/attendance/{self.event.id}/',
+            {'codes': [self.participations[1].check_in_code, 'BAD']},
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['updated'], data['unknown_codes']), (1, ['BAD']))
+        self.assertEqual(data['stats']['attended'], 1)
 
-# Create your tests here.
+        response = self.client.post(
+            f'/interaction/attendance/{self.event.id}/', '{"participants": ["x"]}',
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
@@ -7,4 +7,6 @@ urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
     path('upload/', views.upload_photo, name='upload_photo'),
     path('upload/<int:event_id>/', views.upload_photo, name='upload_photo_event'),
+    path('attendance/<int:event_id>/', views.take_attendance, name='take_attendance'),
+    path('feedback/<int:event_id>/', views.event_feedback, name='event_feedback'),
 ]
\ No newline at end of file
@@ -1,12 +1,21 @@
+import json
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.utils import timezone
 from events.models import Event
-from .models import EventParticipation, PhotoUpload, UserHistory
-from .forms import PhotoUploadForm
+from .models import EventParticipation, PhotoUpload, UserHistory, AttendanceStats
+from .forms import PhotoUploadForm, EventFeedbackForm
+from .attendance import mark_attendance, refresh_stats
+from django.db import transaction
 from django.db.models import Count, Q, Prefetch
+from ecoconnect.routers import use_primary_db
+from search.recommendations import recommended_events
+from events.roster import roster_rows
+from events.feeds import user_token
+from users.models import profile_lookup
 
 @login_required
 def dashboard(request):
@@ -28,8 +37,10 @@ def dashboard(request):
     # Get user's organized events with photo counts (limit to recent 5)
     organized_events = Event.objects.filter(
         organizer=user
-    ).prefetch_related(
-        'photos'
+    ).select_related(
+        'location'
+    ).defer(
+        'description'
     ).annotate(
         photo_count=Count('photos')
     ).order_by('-date_time')[:5]
@@ -38,11 +49,14 @@ def dashboard(request):
     joined_events = EventParticipation.objects.filter(
         user=user
     ).select_related(
-        'event__organizer', 
+        profile_lookup('event__organizer'), 
         'event__category', 
         'event__location'
-    ).prefetch_related(
-        'event__photos'
+    ).only(
+        'joined_date', 'event__id', 'event__title', 'event__date_time', 'event__status',
+        'event__organizer__username', 'event__organizer__first_name', 'event__organizer__last_name',
+        f"{profile_lookup('event__organizer')}__avatar_version",
+        'event__category__name', 'event__location__name'
     ).annotate(
         event_photo_count=Count('event__photos')
     ).order_by('-joined_date')[:5]
@@ -51,7 +65,7 @@ def dashboard(request):
     recent_activity = []
     
     # Add recent events organized with more detail
-    for event in Event.objects.filter(organizer=user).order_by('-created_at')[:3]:
+    for event in Event.objects.filter(organizer=user).select_related('category').defer('description').order_by('-created_at')[:3]:
         status_text = "organized"
         if event.status == 'completed':
             status_text = "completed"
@@ -66,7 +80,7 @@ def dashboard(request):
         })
     
     # Add recent participations with more detail
-    for participation in EventParticipation.objects.filter(user=user).select_related('event').order_by('-joined_date')[:3]:
+    for participation in EventParticipation.objects.filter(user=user).select_related('event').defer('event__description').order_by('-joined_date')[:3]:
         event_status = ""
         if participation.event.status == 'completed':
             event_status = " (completed)"
@@ -79,7 +93,7 @@ def dashboard(request):
         })
     
     # Add recent photo uploads with event context
-    for photo in PhotoUpload.objects.filter(user=user).select_related('event').order_by('-upload_date')[:3]:
+    for photo in PhotoUpload.objects.filter(user=user).select_related('event').defer('event__description').order_by('-upload_date')[:3]:
         recent_activity.append({
             'description': f'You shared a photo from "{photo.event.title}"',
             'date': photo.upload_date,
@@ -108,11 +122,14 @@ def dashboard(request):
         'joined_events': joined_events,
         'recent_activity': recent_activity,
         'memory_events': memory_events,
+        'recommended_events': recommended_events(user),
+        'calendar_url': request.build_absolute_uri(reverse('events:user_calendar', args=[user_token(user)])),
     }
     
     return render(request, 'interaction/dashboard.html', context)
 
 @login_required
+@use_primary_db
 def upload_photo(request, event_id=None):
     # Get events the user can upload photos for (organized events or events they participated in)
     user_events = Event.objects.filter(
@@ -178,4 +195,86 @@ def upload_photo(request, event_id=None):
         'selected_event': selected_event,
     }
     
-    return render(request, 'interaction/upload_photo.html', context)
\ No newline at end of file
+    return render(request, 'interaction/upload_photo.html', context)
+
+def _stats_dict(stats):
+    return {
+        'participants': stats.participants,
+        'attended': stats.attended,
+        'feedback_count': stats.feedback_count,
+        'attendance_rate': round(stats.attendance_rate, 4),
+    }
+
+@login_required
+@use_primary_db
+def take_attendance(request, event_id):
+    event = get_object_or_404(Event, id=event_id)
+    
+    if request.user != event.organizer:
+        messages.error(request, 'Only the organizer can take attendance.')
+        return redirect('events:event_detail', event_id=event.id)
+    
+    # Check-in scanners post JSON: {"codes": [...]} or {"participants": [...]}
+    if request.method == 'POST' and request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+            updated, unknown = mark_attendance(
+                event,
+                participation_ids=data.get('participants', []),
+                codes=data.get('codes', []),
+                attended=bool(data.get('attended', True)),
+            )
+        except (ValueError, TypeError, AttributeError):
+            return JsonResponse({'error': 'Invalid request body'}, status=400)
+        stats = AttendanceStats.objects.filter(event=event).first() or refresh_stats(event)
+        return JsonResponse({'updated': updated, 'unknown_codes': unknown, 'stats': _stats_dict(stats)})
+    
+    if request.method == 'POST':
+        # Ticked boxes are the attendees; everyone else on the page did not attend
+        present = set(request.POST.getlist('attended'))
+        listed = set(request.POST.getlist('listed'))
+        try:
+            with transaction.atomic():
+                marked, _ = mark_attendance(event, participation_ids=present)
+                unmarked, _ = mark_attendance(event, participation_ids=listed - present, attended=False)
+                scanned, unknown = mark_attendance(event, codes=request.POST.get('codes', '').split())
+        except ValueError:
+            messages.error(request, 'Invalid participant selection.')
+            return redirect('interaction:take_attendance', event_id=event.id)
+        messages.success(request, f'Attendance updated for {marked + unmarked + scanned} participant(s).')
+        if unknown:
+            messages.warning(request, f'Unknown check-in codes: {", ".join(unknown)}')
+        return redirect('interaction:take_attendance', event_id=event.id)
+    
+    context = {
+        'event': event,
+        'participants': roster_rows(event, with_avatars=True),
+        'stats': AttendanceStats.objects.filter(event=event).first(),
+    }
+    return render(request, 'interaction/take_attendance.html', context)
+
+@login_required
+@use_primary_db
+def event_feedback(request, event_id):
+    event = get_object_or_404(Event, id=event_id)
+    participation = EventParticipation.objects.filter(user=request.user, event=event).first()
+    
+    if participation is None:
+        messages.error(request, 'You can only give feedback on events you joined.')
+        return redirect('events:event_detail', event_id=event.id)
+    
+    if event.date_time > timezone.now():
+        messages.error(request, 'Feedback opens once the event has started.')
+        return redirect('events:event_detail', event_id=event.id)
+    
+    if request.method == 'POST':
+        form = EventFeedbackForm(request.POST, instance=participation)
+        if form.is_valid():
+            form.save()
+            refresh_stats(event)
+            messages.success(request, f'Thank you for your feedback on "{event.title}"!')
+            return redirect('events:event_detail', event_id=event.id)
+    else:
+        form = EventFeedbackForm(instance=participation)
+    
+    return render(request, 'interaction/event_feedback.html', {'form': form, 'event': event})
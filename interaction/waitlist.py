@@ -0,0 +1,136 @@
+"""
+Joining, leaving and the waitlist for full events.
+
+Every change to an event's participants or waitlist runs in a transaction
+that first locks that event's row (SELECT ... FOR UPDATE). Joins, leaves
+and promotions for the same event therefore happen one after another,
+while other events are unaffected. SQLite has no row locks; there the
+IMMEDIATE transactions configured in ecoconnect.db serialize writers.
+
+When a spot opens up (someone leaves, or the organizer raises
+max_participants) the oldest waitlist entries are promoted in the same
+transaction and their notification emails are queued with it.
+"""
+
+from django.core.mail import EmailMessage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from events.models import Event
+from notifications.jobs import absolute_url
+from notifications.mailqueue import enqueue
+from .models import EventParticipation, WaitlistEntry
+
+# Outcomes of join() and leave()
+JOINED = 'joined'
+WAITLISTED = 'waitlisted'
+ALREADY_JOINED = 'already_joined'
+ALREADY_WAITING = 'already_waiting'
+EVENT_PASSED = 'event_passed'
+LEFT = 'left'
+LEFT_WAITLIST = 'left_waitlist'
+NOT_REGISTERED = 'not_registered'
+
+
+def _lock_event(event_id):
+    return Event.objects.select_for_update().get(id=event_id)
+
+
+def join(user, event_id):
+    """
+    Join the event, or queue for it if it is full.
+    Returns (outcome, event); raises Event.DoesNotExist.
+    """
+    with transaction.atomic():
+        event = _lock_event(event_id)
+
+        # Capacity and "already joined" in one query
+        counts = EventParticipation.objects.filter(event=event).aggregate(
+            taken=Count('id'),
+            mine=Count('id', filter=Q(user=user)),
+        )
+        if counts['mine']:
+            return ALREADY_JOINED, event
+        if event.date_time <= timezone.now():
+            return EVENT_PASSED, event
+
+        free = event.max_participants - counts['taken']
+        if free > 0:
+            # Waiting users keep their place: free spots go to them first
+            promoted = _promote(event, free)
+            if user.id in [promoted_user.id for promoted_user in promoted]:
+                return JOINED, event
+            free -= len(promoted)
+
+        if free > 0:
+            try:
+                with transaction.atomic():
+                    EventParticipation.objects.create(user=user, event=event)
+            except IntegrityError:
+                # unique_together caught a duplicate the lock didn't (e.g. no row locks)
+                return ALREADY_JOINED, event
+            return JOINED, event
+
+        _, created = WaitlistEntry.objects.get_or_create(user=user, event=event)
+        return (WAITLISTED if created else ALREADY_WAITING), event
+
+
+def leave(user, event_id):
+    """
+    Leave the event (or its waitlist) and promote whoever is next.
+    Returns (outcome, event); raises Event.DoesNotExist.
+    """
+    with transaction.atomic():
+        event = _lock_event(event_id)
+
+        deleted, _ = EventParticipation.objects.filter(user=user, event=event).delete()
+        if deleted:
+            _promote(event)
+            return LEFT, event
+
+        deleted, _ = WaitlistEntry.objects.filter(user=user, event=event).delete()
+        return (LEFT_WAITLIST if deleted else NOT_REGISTERED), event
+
+
+def promote_waitlist(event_id):
+    """Fill free spots from the waitlist, e.g. after capacity was raised."""
+    with transaction.atomic():
+        return _promote(_lock_event(event_id))
+
+
+def _promote(event, free=None):
+    """Move waiting users into free spots. The event row must be locked."""
+    if event.date_time <= timezone.now():
+        return []
+
+    if free is None:
+        free = event.max_participants - EventParticipation.objects.filter(event=event).count()
+    if free <= 0:
+        return []
+
+    entries = list(event.waitlist.select_related('user')[:free])
+    if not entries:
+        return []
+
+    # One by one so post_save keeps caches, the index and check-in codes right
+    for entry in entries:
+        EventParticipation.objects.create(user=entry.user, event=event)
+    WaitlistEntry.objects.filter(id__in=[entry.id for entry in entries]).delete()
+
+    _notify_promoted(event, [entry.user for entry in entries])
+    return [entry.user for entry in entries]
+
+
+def _notify_promoted(event, users):
+    """Queue the 'you got a spot' emails in the promotion's transaction."""
+    body = render_to_string('notifications/waitlist_promoted.txt', {
+        'event': event,
+        'event_url': absolute_url(event.get_absolute_url()),
+    })
+    subject = f'You got a spot at {event.title}'
+    enqueue([
+        EmailMessage(subject, f'Hi {user.first_name or "there"},\n\n{body}', to=[user.email])
+        for user in users if user.email
+    ])
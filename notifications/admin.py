@@ -0,0 +1,13 @@
+from django.contrib import admin
+from .models import OutboundEmail, NotificationLog
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'to')
+
+@admin.register(NotificationLog)
+class NotificationLogAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'key', 'user', 'created_at')
+    list_filter = ('kind', 'created_at')
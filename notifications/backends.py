@@ -0,0 +1,27 @@
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .mailqueue import delivery_backend, enqueue
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """
+    Email backend that stores messages in the outbound queue.
+
+    Anything calling send_mail() - the contact form, password reset - returns
+    as soon as the message is saved. Run ``python manage.py send_queued_mail``
+    to deliver them. Messages with attachments can't be stored, so those are
+    sent straight away through the delivery backend.
+    """
+
+    def send_messages(self, email_messages):
+        queued = [message for message in email_messages if not message.attachments]
+        direct = [message for message in email_messages if message.attachments]
+
+        count = 0
+        if queued:
+            count += len(enqueue(queued))
+        if direct:
+            connection = get_connection(delivery_backend(), fail_silently=self.fail_silently)
+            count += connection.send_messages(direct) or 0
+        return count
@@ -0,0 +1,217 @@
+"""
+Event reminder and weekly digest jobs.
+
+Both jobs stream recipients with ``iterator()``, render each event's text
+once, queue messages in batches through ``notifications.mailqueue`` and
+record every recipient in NotificationLog in the same transaction. Only
+messages whose log row is new are queued, and the log is read from the
+primary, so running a job twice (or twice at once) never sends the same
+notification twice.
+"""
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.mail import EmailMessage
+from django.db import IntegrityError, transaction
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from events.models import Event
+from interaction.models import EventParticipation
+from users.models import get_profile, with_profile
+from .mailqueue import enqueue
+from .models import NotificationLog
+
+BATCH_SIZE = 500
+
+
+def absolute_url(path):
+    return settings.SITE_URL + path
+
+
+def _checkpoint(kind, pending):
+    """Log the pending rows; returns the ones that weren't logged already."""
+    try:
+        with transaction.atomic():
+            NotificationLog.objects.bulk_create(
+                [NotificationLog(kind=kind, key=key, user_id=user_id) for user_id, key, _ in pending]
+            )
+        return list(pending)
+    except IntegrityError:
+        # Another run got to some of them first: keep the rows we inserted
+        fresh = []
+        for user_id, key, message in pending:
+            try:
+                with transaction.atomic():
+                    NotificationLog.objects.create(kind=kind, key=key, user_id=user_id)
+            except IntegrityError:
+                continue
+            fresh.append((user_id, key, message))
+        return fresh
+
+
+def _flush(kind, pending):
+    """Checkpoint the pending (user_id, key, message) rows and queue the new ones."""
+    if not pending:
+        return 0
+    with transaction.atomic():
+        fresh = _checkpoint(kind, pending)
+        enqueue([message for _, _, message in fresh])
+    pending.clear()
+    return len(fresh)
+
+
+def send_event_reminders(hours=24, now=None, batch_size=BATCH_SIZE):
+    """Remind participants of events starting within the next ``hours``."""
+    now = now or timezone.now()
+    events = Event.objects.filter(
+        status='upcoming',
+        date_time__gt=now,
+        date_time__lte=now + timedelta(hours=hours),
+    ).select_related('location', 'category').order_by('date_time')
+
+    sent = 0
+    for event in events:
+        key = f'event:{event.id}'
+        subject = f'Reminder: {event.title} is coming up'
+        # Rendered once; only the greeting differs between participants
+        body = render_to_string('notifications/event_reminder.txt', {
+            'event': event,
+            'event_url': absolute_url(event.get_absolute_url()),
+        })
+
+        already_reminded = NotificationLog.objects.filter(
+            kind='reminder', key=key
+        ).values('user_id')
+        # The log is our checkpoint: a lagging replica would miss recent rows
+        participants = EventParticipation.objects.using('default').filter(
+            event=event
+        ).exclude(
+            user__email=''
+        ).exclude(
+            user_id__in=already_reminded
+        ).values_list('user_id', 'user__email', 'user__first_name')
+
+        pending = []
+        for user_id, email, first_name in participants.iterator(chunk_size=batch_size):
+            message = EmailMessage(subject, f'Hi {first_name or "there"},\n\n{body}', to=[email])
+            pending.append((user_id, key, message))
+            if len(pending) >= batch_size:
+                sent += _flush('reminder', pending)
+        sent += _flush('reminder', pending)
+
+    return sent
+
+
+def digest_period(now):
+    """ISO week the digest belongs to, e.g. '2025-W30'."""
+    year, week, _ = now.isocalendar()
+    return f'{year}-W{week:02d}'
+
+
+def send_weekly_digest(days=7, per_user=5, now=None, batch_size=BATCH_SIZE):
+    """
+    Email each user the upcoming events that match their profile interests
+    or the tags of events they joined before.
+    """
+    now = now or timezone.now()
+    period = digest_period(now)
+    events = list(
+        Event.objects.filter(
+            status='upcoming',
+            date_time__gt=now,
+            date_time__lte=now + timedelta(days=days),
+        ).select_related('location', 'category').prefetch_related('tags').order_by('date_time')
+    )
+    if not events:
+        return 0
+
+    # Everything about an event is computed once and shared by all users
+    snippets = {}
+    events_by_tag = defaultdict(set)
+    labels = {}
+    for event in events:
+        snippets[event.id] = render_to_string('notifications/digest_event.txt', {
+            'event': event,
+            'event_url': absolute_url(event.get_absolute_url()),
+        })
+        names = [event.category.name.lower()]
+        for tag in event.tags.all():
+            events_by_tag[tag.id].add(event.id)
+            names.append(tag.name.lower())
+        labels[event.id] = names
+    order = {event.id: position for position, event in enumerate(events)}
+
+    term_matches = {}
+
+    def matches_for(term):
+        if term not in term_matches:
+            term_matches[term] = {
+                event_id for event_id, names in labels.items()
+                if any(term in name or name in term for name in names)
+            }
+        return term_matches[term]
+
+    users = with_profile(User.objects.using('default').filter(
+        is_active=True
+    ).exclude(
+        email=''
+    ).exclude(
+        id__in=NotificationLog.objects.filter(kind='digest', key=period).values('user_id')
+    ).order_by('id'))
+
+    sent = 0
+    pending = []
+    chunk = []
+
+    def process(chunk):
+        # One query for the whole chunk's participation history
+        joined_tags = defaultdict(set)
+        joined_events = defaultdict(set)
+        history = EventParticipation.objects.filter(
+            user_id__in=[user.id for user in chunk]
+        ).values_list('user_id', 'event_id', 'event__tags')
+        for user_id, event_id, tag_id in history:
+            joined_events[user_id].add(event_id)
+            if tag_id is not None:
+                joined_tags[user_id].add(tag_id)
+
+        for user in chunk:
+            scores = defaultdict(int)
+            profile = get_profile(user)
+            for term in (profile.get_interests_list() if profile else []):
+                for event_id in matches_for(term):
+                    scores[event_id] += 2
+            for tag_id in joined_tags[user.id]:
+                for event_id in events_by_tag.get(tag_id, ()):
+                    scores[event_id] += 1
+            for event_id in joined_events[user.id]:
+                scores.pop(event_id, None)
+            if not scores:
+                continue
+
+            picks = sorted(scores, key=lambda event_id: (-scores[event_id], order[event_id]))[:per_user]
+            body = (
+                f'Hi {user.first_name or "there"},\n\n'
+                f'Here are upcoming environmental events picked for you:\n\n'
+                + '\n'.join(snippets[event_id] for event_id in picks)
+                + f'\nFind more events: {absolute_url(reverse("events:event_list"))}\n\nThe EcoConnect team\n'
+            )
+            message = EmailMessage('Your weekly EcoConnect events', body, to=[user.email])
+            pending.append((user.id, period, message))
+
+    for user in users.iterator(chunk_size=batch_size):
+        chunk.append(user)
+        if len(chunk) >= batch_size:
+            process(chunk)
+            chunk = []
+            sent += _flush('digest', pending)
+    if chunk:
+        process(chunk)
+    sent += _flush('digest', pending)
+
+    return sent
@@ -0,0 +1,145 @@
+"""
+Outbound email queue.
+
+Requests never talk to the SMTP server: ``enqueue`` stores messages and
+``send_batch`` (run by the send_queued_mail command) delivers them over a
+single connection per batch, retrying failures with exponential backoff.
+"""
+
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.utils import timezone
+
+from ecoconnect.routers import pin_to_primary
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# A claimed message that isn't finished within this window is retried by
+# another worker (the first one probably crashed).
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def delivery_backend():
+    """The backend that actually sends mail (SMTP, console, locmem...)."""
+    return getattr(settings, 'EMAIL_QUEUE_BACKEND', settings.EMAIL_BACKEND)
+
+
+def enqueue(messages):
+    """Store Django EmailMessage objects for the worker to send."""
+    rows = []
+    for message in messages:
+        html_body = ''
+        for content, mimetype in getattr(message, 'alternatives', []):
+            if mimetype == 'text/html':
+                html_body = content
+        rows.append(OutboundEmail(
+            subject=message.subject,
+            body=message.body,
+            html_body=html_body,
+            from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(message.to),
+            cc=list(message.cc),
+            bcc=list(message.bcc),
+            reply_to=list(message.reply_to),
+            headers=dict(message.extra_headers),
+        ))
+    return OutboundEmail.objects.bulk_create(rows, batch_size=500)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 1, 2, 4, 8... times the base delay, capped at a day."""
+    seconds = settings.EMAIL_QUEUE_RETRY_DELAY * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(seconds, 86400))
+
+
+def claim_batch(batch_size):
+    """Reserve up to batch_size due messages for this worker."""
+    # Workers have no request to pin them, and a replica that hasn't seen
+    # our own UPDATE would return nothing while the rows stay claimed
+    with pin_to_primary():
+        now = timezone.now()
+        due = list(
+            OutboundEmail.objects.filter(status='queued', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not due:
+            return []
+
+        # The next_attempt_at check makes the claim safe against other workers
+        # that picked the same ids a moment earlier
+        token = uuid.uuid4().hex
+        OutboundEmail.objects.filter(
+            id__in=due, status='queued', next_attempt_at__lte=now
+        ).update(claim=token, next_attempt_at=now + CLAIM_TIMEOUT)
+        return list(OutboundEmail.objects.filter(claim=token))
+
+
+def _failed(email, error):
+    email.attempts += 1
+    email.claim = ''
+    email.last_error = str(error)[:1000]
+    if email.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+        email.status = 'failed'
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+
+
+def send_batch(batch_size=None):
+    """
+    Send one batch of due messages over a single connection.
+
+    Returns a dict of counts plus the elapsed time, for throughput reporting.
+    """
+    started = time.monotonic()
+    batch = claim_batch(batch_size or settings.EMAIL_QUEUE_BATCH_SIZE)
+    stats = {'claimed': len(batch), 'sent': 0, 'retrying': 0, 'failed': 0}
+    if not batch:
+        stats['seconds'] = time.monotonic() - started
+        return stats
+
+    connection = get_connection(delivery_backend(), fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        # Server unreachable: push the whole batch back with backoff
+        logger.warning('Could not connect to mail server: %s', e)
+        for email in batch:
+            _failed(email, e)
+    else:
+        try:
+            for email in batch:
+                try:
+                    connection.send_messages([email.to_message(connection)])
+                except Exception as e:
+                    logger.warning('Sending email %s failed: %s', email.id, e)
+                    _failed(email, e)
+                else:
+                    email.status = 'sent'
+                    email.sent_at = timezone.now()
+                    email.attempts += 1
+                    email.claim = ''
+                    email.last_error = ''
+        finally:
+            connection.close()
+
+    OutboundEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'claim', 'last_error', 'sent_at']
+    )
+
+    for email in batch:
+        if email.status == 'sent':
+            stats['sent'] += 1
+        elif email.status == 'failed':
+            stats['failed'] += 1
+        else:
+            stats['retrying'] += 1
+    stats['seconds'] = time.monotonic() - started
+    logger.info('Email batch: %(sent)s sent, %(retrying)s retrying, %(failed)s failed', stats)
+    return stats
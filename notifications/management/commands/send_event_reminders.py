@@ -0,0 +1,27 @@
+"""
+Management command to remind participants about events starting soon
+Usage: python manage.py send_event_reminders [--hours 24]
+
+Safe to run as often as you like (e.g. hourly from cron): participants
+who were already reminded about an event are skipped.
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.jobs import send_event_reminders
+
+
+class Command(BaseCommand):
+    help = 'Queue reminder emails for events starting in the next N hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Remind about events starting within this many hours (default: 24)'
+        )
+
+    def handle(self, *args, **options):
+        queued = send_event_reminders(hours=options['hours'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Queued {queued} reminder emails'))
@@ -0,0 +1,65 @@
+"""
+Management command to deliver queued emails
+Usage: python manage.py send_queued_mail [--loop] [--batch-size 100]
+
+Without --loop it sends everything that is currently due and exits, which
+suits cron. With --loop it keeps polling the queue every --interval seconds.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.mailqueue import send_batch
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails in batches over a single mail server connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Messages per connection (default: EMAIL_QUEUE_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for new messages'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds to wait when the queue is empty (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        totals = {'sent': 0, 'retrying': 0, 'failed': 0, 'seconds': 0.0}
+
+        try:
+            while True:
+                stats = send_batch(options['batch_size'])
+                if stats['claimed']:
+                    for key in totals:
+                        totals[key] += stats[key]
+                    rate = stats['sent'] / stats['seconds'] if stats['seconds'] else 0
+                    self.stdout.write(
+                        f"Batch: {stats['sent']} sent, {stats['retrying']} retrying, "
+                        f"{stats['failed']} failed in {stats['seconds']:.2f}s "
+                        f"({rate:.1f} msg/s)"
+                    )
+                    continue
+
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        rate = totals['sent'] / totals['seconds'] if totals['seconds'] else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Sent {totals['sent']} emails ({totals['retrying']} retrying, "
+            f"{totals['failed']} failed) at {rate:.1f} msg/s"
+        ))
@@ -0,0 +1,33 @@
+"""
+Management command to send the weekly digest of upcoming events
+Usage: python manage.py send_weekly_digest [--days 7] [--per-user 5]
+
+Each user gets at most one digest per ISO week, so reruns after a crash
+only pick up the users that were not reached yet.
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.jobs import send_weekly_digest
+
+
+class Command(BaseCommand):
+    help = 'Queue a digest of upcoming events matching each user\'s interests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=7,
+            help='Include events in the next N days (default: 7)'
+        )
+        parser.add_argument(
+            '--per-user',
+            type=int,
+            default=5,
+            help='Maximum events listed per email (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        queued = send_weekly_digest(days=options['days'], per_user=options['per_user'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Queued {queued} digest emails'))
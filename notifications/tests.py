@@ -0,0 +1,212 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ecoconnect import routers
+from events.models import Event, EventCategory
+from interaction.models import EventParticipation
+from search.models import Location
+from users.models import UserProfile
+from . import mailqueue
+from .jobs import _flush, send_event_reminders, send_weekly_digest
+from .models import NotificationLog, OutboundEmail
+
+RAW_TITLE = "Kids' Beach & Park <Cleanup>"
+
+
+class BouncingBackend(EmailBackend):
+    """Refuses mail for bounce@ addresses."""
+
+    def send_messages(self, messages):
+        if any(address.startswith('bounce@') for message in messages for address in message.to):
+            raise ConnectionError('mailbox unavailable')
+        return super().send_messages(messages)
+
+
+class UnreachableBackend(EmailBackend):
+    def open(self):
+        raise ConnectionError('connection refused')
+
+
+class ReplicaSpyMixin:
+    """Configures a replica and records the models the router reads from it."""
+
+    def setUp(self):
+        super().setUp()
+        replicas = override_settings(DATABASE_REPLICAS=['replica'])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+
+        self.replica_reads = []
+        db_for_read = routers.PrimaryReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            if alias != 'default':
+                self.replica_reads.append(model._meta.label)
+            # Tests have a single database
+            return 'default'
+
+        patcher = mock.patch.object(routers.PrimaryReplicaRouter, 'db_for_read', spy)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class NotificationJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pw')
+        cls.user = User.objects.create_user('alex', 'alex@example.com', 'pw', first_name='Alex')
+        UserProfile.objects.filter(user=cls.user).update(environmental_interests='Beach Cleanup')
+        cls.category = EventCategory.objects.create(name='Beach Cleanup', description='Beaches')
+        cls.location = Location.objects.create(name='Oshawa')
+
+    def make_event(self, hours):
+        return Event.objects.create(
+            title=RAW_TITLE, description='Bring gloves & bags', organizer=self.organizer,
+            date_time=timezone.now() + timedelta(hours=hours),
+            location=self.location, category=self.category,
+        )
+
+    def test_reminder_body_is_not_html_escaped(self):
+        event = self.make_event(hours=3)
+        EventParticipation.objects.create(user=self.user, event=event)
+
+        self.assertEqual(send_event_reminders(hours=24), 1)
+        body = OutboundEmail.objects.get().body
+        self.assertIn(f'"{RAW_TITLE}" starts soon', body)
+        self.assertNotIn('&amp;', body)
+        self.assertNotIn('&#x27;', body)
+        self.assertNotIn('&lt;', body)
+
+    def test_reminders_are_sent_once(self):
+        event = self.make_event(hours=3)
+        EventParticipation.objects.create(user=self.user, event=event)
+
+        self.assertEqual(send_event_reminders(hours=24), 1)
+        self.assertEqual(send_event_reminders(hours=24), 0)
+        self.assertEqual(NotificationLog.objects.filter(kind='reminder').count(), 1)
+
+    def test_already_logged_recipients_are_not_queued_again(self):
+        # Another run logged user 1 between our read and our insert
+        other = User.objects.create_user('sam', 'sam@example.com', 'pw')
+        NotificationLog.objects.create(kind='reminder', key='event:1', user=self.user)
+        pending = [
+            (self.user.id, 'event:1', EmailMessage('Reminder', 'Hi', to=[self.user.email])),
+            (other.id, 'event:1', EmailMessage('Reminder', 'Hi', to=[other.email])),
+        ]
+        self.assertEqual(_flush('reminder', pending), 1)
+        self.assertEqual(list(OutboundEmail.objects.values_list('to', flat=True)), [[other.email]])
+        self.assertEqual(NotificationLog.objects.filter(kind='reminder', key='event:1').count(), 2)
+
+    def test_digest_body_is_not_html_escaped(self):
+        self.make_event(hours=48)
+
+        self.assertEqual(send_weekly_digest(), 1)
+        email = OutboundEmail.objects.get(to=['alex@example.com'])
+        self.assertIn(f'* {RAW_TITLE}', email.body)
+        self.assertNotIn('&amp;', email.body)
+        self.assertNotIn('&#x27;', email.body)
+        self.assertNotIn('&lt;', email.body)
+        self.assertEqual(send_weekly_digest(), 0)
+
+
+@override_settings(
+    EMAIL_QUEUE_BACKEND='notifications.tests.BouncingBackend',
+    EMAIL_QUEUE_MAX_ATTEMPTS=2, EMAIL_QUEUE_RETRY_DELAY=60,
+)
+class MailQueueTests(TestCase):
+    def queue(self, *addresses):
+        return mailqueue.enqueue([EmailMessage('Hello', 'Body', to=[address]) for address in addresses])
+
+    def test_claims_are_exclusive_until_they_expire(self):
+        self.queue('a@example.com', 'b@example.com', 'c@example.com')
+        OutboundEmail.objects.filter(to=['c@example.com']).update(
+            next_attempt_at=timezone.now() + timedelta(hours=1)
+        )
+
+        first = mailqueue.claim_batch(10)
+        self.assertEqual(sorted(email.to[0] for email in first), ['a@example.com', 'b@example.com'])
+        self.assertEqual(len({email.claim for email in first}), 1)
+        self.assertEqual(mailqueue.claim_batch(10), [])
+
+        # The worker died: its claim lapses and another worker takes over
+        OutboundEmail.objects.filter(id=first[0].id).update(next_attempt_at=timezone.now())
+        second = mailqueue.claim_batch(10)
+        self.assertEqual([email.id for email in second], [first[0].id])
+        self.assertNotEqual(second[0].claim, first[0].claim)
+
+    def test_batch_size_is_respected(self):
+        self.queue('a@example.com', 'b@example.com', 'c@example.com')
+        self.assertEqual(len(mailqueue.claim_batch(2)), 2)
+        self.assertEqual(len(mailqueue.claim_batch(2)), 1)
+
+    def test_failures_back_off_then_give_up(self):
+        self.queue('ok@example.com', 'bounce@example.com')
+
+        with self.assertLogs('notifications.mailqueue', 'WARNING'):
+            stats = mailqueue.send_batch()
+        self.assertEqual((stats['sent'], stats['retrying'], stats['failed']), (1, 1, 0))
+        self.assertEqual([message.to for message in mail.outbox], [['ok@example.com']])
+        sent = OutboundEmail.objects.get(to=['ok@example.com'])
+        self.assertEqual((sent.status, sent.claim), ('sent', ''))
+
+        bounced = OutboundEmail.objects.get(to=['bounce@example.com'])
+        self.assertEqual((bounced.status, bounced.attempts, bounced.claim), ('queued', 1, ''))
+        self.assertIn('mailbox unavailable', bounced.last_error)
+        self.assertGreater(bounced.next_attempt_at, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(mailqueue.send_batch()['claimed'], 0)
+
+        OutboundEmail.objects.filter(id=bounced.id).update(next_attempt_at=timezone.now())
+        with self.assertLogs('notifications.mailqueue', 'WARNING'):
+            self.assertEqual(mailqueue.send_batch()['failed'], 1)
+        self.assertEqual(OutboundEmail.objects.get(id=bounced.id).status, 'failed')
+
+    @override_settings(EMAIL_QUEUE_BACKEND='notifications.tests.UnreachableBackend')
+    def test_unreachable_server_requeues_the_batch(self):
+        self.queue('a@example.com', 'b@example.com')
+        with self.assertLogs('notifications.mailqueue', 'WARNING') as logs:
+            self.assertEqual(mailqueue.send_batch()['retrying'], 2)
+        self.assertIn('connection refused', logs.output[0])
+        self.assertFalse(OutboundEmail.objects.exclude(status='queued').exists())
+        self.assertFalse(OutboundEmail.objects.filter(attempts=0).exists())
+
+    def test_retry_delay_doubles(self):
+        self.assertEqual(
+            [mailqueue.retry_delay(attempts).total_seconds() for attempts in (1, 2, 3)],
+            [60, 120, 240],
+        )
+
+
+class MailQueueRoutingTests(ReplicaSpyMixin, TestCase):
+    def test_claims_read_from_the_primary(self):
+        mailqueue.enqueue([EmailMessage('Hello', 'Body', to=['a@example.com'])])
+        self.replica_reads.clear()
+        self.assertEqual(len(mailqueue.claim_batch(10)), 1)
+        self.assertEqual(mailqueue.claim_batch(10), [])
+        self.assertNotIn('notifications.OutboundEmail', self.replica_reads)
+
+
+class NotificationRoutingTests(ReplicaSpyMixin, TestCase):
+    def test_checkpoints_are_read_from_the_primary(self):
+        organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pw')
+        user = User.objects.create_user('alex', 'alex@example.com', 'pw')
+        event = Event.objects.create(
+            title='Cleanup', description='Gloves', organizer=organizer,
+            date_time=timezone.now() + timedelta(hours=3),
+            location=Location.objects.create(name='Oshawa'),
+            category=EventCategory.objects.create(name='Beach Cleanup', description='Beaches'),
+        )
+        EventParticipation.objects.create(user=user, event=event)
+
+        # The recipient queries carry the NotificationLog checkpoint
+        self.assertEqual(send_event_reminders(hours=24), 1)
+        self.assertNotIn('interaction.EventParticipation', self.replica_reads)
+        send_weekly_digest()
+        self.assertNotIn('auth.User', self.replica_reads)
@@ -98,8 +98,8 @@ def create_users():
             user.save()
             print(f"Created user: {user_data['first_name']} {user_data['last_name']}")
         
-        # Create user profile
-        profile, created = UserProfile.objects.get_or_create(
+        # Fill in the profile (the post_save signal has already created it)
+        profile, created = UserProfile.objects.update_or_create(
             user=user,
             defaults={
                 'bio': user_data['bio'],
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Location, EventTag, SearchHistory
+from .models import Location, EventTag, SearchHistory, Recommendation
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
@@ -12,4 +12,9 @@ class EventTagAdmin(admin.ModelAdmin):
 @admin.register(SearchHistory)
 class SearchHistoryAdmin(admin.ModelAdmin):
     list_display = ('user', 'search_query', 'search_date', 'results_count')
-    list_filter = ('search_date',)
\ No newline at end of file
+    list_filter = ('search_date',)
+
+
+@admin.register(Recommendation)
+class RecommendationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'computed_at')
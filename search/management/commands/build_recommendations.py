@@ -0,0 +1,36 @@
+"""
+Management command to precompute event recommendations for every user
+Usage: python manage.py build_recommendations [--top-k 10]
+
+Run it periodically (e.g. nightly, or hourly on busy days). The dashboard
+and home page only read the stored results.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from search.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Compute the top K recommended events for every user'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=10,
+            help='Number of events stored per user (default: 10)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            users = build_recommendations(top_k=options['top_k'])
+        except RuntimeError as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Stored recommendations for {users} users in {elapsed:.2f}s'
+        ))
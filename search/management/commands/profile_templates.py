@@ -0,0 +1,127 @@
+"""
+Management command to find the slowest templates
+Usage: python manage.py profile_templates [--url /events/ ...] [--repeat 20] [--user USERNAME] [--cold]
+
+Renders pages through the full request stack (against the current
+database, e.g. seed data) with the template profiler of
+ecoconnect/profiling.py, then ranks templates, includes and blocks by
+their own rendering time and lists the most used tags and filters.
+"""
+
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from ecoconnect import profiling
+from events.models import Event
+
+DEFAULT_URLS = (
+    '/',
+    '/events/',
+    '/events/?status=upcoming&sort=popular&page=2',
+)
+
+
+class Command(BaseCommand):
+    help = 'Render pages repeatedly and rank templates by rendering time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            action='append',
+            dest='urls',
+            help='Page to render (repeatable; default: home, event list, a filtered list, '
+                 'an event page and the dashboard)'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Renders per page (default: 20)'
+        )
+        parser.add_argument(
+            '--user',
+            help='Log in as this user (default: the first active user, for the dashboard)'
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Clear the cache before every render, so cached fragments are rendered too'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=15,
+            help='Rows in each table (default: 15)'
+        )
+
+    def handle(self, *args, **options):
+        profiling.install()
+
+        users = User.objects.filter(is_active=True).order_by('id')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        user = users.first()
+        if options['user'] and user is None:
+            raise CommandError(f"No active user '{options['user']}'")
+
+        urls = options['urls'] or self.default_urls(user)
+        client = Client(HTTP_HOST=urlsplit(settings.SITE_URL).netloc)
+        if user is not None:
+            client.force_login(user)
+
+        total = profiling.Profile()
+        started = time.monotonic()
+        for url in urls:
+            page = profiling.Profile()
+            for _ in range(options['repeat']):
+                if options['cold']:
+                    cache.clear()
+                profile, token = profiling.start()
+                try:
+                    response = client.get(url)
+                finally:
+                    profiling.stop(token)
+                page.merge(profile)
+            if response.status_code != 200:
+                self.stdout.write(self.style.WARNING(f'⚠️  {url} returned {response.status_code}'))
+            self.stdout.write(
+                f'{url:60} {page.render_time * 1000 / options["repeat"]:8.2f} ms/render in templates'
+            )
+            total.merge(page)
+        elapsed = time.monotonic() - started
+
+        limit = options['limit']
+        renders = len(urls) * options['repeat']
+        self.stdout.write('')
+        self.stdout.write(f'{"":8} {"template / include / block":50} {"calls":>7} {"self ms":>9} {"total ms":>9}')
+        for kind, name, timing in total.ranked()[:limit]:
+            self.stdout.write(
+                f'{kind:8} {name[:50]:50} {timing.calls:7} '
+                f'{timing.own * 1000:9.1f} {timing.total * 1000:9.1f}'
+            )
+
+        for title, counter in (('tags', total.tags), ('filters', total.filters)):
+            self.stdout.write('')
+            self.stdout.write(f'Most used {title} (per render):')
+            for name, count in counter.most_common(limit):
+                self.stdout.write(f'  {name:30} {count / renders:9.1f}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Rendered {renders} pages in {elapsed:.2f}s, '
+            f'{total.render_time:.2f}s of it in templates'
+        ))
+
+    def default_urls(self, user):
+        urls = list(DEFAULT_URLS)
+        event = Event.objects.order_by('id').first()
+        if event is not None:
+            urls.append(f'/events/{event.id}/')
+        if user is not None:
+            urls.append('/interaction/dashboard/')
+        return urls
@@ -0,0 +1,61 @@
+"""
+Management command to copy the primary SQLite database into the replica files
+Usage: python manage.py sync_replica [--interval 5]
+
+Local stand-in for database replication: with DB_REPLICA_NAMES pointing at
+separate SQLite files, running this in a loop gives replicas that lag the
+primary by up to --interval seconds, which is handy for checking that
+users still see their own writes (see ecoconnect/routers.py).
+"""
+
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into each SQLite replica'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Keep syncing every N seconds (default: sync once and exit)'
+        )
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('sync_replica only works with the sqlite profile.')
+
+        targets = [
+            settings.DATABASES[alias]['NAME']
+            for alias in settings.DATABASE_REPLICAS
+            if str(settings.DATABASES[alias]['NAME']) != str(primary['NAME'])
+        ]
+        if not targets:
+            self.stdout.write('No separate replica files configured (DB_REPLICA_NAMES).')
+            return
+
+        while True:
+            started = time.monotonic()
+            source = sqlite3.connect(primary['NAME'])
+            try:
+                for name in targets:
+                    target = sqlite3.connect(name)
+                    try:
+                        source.backup(target)
+                    finally:
+                        target.close()
+            finally:
+                source.close()
+
+            elapsed = (time.monotonic() - started) * 1000
+            self.stdout.write(f'Synced {len(targets)} replica(s) in {elapsed:.0f}ms')
+
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
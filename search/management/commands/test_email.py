@@ -4,7 +4,7 @@ Usage: python manage.py test_email your-email@example.com
 """
 
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
+from django.core.mail import send_mail, get_connection
 from django.conf import settings
 
 class Command(BaseCommand):
@@ -25,6 +25,9 @@ class Command(BaseCommand):
         self.stdout.write(f'From: {settings.DEFAULT_FROM_EMAIL}')
         self.stdout.write(f'Email Backend: {settings.EMAIL_BACKEND}')
         
+        # Talk to the mail server directly rather than through the outbound queue
+        backend = getattr(settings, 'EMAIL_QUEUE_BACKEND', settings.EMAIL_BACKEND)
+        
         try:
             # Send test email
             send_mail(
@@ -53,6 +56,7 @@ EcoConnect - Connecting communities for environmental action
                 from_email=settings.DEFAULT_FROM_EMAIL,
                 recipient_list=[test_email],
                 fail_silently=False,
+                connection=get_connection(backend),
             )
             
             self.stdout.write(
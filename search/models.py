@@ -29,4 +29,14 @@ class SearchHistory(models.Model):
     
     class Meta:
         ordering = ['-search_date']
-        verbose_name_plural = "Search Histories"
\ No newline at end of file
+        verbose_name_plural = "Search Histories"
+
+class Recommendation(models.Model):
+    """Precomputed top events for a user, rebuilt by build_recommendations"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='recommendation')
+    event_ids = models.JSONField(default=list, help_text="Recommended event ids, best first")
+    scores = models.JSONField(default=list)
+    computed_at = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f"Recommendations for {self.user.username}"
@@ -0,0 +1,231 @@
+"""
+Personalized event recommendations.
+
+Users and events become vectors over the same features: one column per
+tag, category and location. An event's vector marks its own tag, category
+and location. A user's vector adds up the events they joined, plus the
+features named in their profile interests, profile location and search
+history. Cosine similarity between the two (one matrix product per block
+of users) ranks the upcoming events for every user at once.
+
+Scores are written to the Recommendation table by build_recommendations,
+so pages only do a primary key lookup.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed to build recommendations
+    np = None
+
+from django.contrib.auth.models import User
+from events.models import Event, EventCategory
+from interaction.models import EventParticipation
+from users.models import UserProfile
+from .models import EventTag, Location, Recommendation, SearchHistory
+
+# Feature weights
+TAG_WEIGHT = 1.0
+CATEGORY_WEIGHT = 1.0
+LOCATION_WEIGHT = 0.5
+INTEREST_WEIGHT = 2.0
+SEARCH_WEIGHT = 0.5
+# Small nudge towards popular events so new users still get suggestions
+POPULARITY_WEIGHT = 0.05
+
+USER_BLOCK = 1024
+
+
+class FeatureSpace:
+    """Column index for every tag, category and location."""
+
+    def __init__(self):
+        self.columns = {}
+        self.names = defaultdict(list)   # lowercase name -> columns
+
+        for kind, model in (('tag', EventTag), ('category', EventCategory), ('location', Location)):
+            for pk, name in model.objects.values_list('id', 'name'):
+                column = len(self.columns)
+                self.columns[(kind, pk)] = column
+                self.names[name.lower()].append(column)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def column(self, kind, pk):
+        return self.columns.get((kind, pk))
+
+    def match_text(self, text):
+        """Columns whose name appears in, or contains, the given text."""
+        text = text.lower().strip()
+        if not text:
+            return []
+        return [
+            column
+            for name, columns in self.names.items()
+            if name in text or text in name
+            for column in columns
+        ]
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def event_features(space, event_ids):
+    """Feature matrix for the given events (rows in event_ids order)."""
+    row_of = {event_id: row for row, event_id in enumerate(event_ids)}
+    matrix = np.zeros((len(event_ids), len(space)), dtype=np.float32)
+
+    def add(row, kind, pk, weight):
+        # Features created after the space was built have no column; a None
+        # index would add the weight to every column of the row
+        column = space.column(kind, pk)
+        if column is not None:
+            matrix[row, column] += weight
+
+    for event_id, category_id, location_id in Event.objects.filter(
+        id__in=event_ids
+    ).values_list('id', 'category_id', 'location_id'):
+        row = row_of[event_id]
+        add(row, 'category', category_id, CATEGORY_WEIGHT)
+        add(row, 'location', location_id, LOCATION_WEIGHT)
+
+    for event_id, tag_id in Event.tags.through.objects.filter(
+        event_id__in=event_ids
+    ).values_list('event_id', 'eventtag_id'):
+        add(row_of[event_id], 'tag', tag_id, TAG_WEIGHT)
+
+    return matrix
+
+
+def user_features(space, user_ids):
+    """Feature matrix for the given users (rows in user_ids order)."""
+    row_of = {user_id: row for row, user_id in enumerate(user_ids)}
+    matrix = np.zeros((len(user_ids), len(space)), dtype=np.float32)
+
+    # Past participation: sum of the joined events' vectors
+    joined = list(EventParticipation.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'event_id'))
+    if joined:
+        joined_event_ids = sorted({event_id for _, event_id in joined})
+        joined_matrix = event_features(space, joined_event_ids)
+        event_row = {event_id: row for row, event_id in enumerate(joined_event_ids)}
+        users = np.fromiter((row_of[user_id] for user_id, _ in joined), dtype=np.intp)
+        events = np.fromiter((event_row[event_id] for _, event_id in joined), dtype=np.intp)
+        np.add.at(matrix, users, joined_matrix[events])
+
+    # Stated interests and home location
+    for profile in UserProfile.objects.filter(user_id__in=user_ids).only(
+        'user_id', 'environmental_interests', 'location'
+    ):
+        row = row_of[profile.user_id]
+        for term in profile.get_interests_list():
+            for column in space.match_text(term):
+                matrix[row, column] += INTEREST_WEIGHT
+        for column in space.match_text(profile.location):
+            matrix[row, column] += LOCATION_WEIGHT
+
+    # What they searched for
+    for user_id, query in SearchHistory.objects.filter(
+        user_id__in=user_ids
+    ).values_list('user_id', 'search_query'):
+        for column in space.match_text(query):
+            matrix[row_of[user_id], column] += SEARCH_WEIGHT
+
+    return matrix
+
+
+def build_recommendations(top_k=10, now=None):
+    """Score every active user against every upcoming event and store the top K."""
+    if np is None:
+        raise RuntimeError('numpy is required to build recommendations (pip install numpy).')
+
+    now = now or timezone.now()
+    space = FeatureSpace()
+    candidates = list(
+        Event.objects.filter(status='upcoming', date_time__gt=now)
+        .order_by('date_time')
+        .values_list('id', flat=True)
+    )
+    user_ids = list(User.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+    if not candidates or not user_ids or not len(space):
+        Recommendation.objects.filter(user_id__in=user_ids).update(event_ids=[], scores=[], computed_at=now)
+        return 0
+
+    candidate_col = {event_id: column for column, event_id in enumerate(candidates)}
+    events = _normalize(event_features(space, candidates))
+
+    # Popularity prior from current participant counts
+    popularity = np.zeros(len(candidates), dtype=np.float32)
+    counts = EventParticipation.objects.filter(event_id__in=candidates).values_list('event_id')
+    for (event_id,) in counts:
+        popularity[candidate_col[event_id]] += 1
+    if popularity.max() > 0:
+        popularity /= popularity.max()
+
+    k = min(top_k, len(candidates))
+    rows = []
+    for start in range(0, len(user_ids), USER_BLOCK):
+        block = user_ids[start:start + USER_BLOCK]
+        scores = _normalize(user_features(space, block)) @ events.T
+        scores += POPULARITY_WEIGHT * popularity
+
+        # Never recommend events the user already joined or organizes
+        row_of = {user_id: row for row, user_id in enumerate(block)}
+        taken = EventParticipation.objects.filter(
+            user_id__in=block, event_id__in=candidates
+        ).values_list('user_id', 'event_id')
+        organized = Event.objects.filter(
+            organizer_id__in=block, id__in=candidates
+        ).values_list('organizer_id', 'id')
+        for user_id, event_id in list(taken) + list(organized):
+            scores[row_of[user_id], candidate_col[event_id]] = -np.inf
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        for row, user_id in enumerate(block):
+            keep = np.isfinite(top_scores[row])
+            rows.append(Recommendation(
+                user_id=user_id,
+                event_ids=[candidates[column] for column in top[row][keep]],
+                scores=[round(float(score), 4) for score in top_scores[row][keep]],
+                computed_at=now,
+            ))
+
+    with transaction.atomic():
+        Recommendation.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['event_ids', 'scores', 'computed_at'],
+        )
+    return len(rows)
+
+
+def recommended_events(user, limit=3):
+    """The user's precomputed recommendations that are still upcoming."""
+    if not user.is_authenticated:
+        return []
+    recommendation = Recommendation.objects.filter(user=user).first()
+    if recommendation is None or not recommendation.event_ids:
+        return []
+
+    event_ids = recommendation.event_ids
+    events = Event.objects.filter(
+        id__in=event_ids, status='upcoming'
+    ).for_cards()
+    position = {event_id: index for index, event_id in enumerate(event_ids)}
+    return sorted(events, key=lambda event: position[event.id])[:limit]
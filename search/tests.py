@@ -1,3 +1,83 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import AnonymousUser, User
 from django.test import TestCase
+from django.utils import timezone
+
+from events.models import Event, EventCategory
+from interaction.models import EventParticipation
+from users.models import UserProfile
+from .models import EventTag, Location, Recommendation
+from .recommendations import (
+    CATEGORY_WEIGHT, LOCATION_WEIGHT, FeatureSpace, build_recommendations, event_features, recommended_events,
+)
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.organizer = User.objects.create_user('organizer', 'organizer@example.com', 'pw')
+        cls.hiker = User.objects.create_user('hiker', 'hiker@example.com', 'pw')
+        cls.swimmer = User.objects.create_user('swimmer', 'swimmer@example.com', 'pw')
+        UserProfile.objects.filter(user=cls.swimmer).update(environmental_interests='Beach Cleanup')
+
+        cls.trees = EventCategory.objects.create(name='Tree Planting', description='Trees')
+        cls.beach = EventCategory.objects.create(name='Beach Cleanup', description='Beaches')
+        cls.oshawa = Location.objects.create(name='Oshawa')
+        cls.outdoor = EventTag.objects.create(name='Outdoor')
+
+        now = timezone.now()
+
+        def event(title, category, days, **kwargs):
+            return Event.objects.create(
+                title=title, description='Details', organizer=cls.organizer,
+                date_time=now + timedelta(days=days), location=cls.oshawa, category=category, **kwargs
+            )
+
+        past = event('Last spring', cls.trees, -30, status='completed')
+        past.tags.add(cls.outdoor)
+        EventParticipation.objects.create(user=cls.hiker, event=past)
+
+        cls.planting = event('Planting', cls.trees, 3)
+        cls.planting.tags.add(cls.outdoor)
+        cls.cleanup = event('Cleanup', cls.beach, 4)
+        cls.joined = event('Joined already', cls.trees, 5)
+        EventParticipation.objects.create(user=cls.hiker, event=cls.joined)
+
+    def test_users_get_events_like_their_history_and_interests(self):
+        self.assertEqual(build_recommendations(top_k=5), 3)
+
+        hiker = Recommendation.objects.get(user=self.hiker)
+        self.assertEqual(hiker.event_ids, [self.planting.id, self.cleanup.id])
+        self.assertEqual(len(hiker.scores), 2)
+        self.assertGreater(hiker.scores[0], hiker.scores[1])
+
+        swimmer = Recommendation.objects.get(user=self.swimmer)
+        self.assertEqual(swimmer.event_ids[0], self.cleanup.id)
+
+        # Nobody is offered their own events
+        self.assertEqual(Recommendation.objects.get(user=self.organizer).event_ids, [])
+
+    def test_rebuilding_replaces_the_scores(self):
+        build_recommendations()
+        EventParticipation.objects.create(user=self.hiker, event=self.planting)
+        build_recommendations()
+        self.assertEqual(Recommendation.objects.get(user=self.hiker).event_ids, [self.cleanup.id])
+        self.assertEqual(Recommendation.objects.count(), 3)
+
+    def test_recommended_events_skip_events_that_stopped_being_upcoming(self):
+        build_recommendations()
+        self.assertEqual(recommended_events(self.hiker), [self.planting, self.cleanup])
+        Event.objects.filter(id=self.planting.id).update(status='ongoing')
+        self.assertEqual(recommended_events(self.hiker), [self.cleanup])
+        self.assertEqual(recommended_events(self.hiker, limit=0), [])
+        self.assertEqual(recommended_events(AnonymousUser()), [])
+
+    def test_features_created_after_the_space_are_ignored(self):
+        space = FeatureSpace()
+        new_tag = EventTag.objects.create(name='Family')
+        self.cleanup.tags.add(new_tag)
 
-# Create your tests here.
+        row = event_features(space, [self.cleanup.id])[0]
+        self.assertEqual(row.sum(), CATEGORY_WEIGHT + LOCATION_WEIGHT)
+        self.assertEqual(row[space.column('category', self.beach.id)], CATEGORY_WEIGHT)
@@ -6,27 +6,34 @@ from django.contrib import messages
 from events.models import Event, EventCategory
 from .models import Location, SearchHistory
 from .forms import AdvancedSearchForm, QuickSearchForm
+from .recommendations import recommended_events
 from django.utils import timezone
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator
 from django.core.mail import send_mail
 from django.conf import settings
+from django.utils.decorators import method_decorator
+from ecoconnect.routers import use_replica_db
+from ecoconnect.cache import get_or_compute
 
 class HomeView(TemplateView):
     template_name = 'search/home.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
-        context['featured_events'] = Event.objects.filter(
-            date_time__gte=timezone.now(),
-            status='upcoming'
-        ).order_by('date_time')[:3]
-        
-        context['total_events'] = Event.objects.count()
-        context['upcoming_events'] = Event.objects.filter(status='upcoming').count()
-        
+        context.update(get_or_compute('home:stats', self.get_stats, timeout=120, tags=['events']))
+        context['recommended_events'] = recommended_events(self.request.user)
         return context
+    
+    def get_stats(self):
+        return {
+            'featured_events': list(Event.objects.filter(
+                date_time__gte=timezone.now(),
+                status='upcoming'
+            ).for_cards().order_by('date_time')[:3]),
+            'total_events': Event.objects.count(),
+            'upcoming_events': Event.objects.filter(status='upcoming').count(),
+        }
 
 class AdvancedSearchView(TemplateView):
     template_name = 'search/advanced_search.html'
@@ -108,6 +115,8 @@ class SearchResultsView(ListView):
         context['total_results'] = self.get_queryset().count()
         return context
 
+# Aggregates can lag a few seconds behind, even right after the user writes
+@method_decorator(use_replica_db, name='dispatch')
 class AnalyticsView(LoginRequiredMixin, TemplateView):
     template_name = 'search/analytics.html'
     
@@ -144,13 +153,20 @@ class AboutView(TemplateView):
         context = super().get_context_data(**kwargs)
         
         # Add some stats for the about page
-        context['total_events'] = Event.objects.count()
-        context['total_participants'] = Event.objects.aggregate(
-            total=Count('eventparticipation')
-        )['total'] or 0
-        context['total_categories'] = EventCategory.objects.count()
+        context.update(get_or_compute(
+            'about:stats', self.get_stats, timeout=600, tags=['events', 'participations']
+        ))
         
         return context
+    
+    def get_stats(self):
+        return {
+            'total_events': Event.objects.count(),
+            'total_participants': Event.objects.aggregate(
+                total=Count('eventparticipation')
+            )['total'] or 0,
+            'total_categories': EventCategory.objects.count(),
+        }
 
 def contact_view(request):
     """
@@ -178,7 +194,7 @@ def contact_view(request):
             for error in errors:
                 messages.error(request, error)
         else:
-            # Try to send email (will display in console since we're using console backend)
+            # Queue the email; send_queued_mail delivers it outside the request
             try:
                 email_subject = f"EcoConnect Contact: {subject}"
                 email_message = f"""
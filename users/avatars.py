@@ -0,0 +1,107 @@
+"""
+Profile picture renditions and avatar URLs.
+
+An uploaded profile picture is never stored as is. UserProfile.save()
+crops it to a square and writes one small WebP per size in AVATAR_SIZES
+to profile_pics/avatars/<user id>-<size>-<version>.webp. The version is
+a hash of the upload, so every new picture gets new URLs that browsers
+may cache forever.
+
+The URL of any size is built from (user id, avatar_version) alone; no
+storage or database access. Pages that load profiles with
+select_related('userprofile') need no extra query at all, others read
+the version from the cache. Users without a picture get an initials
+avatar drawn inline as SVG.
+"""
+
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+AVATAR_SIZES = (40, 96, 256)
+AVATAR_FOLDER = 'profile_pics/avatars/'
+AVATAR_QUALITY = 80
+
+# Background colours for initials avatars, picked by user id
+INITIALS_COLORS = ('#198754', '#20c997', '#0d6efd', '#6f42c1', '#fd7e14', '#d63384', '#0dcaf0', '#6c757d')
+
+
+def avatar_name(user_id, size, version):
+    return f'{AVATAR_FOLDER}{user_id}-{size}-{version}.webp'
+
+
+def avatar_url(user_id, size, version):
+    """URL of the smallest rendition at least ``size`` pixels wide."""
+    rendition = next((s for s in AVATAR_SIZES if s >= size), AVATAR_SIZES[-1])
+    return settings.MEDIA_URL + avatar_name(user_id, rendition, version)
+
+
+def make_renditions(upload, user_id):
+    """
+    Write the square WebP renditions of an uploaded image.
+    Returns (version, name of the largest rendition). Raises OSError (or
+    Pillow's UnidentifiedImageError) for files that aren't images.
+    """
+    from PIL import Image, ImageOps
+
+    upload.seek(0)
+    data = upload.read()
+    version = hashlib.sha1(data).hexdigest()[:12]
+
+    with Image.open(io.BytesIO(data)) as image:
+        # Phones store rotation in EXIF; apply it before dropping the metadata
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        largest = AVATAR_SIZES[-1]
+        square = ImageOps.fit(image, (largest, largest), Image.LANCZOS)
+
+    for size in AVATAR_SIZES:
+        rendition = square if size == largest else square.resize((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        rendition.save(buffer, 'WEBP', quality=AVATAR_QUALITY, method=6)
+        name = avatar_name(user_id, size, version)
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    return version, avatar_name(user_id, largest, version)
+
+
+def delete_renditions(user_id, version):
+    for size in AVATAR_SIZES:
+        default_storage.delete(avatar_name(user_id, size, version))
+
+
+def _version_key(user_id):
+    return f'avatar:{user_id}'
+
+
+def avatar_version(user_id):
+    """The user's avatar version ('' = initials), cached."""
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        from .models import UserProfile
+        version = UserProfile.objects.filter(user_id=user_id).values_list('avatar_version', flat=True).first() or ''
+        cache.set(_version_key(user_id), version)
+    return version
+
+
+def set_cached_version(user_id, version):
+    cache.set(_version_key(user_id), version)
+
+
+def initials(user):
+    return initials_of(user.first_name, user.last_name, user.username)
+
+
+def initials_of(first_name, last_name, username):
+    letters = ((first_name or '')[:1] + (last_name or '')[:1]) or username[:1]
+    return letters.upper()
+
+
+def initials_color(user_id):
+    return INITIALS_COLORS[(user_id or 0) % len(INITIALS_COLORS)]
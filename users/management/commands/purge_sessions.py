@@ -0,0 +1,60 @@
+"""
+Management command to delete expired sessions in small batches
+Usage: python manage.py purge_sessions [--batch-size 1000] [--pause 0.1]
+
+Django's clearsessions deletes every expired row in one statement, which
+holds the write lock for a long time on a large django_session table.
+This deletes a batch at a time so requests can keep writing in between.
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions from the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of sessions deleted per statement (default: 1000)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.1,
+            help='Seconds to sleep between batches (default: 0.1)'
+        )
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith('signed_cookies'):
+            self.stdout.write('Sessions are stored in signed cookies; nothing to purge.')
+            return
+
+        batch_size = options['batch_size']
+        now = timezone.now()
+        total = 0
+
+        while True:
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:batch_size]
+            )
+            if not keys:
+                break
+
+            deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+            total += deleted
+            self.stdout.write(f'Deleted {total} expired sessions...')
+
+            if len(keys) < batch_size:
+                break
+            time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Purged {total} expired sessions'))
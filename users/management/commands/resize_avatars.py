@@ -0,0 +1,39 @@
+"""
+Management command to convert profile pictures uploaded before avatars were resized
+Usage: python manage.py resize_avatars
+
+New uploads are resized when the profile is saved. This writes the avatar
+renditions for older pictures and deletes the original files.
+"""
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from users.avatars import make_renditions, set_cached_version
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = 'Write avatar renditions for profile pictures that have none'
+
+    def handle(self, *args, **options):
+        profiles = UserProfile.objects.filter(avatar_version='').exclude(
+            profile_picture=''
+        ).exclude(profile_picture__isnull=True)
+
+        converted = 0
+        for profile in profiles.iterator():
+            original = profile.profile_picture.name
+            try:
+                with profile.profile_picture.open('rb') as picture:
+                    version, name = make_renditions(picture, profile.user_id)
+            except OSError as e:
+                # Missing files, and UnidentifiedImageError for non-images
+                self.stderr.write(f'Skipped {original}: {e}')
+                continue
+            UserProfile.objects.filter(pk=profile.pk).update(avatar_version=version, profile_picture=name)
+            set_cached_version(profile.user_id, version)
+            default_storage.delete(original)
+            converted += 1
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Resized {converted} profile pictures'))
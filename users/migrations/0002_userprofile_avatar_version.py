@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_version',
+            field=models.CharField(blank=True, editable=False, max_length=16),
+        ),
+    ]
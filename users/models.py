@@ -1,6 +1,8 @@
+import re
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
+from .avatars import delete_renditions, make_renditions, set_cached_version
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -9,10 +11,55 @@ class UserProfile(models.Model):
     environmental_interests = models.CharField(max_length=200, blank=True, help_text="e.g., Tree Planting, Beach Cleanup, Recycling")
     join_date = models.DateTimeField(default=timezone.now)
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+    # Hash of the current picture, part of the avatar URLs ('' = no picture)
+    avatar_version = models.CharField(max_length=16, blank=True, editable=False)
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
     
+    def save(self, *args, **kwargs):
+        old_version = self.avatar_version
+        picture = self.profile_picture
+        if picture and not picture._committed:
+            # A new upload: keep the resized renditions, not the original
+            self.avatar_version, self.profile_picture = make_renditions(picture, self.user_id)
+        elif not picture:
+            self.avatar_version = ''
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'profile_picture' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'avatar_version'}
+        super().save(*args, **kwargs)
+        
+        if old_version and old_version != self.avatar_version:
+            delete_renditions(self.user_id, old_version)
+        set_cached_version(self.user_id, self.avatar_version)
+    
+    def get_interests_list(self):
+        """Split the free-text interests ('Tree Planting, beach cleanup') into lowercase terms"""
+        return [term.strip().lower() for term in re.split(r'[,;/\n]+', self.environmental_interests) if term.strip()]
+    
     class Meta:
         verbose_name = "User Profile"
-        verbose_name_plural = "User Profiles"
\ No newline at end of file
+        verbose_name_plural = "User Profiles"
+
+
+def profile_lookup(user_field=''):
+    """Lookup from a model to its user's profile, for select_related or prefetch_related"""
+    return f'{user_field}__userprofile' if user_field else 'userprofile'
+
+
+def with_profile(queryset, *user_fields):
+    """
+    Load the profiles of the users in ``queryset`` in the same query:
+    with_profile(User.objects.all()) or with_profile(participations, 'user').
+    """
+    return queryset.select_related(*[profile_lookup(field) for field in user_fields or ('',)])
+
+
+def get_profile(user):
+    """The user's profile or None; no query if it was loaded with with_profile()"""
+    try:
+        return user.userprofile
+    except UserProfile.DoesNotExist:
+        return None
@@ -0,0 +1,20 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .avatars import delete_renditions, set_cached_version
+from .models import UserProfile
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    """Every user has a profile, so lists can always join it"""
+    if created and not raw:
+        UserProfile.objects.get_or_create(user=instance)
+
+
+@receiver(post_delete, sender=UserProfile)
+def profile_deleted(sender, instance, **kwargs):
+    """Remove the avatar files and fall back to initials"""
+    if instance.avatar_version:
+        delete_renditions(instance.user_id, instance.avatar_version)
+    set_cached_version(instance.user_id, '')
@@ -0,0 +1,47 @@
+from django import template
+from django.contrib.auth.models import User
+from django.utils.html import format_html
+
+from users.avatars import avatar_url, avatar_version, initials, initials_color, initials_of
+from users.models import get_profile
+
+register = template.Library()
+
+
+def _avatar_version(user):
+    # Profiles loaded with with_profile() or prefetch_related cost no lookup
+    if User.userprofile.related.is_cached(user):
+        profile = get_profile(user)
+        return profile.avatar_version if profile else ''
+    return avatar_version(user.id)
+
+
+def _render_avatar(user_id, letters, version, size, css_class):
+    size = int(size)
+    if version:
+        return format_html(
+            '<img src="{}" srcset="{} 2x" width="{}" height="{}" alt="" '
+            'class="rounded-circle {}" loading="lazy" decoding="async">',
+            avatar_url(user_id, size, version), avatar_url(user_id, size * 2, version),
+            size, size, css_class,
+        )
+    return format_html(
+        '<svg width="{}" height="{}" viewBox="0 0 40 40" class="rounded-circle flex-shrink-0 {}" aria-hidden="true">'
+        '<rect width="40" height="40" fill="{}"/>'
+        '<text x="20" y="20" dy=".35em" text-anchor="middle" fill="#fff" font-family="sans-serif" font-size="16">{}</text>'
+        '</svg>',
+        size, size, css_class, initials_color(user_id), letters,
+    )
+
+
+@register.simple_tag
+def avatar(user, size=40, css_class=''):
+    """Round avatar: the resized profile picture, or the user's initials"""
+    return _render_avatar(user.id, initials(user), _avatar_version(user), size, css_class)
+
+
+@register.simple_tag
+def roster_avatar(row, size=40, css_class=''):
+    """Avatar for a roster row (events/roster.py, with_avatars=True)"""
+    letters = initials_of(row['first_name'], row['last_name'], row['username'])
+    return _render_avatar(row['user_id'], letters, row['avatar_version'] or '', size, css_class)
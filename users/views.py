@@ -25,9 +25,8 @@ def register_view(request):
         if form.is_valid():
             user = form.save()
             
-            # Create user profile with additional fields
-            profile = UserProfile.objects.create(
-                user=user,
+            # The profile was created with the user (users.signals); fill it in
+            UserProfile.objects.filter(user=user).update(
                 bio=request.POST.get('bio', ''),
                 location=request.POST.get('location', ''),
                 environmental_interests=request.POST.get('environmental_interests', '')